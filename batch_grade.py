@@ -0,0 +1,190 @@
+"""
+Batch grading for DSA Mentor
+Runs the mentor pipeline over a JSONL file of submissions, one
+{"problem_title", "language", "code"} object per line (an optional "id" is
+used as the record key, otherwise the line number, and an optional
+"student_id" selects whose memory partition the submission reads and feeds).
+
+    python batch_grade.py cohort.jsonl --output feedback.jsonl --concurrency 8 --rate 2
+
+Results are appended to the output JSONL as they complete, and the output file
+doubles as the checkpoint: re-running the same command skips every record that
+already has a successful result. Diagnoses are embedded once and written to the
+user memory collection in bulk rather than one add per record.
+"""
+
+import os
+import json
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+import telemetry
+import memory_consolidation
+import gradio_app
+
+class RateLimiter:
+    """Token bucket: at most `rate` acquisitions per second, with bursts of `burst`."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+def iter_submissions(path):
+    """Yield (key, record) for every submission in the input JSONL."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            yield str(record.get("id", line_no)), record
+
+def load_completed(output_path):
+    """Keys that already have a successful result in the output file."""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn last line from a crashed run
+            if "error" not in row:
+                completed.add(row["key"])
+    return completed
+
+def batch_memory_id(key, record):
+    # Deterministic, so re-grading a record after a crash upserts instead of duplicating
+    digest = hashlib.sha256(f"{key}\x00{record['code']}".encode("utf-8")).hexdigest()[:32]
+    return f"{record['problem_title']}_{digest}"
+
+async def grade(key, record, limiter, retries):
+    """Run the pipeline for one submission with retry and jittered exponential backoff."""
+    for attempt in range(retries + 1):
+        await limiter.acquire()
+        started = time.perf_counter()
+        try:
+            diagnosis, tokens = None, []
+            async for kind, value in gradio_app.mentor_pipeline_stream(
+                record["problem_title"], record["code"], record.get("language", "Python"),
+                stream=False, store=False, student_id=record.get("student_id"), fallback=False
+            ):
+                if kind == "diagnosis":
+                    diagnosis = value
+                elif kind == "token":
+                    tokens.append(value)
+            row = {
+                "key": key,
+                "student_id": record.get("student_id"),
+                "problem_title": record["problem_title"],
+                "language": record.get("language", "Python"),
+                "mistake_summary": diagnosis["diagnosis"]["mistake_summary"],
+                "issues": diagnosis["diagnosis"]["issues"],
+                "feedback": "".join(tokens),
+                "elapsed_s": round(time.perf_counter() - started, 3),
+            }
+            memory = (batch_memory_id(key, record), record.get("student_id"), record["problem_title"],
+                      diagnosis["diagnosis"], diagnosis["embedding"])
+            return row, memory
+        except Exception as e:
+            if attempt == retries:
+                return {"key": key, "problem_title": record.get("problem_title"), "error": str(e)}, None
+            delay = min(30.0, 2 ** attempt) * random.uniform(0.5, 1.5)
+            print(f"⚠️ Record {key} failed ({e}); retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+async def run_batch(input_path, output_path, concurrency=8, rate=2.0, retries=3, flush_every=32):
+    completed = load_completed(output_path)
+    if completed:
+        print(f"↩️ Resuming: {len(completed)} records already graded")
+
+    await asyncio.to_thread(gradio_app.warm_up)
+
+    limiter = RateLimiter(rate, burst=concurrency)
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    buffer = []  # (row, memory) pairs waiting to be checkpointed
+    stats = {"done": 0, "failed": 0}
+    flush_lock = asyncio.Lock()
+    started = time.perf_counter()
+
+    async def flush():
+        async with flush_lock:
+            if not buffer:
+                return
+            pending = buffer[:]
+            buffer.clear()
+            # Memories first: once a result is in the output file it will not be re-graded
+            await asyncio.to_thread(gradio_app.store_memories, [m for _, m in pending if m is not None])
+            with open(output_path, "a", encoding="utf-8") as f:
+                for row, _ in pending:
+                    f.write(json.dumps(row) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            elapsed = time.perf_counter() - started
+            print(f"✅ {stats['done']} graded, {stats['failed']} failed "
+                  f"({stats['done'] / elapsed if elapsed else 0:.2f} records/s)")
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            row, memory = await grade(*item, limiter, retries)
+            stats["failed" if memory is None else "done"] += 1
+            buffer.append((row, memory))
+            if len(buffer) >= flush_every:
+                await flush()
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    for key, record in iter_submissions(input_path):
+        if key not in completed:
+            await queue.put((key, record))
+    for _ in workers:
+        await queue.put(None)
+    await asyncio.gather(*workers)
+    await flush()
+
+    # Let any background work scheduled by the pipeline finish before exiting
+    if gradio_app._background_tasks:
+        await asyncio.gather(*gradio_app._background_tasks, return_exceptions=True)
+
+    # Merge repeat mistakes from this batch into the students' existing memories
+    await asyncio.to_thread(memory_consolidation.run_pending, gradio_app.get_user_collection)
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Grade a JSONL file of submissions with DSA Mentor")
+    parser.add_argument("input", help="JSONL with problem_title, language and code per line")
+    parser.add_argument("--output", help="results JSONL (default: <input>.results.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=8, help="submissions graded at once")
+    parser.add_argument("--rate", type=float, default=2.0, help="max submissions started per second (0 = unlimited)")
+    parser.add_argument("--retries", type=int, default=3, help="retries per submission on failure")
+    parser.add_argument("--flush-every", type=int, default=32, help="results per checkpoint / bulk memory write")
+    args = parser.parse_args()
+
+    output = args.output or os.path.splitext(args.input)[0] + ".results.jsonl"
+    print(f"🚀 Grading {args.input} -> {output}")
+    telemetry.start_metrics_server()
+    stats = asyncio.run(run_batch(args.input, output, args.concurrency, args.rate, args.retries, args.flush_every))
+    print(f"🏁 Done: {stats['done']} graded, {stats['failed']} failed")
+
+if __name__ == "__main__":
+    main()
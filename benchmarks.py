@@ -0,0 +1,692 @@
+"""
+Benchmarks for DSA Mentor
+Each benchmark is a subcommand, e.g.:
+
+    python benchmarks.py memory-ids --max-size 100000
+
+A benchmark exits with a non-zero status when it detects a regression.
+The end-to-end benchmark runs against a local stub LLM (stub_llm_server.py)
+and compares each run with a saved baseline:
+
+    python benchmarks.py e2e --users 16 --requests 8 --save-baseline
+    python benchmarks.py e2e --users 16 --requests 8
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import statistics
+import numpy as np
+
+EMBEDDING_DIM = 384
+
+def random_vectors(n, dim=EMBEDDING_DIM, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - start
+
+def bench_memory_ids(args):
+    """Write latency of one memory as the user collection grows."""
+    import chromadb
+
+    client = chromadb.EphemeralClient()
+    collection = client.get_or_create_collection(name=f"bench_{uuid.uuid4().hex[:8]}")
+
+    def write_scan(vector):
+        # Previous behaviour: count every stored memory to build the id
+        memory_id = f"Two Sum_{len(collection.get()['ids'])}"
+        collection.add(ids=[memory_id], documents=["Problem: Two Sum"], embeddings=[vector])
+
+    def write_uuid(vector):
+        collection.add(ids=[f"Two Sum_{uuid.uuid4().hex}"], documents=["Problem: Two Sum"], embeddings=[vector])
+
+    checkpoints = [size for size in (1_000, 10_000, 100_000) if size <= args.max_size]
+    probe = random_vectors(args.samples, seed=1).tolist()
+    size = 0
+    rows = []
+    for checkpoint in checkpoints:
+        # Grow the collection in bulk up to the next checkpoint
+        while size < checkpoint:
+            batch = min(5_000, checkpoint - size)
+            collection.add(
+                ids=[f"seed_{uuid.uuid4().hex}" for _ in range(batch)],
+                documents=["Problem: seed"] * batch,
+                embeddings=random_vectors(batch, seed=size).tolist()
+            )
+            size += batch
+
+        uuid_ms = statistics.median(timed(write_uuid, v) for v in probe) * 1000
+        size += len(probe)
+        try:
+            scan_ms = statistics.median(timed(write_scan, v) for v in probe[:args.scan_samples]) * 1000
+            scan = f"{scan_ms:9.2f} ms"
+            size += args.scan_samples
+        except Exception as e:
+            # Large collections can exceed what a single get() is able to return
+            scan = f"failed ({type(e).__name__})"
+        rows.append((checkpoint, uuid_ms))
+        print(f"{checkpoint:>8} memories | uuid id: {uuid_ms:7.2f} ms | full-scan id: {scan}")
+
+    growth = rows[-1][1] / rows[0][1]
+    print(f"uuid write latency growth {rows[0][0]} -> {rows[-1][0]}: {growth:.2f}x (limit {args.max_growth}x)")
+    return growth <= args.max_growth
+
+def _linear_search_similar(memories, problem_title, keywords):
+    # Previous memory_manager.search_similar: scan every memory on each call
+    results = []
+    for m in memories:
+        if problem_title.lower() in m["problem_title"].lower() or any(k in m["error_patterns"] for k in keywords):
+            results.append(m)
+    return results
+
+def bench_memory_search(args):
+    """Indexed memory_manager.search_similar against the previous linear scan."""
+    import os
+    import random
+    import tempfile
+    import memory_manager
+
+    rng = random.Random(0)
+    titles = [f"Problem {i} {rng.choice(['Array', 'Tree', 'Graph', 'String', 'Matrix'])}" for i in range(args.titles)]
+    patterns = [f"pattern-{i}" for i in range(args.patterns)]
+    memories = [
+        {
+            "memory_id": f"m{i:08d}",
+            "timestamp": f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}T00:00:{i % 60:02d}",
+            "problem_title": rng.choice(titles),
+            "user_code": "",
+            "outcome": "partial",
+            "error_patterns": rng.sample(patterns, 3),
+            "notes": "",
+            "fix_attempts": rng.randint(1, 5),
+        }
+        for i in range(args.size)
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        memory_manager.MEMORY_FILE = os.path.join(tmp, "missing.json")
+        memory_manager.MEMORY_DB = os.path.join(tmp, "bench_memory.db")
+        start = time.perf_counter()
+        memory_manager.save_memory(memories)
+        print(f"Stored {args.size} memories in {time.perf_counter() - start:.1f}s")
+        build = timed(memory_manager.search_similar, "warm up", [])
+        print(f"Built search index in {build:.1f}s")
+
+        queries = [(rng.choice(titles), [rng.choice(patterns)]) for _ in range(args.queries)]
+        indexed_ms = statistics.median(
+            timed(memory_manager.search_similar, title, [], limit=10) for title, _ in queries
+        ) * 1000
+        pattern_ms = statistics.median(
+            timed(memory_manager.search_similar, title, keywords, limit=10) for title, keywords in queries
+        ) * 1000
+        linear_ms = statistics.median(
+            timed(_linear_search_similar, memories, title, keywords) for title, keywords in queries[:args.linear_queries]
+        ) * 1000
+
+    print(f"indexed search (title):            {indexed_ms:9.3f} ms")
+    print(f"indexed search (title + pattern):  {pattern_ms:9.3f} ms")
+    print(f"linear scan (in-memory list):      {linear_ms:9.3f} ms")
+    return indexed_ms < linear_ms
+
+def bench_vector_index(args):
+    """In-process NumPy index against a Chroma query for the expert corpus."""
+    import os
+    import tempfile
+    import chromadb
+    import vector_index
+
+    client = chromadb.EphemeralClient()
+    collection = client.get_or_create_collection(name=f"bench_{uuid.uuid4().hex[:8]}")
+    vectors = random_vectors(args.size)
+    for start in range(0, args.size, 5_000):
+        batch = vectors[start:start + 5_000]
+        collection.add(
+            ids=[f"expert_{start + i}" for i in range(len(batch))],
+            documents=[f"Expert section {start + i}" for i in range(len(batch))],
+            metadatas=[{"problem_title": f"Problem {start + i}", "section": "key_idea"} for i in range(len(batch))],
+            embeddings=batch.tolist()
+        )
+
+    queries = random_vectors(args.queries, seed=7).tolist()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "expert_index")
+        vector_index.build_index(collection, path, max_rows=args.size)
+        index = vector_index.load_index(path, collection, max_rows=args.size)
+
+        chroma_ms = statistics.median(
+            timed(collection.query, query_embeddings=[q], n_results=args.top_k) for q in queries
+        ) * 1000
+        search_ms = statistics.median(timed(index.search, [q], args.top_k) for q in queries) * 1000
+        # Documents come from Chroma by id; this is the cold case, every hit missing the section LRU
+        index.cache_size = 0
+        index_ms = statistics.median(
+            timed(index.query, query_embeddings=[q], n_results=args.top_k) for q in queries
+        ) * 1000
+        batch_ms = timed(index.query, query_embeddings=queries, n_results=args.top_k) * 1000 / len(queries)
+
+        # The NumPy index is exact, so it doubles as ground truth for Chroma's approximate HNSW
+        overlap = 0
+        for q in queries[:50]:
+            expected = set(index.query(query_embeddings=[q], n_results=args.top_k)["ids"][0])
+            overlap += len(expected & set(collection.query(query_embeddings=[q], n_results=args.top_k)["ids"][0]))
+        recall = overlap / (args.top_k * min(50, len(queries)))
+
+    print(f"{args.size} vectors, top {args.top_k}")
+    print(f"chroma query:              {chroma_ms:8.3f} ms")
+    print(f"numpy index search:        {search_ms:8.3f} ms")
+    print(f"numpy index query + fetch: {index_ms:8.3f} ms")
+    print(f"numpy index, batched:      {batch_ms:8.3f} ms per query")
+    print(f"chroma recall@{args.top_k} vs exact: {recall:.2f}")
+    # The index's job is exact ranking faster than Chroma; fetching the hits by id is shared with Chroma
+    return search_ms < chroma_ms
+
+def clustered_vectors(n, clusters=200, spread=0.6, dim=EMBEDDING_DIM, seed=0):
+    """Unit vectors grouped around topics, closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = random_vectors(clusters, dim, seed=12345)
+    vectors = centers[rng.integers(0, clusters, n)] + spread * rng.standard_normal((n, dim)).astype(np.float32) / np.sqrt(dim)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+def _directory_bytes(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+def bench_memory_quantization(args):
+    """recall@k and footprint of float16 / int8 memory storage against float32."""
+    import tempfile
+    import quantized_store
+
+    if args.chroma_path:
+        import chromadb
+
+        collection = chromadb.PersistentClient(path=args.chroma_path).get_collection("mentor_memory")
+        stored = np.asarray(collection.get(include=["embeddings"])["embeddings"], dtype=np.float32)
+        stored = quantized_store.normalize(stored)
+        # Hold out some stored memories to use as queries
+        base, queries = stored[args.queries:], stored[:args.queries]
+        print(f"Loaded {len(stored)} memories from {args.chroma_path}")
+    else:
+        base = clustered_vectors(args.size)
+        queries = clustered_vectors(args.queries, seed=99)
+
+    k = args.top_k
+    truth = np.argsort(-(queries @ base.T), axis=1)[:, :k]
+    ids = [f"m{i}" for i in range(len(base))]
+    documents = [f"Memory {i}" for i in range(len(base))]
+    results = []
+
+    def evaluate(name, search, ram_bytes, disk_bytes):
+        found = [search(q) for q in queries]
+        recall = np.mean([len(set(truth[i]) & set(found[i])) / k for i in range(len(queries))])
+        ms = statistics.median(timed(search, q) for q in queries[:args.timing_queries]) * 1000
+        results.append((name, recall, ms, ram_bytes / len(base), disk_bytes / len(base)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        float32_bytes = base.shape[1] * 4
+        evaluate("float32 exact (numpy)", lambda q: np.argsort(-(base @ q))[:k], len(base) * float32_bytes,
+                 len(base) * float32_bytes)
+
+        if args.chroma:
+            import chromadb
+
+            chroma_dir = os.path.join(tmp, "chroma")
+            collection = chromadb.PersistentClient(path=chroma_dir).get_or_create_collection("bench_float32")
+            for start in range(0, len(base), 5_000):
+                collection.add(ids=ids[start:start + 5_000], documents=documents[start:start + 5_000],
+                               embeddings=base[start:start + 5_000].tolist())
+            def chroma_search(q):
+                return [int(mid[1:]) for mid in collection.query(query_embeddings=[q.tolist()], n_results=k)["ids"][0]]
+            evaluate("float32 chroma (current)", chroma_search, len(base) * float32_bytes, _directory_bytes(chroma_dir))
+
+        for storage, rerank in (("float16", 1), ("int8", 1), ("int8", args.rerank_factor)):
+            path = os.path.join(tmp, f"{storage}_{rerank}.db")
+            store = quantized_store.QuantizedMemoryStore(path, storage, rerank_factor=rerank)
+            for start in range(0, len(base), 5_000):
+                store.upsert(ids[start:start + 5_000], base[start:start + 5_000], documents[start:start + 5_000])
+            def store_search(q, store=store):
+                return [int(mid[1:]) for mid in store.query([q], n_results=k)["ids"][0]]
+            store._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            name = f"{storage}" + (f" + rerank x{rerank}" if rerank > 1 else "")
+            evaluate(name, store_search, store.memory_bytes(), _directory_bytes(path))
+            store.close()
+
+    print(f"{len(base)} memories, {len(queries)} queries, recall@{k} against exact float32 search")
+    print(f"{'storage':<26} {'recall':>7} {'query ms':>9} {'RAM B/vec':>10} {'disk B/vec':>11}")
+    for name, recall, ms, ram, disk in results:
+        print(f"{name:<26} {recall:7.3f} {ms:9.3f} {ram:10.0f} {disk:11.0f}")
+
+    # int8 with re-ranking must stay at least 2x smaller than float32 both in RAM and on disk
+    int8_rerank = results[-1]
+    return (int8_rerank[1] >= args.min_recall and int8_rerank[3] * 2 <= float32_bytes
+            and int8_rerank[4] * 2 <= float32_bytes)
+
+def bench_embedding_batching(args):
+    """Embedding throughput and latency with and without the micro-batching worker."""
+    from concurrent.futures import ThreadPoolExecutor
+    import embedding_service
+
+    model = embedding_service.get_model()
+    model.encode(["warm up"] * embedding_service.EMBEDDING_BATCH_SIZE)
+    modes = {
+        "batch of one": lambda text: model.encode([text]),
+        "micro-batched": lambda text: embedding_service.submit([text], use_cache=False).result(),
+    }
+    rows = []
+    for callers in args.callers:
+        for mode, encode in modes.items():
+            def caller(c):
+                latencies = []
+                for r in range(args.requests):
+                    text = f"Caller {c}, request {r}: nested loops over the input make the solution quadratic"
+                    start = time.perf_counter()
+                    encode(text)
+                    latencies.append(time.perf_counter() - start)
+                return latencies
+
+            batches_before = embedding_service.batch_stats()["batches"]
+            start = time.perf_counter()
+            with ThreadPoolExecutor(callers) as pool:
+                latencies = [l for per_caller in pool.map(caller, range(callers)) for l in per_caller]
+            elapsed = time.perf_counter() - start
+            batches = embedding_service.batch_stats()["batches"] - batches_before
+            mean_batch = len(latencies) / batches if batches else 1.0
+            rows.append((callers, mode, len(latencies) / elapsed, percentiles(latencies), mean_batch))
+
+    print(f"{args.requests} requests per caller, max batch {embedding_service.EMBEDDING_BATCH_SIZE}, "
+          f"max wait {embedding_service.EMBEDDING_BATCH_WAIT_MS} ms")
+    print(f"{'callers':>7} {'mode':<14} {'texts/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'mean batch':>11}")
+    for callers, mode, throughput, latency, mean_batch in rows:
+        print(f"{callers:>7} {mode:<14} {throughput:9.1f} {latency['p50_ms']:8.2f} {latency['p95_ms']:8.2f} "
+              f"{mean_batch:11.1f}")
+
+    # Batching must pay off at the highest concurrency
+    top = [row for row in rows if row[0] == max(args.callers)]
+    ok = top[1][2] >= top[0][2]
+    if args.bulk <= 0:
+        return ok
+
+    # Interactive latency while a bulk job (setup, memory sync) is encoding
+    import threading
+
+    bulk_rows = []
+    for lane, bulk in (("shared queue", False), ("bulk lane", True)):
+        texts = [f"Bulk memory {lane} {i}: off-by-one at the end of the array" for i in range(args.bulk)]
+        job = threading.Thread(target=embedding_service.embed_many, args=(texts,),
+                               kwargs={"use_cache": False, "bulk": bulk})
+        job.start()
+        time.sleep(0.05)
+        latencies = []
+        for r in range(args.requests):
+            start = time.perf_counter()
+            embedding_service.submit([f"Live request {lane} {r}: quadratic nested loops"], use_cache=False).result()
+            latencies.append(time.perf_counter() - start)
+        job.join()
+        bulk_rows.append((lane, percentiles(latencies)))
+
+    print(f"\nOne interactive caller during a bulk job of {args.bulk} texts")
+    print(f"{'bulk texts in':<14} {'p50 ms':>8} {'p95 ms':>8}")
+    for lane, latency in bulk_rows:
+        print(f"{lane:<14} {latency['p50_ms']:8.2f} {latency['p95_ms']:8.2f}")
+    return ok and bulk_rows[1][1]["p95_ms"] <= bulk_rows[0][1]["p95_ms"]
+
+E2E_BASELINE_FILE = "benchmarks_baseline.json"
+E2E_STAGES = ["diagnose", "embed", "retrieve", "first_token", "feedback", "total"]
+
+SAMPLE_SUBMISSIONS = [
+    ("Two Sum", "def two_sum(nums, target):\n    for i in range(len(nums)):\n        for j in range(i+1, len(nums)):\n"
+                "            if nums[i] + nums[j] == target:\n                return [i, j]", "Python"),
+    ("Valid Parentheses", "def is_valid(s):\n    return s.count('(') == s.count(')')", "Python"),
+    ("Maximum Subarray", "int maxSubArray(vector<int>& nums) {\n    int best = 0, cur = 0;\n"
+                         "    for (int x : nums) { cur = max(0, cur + x); best = max(best, cur); }\n    return best;\n}", "C++"),
+]
+
+def percentiles(values):
+    if not values:
+        return {}
+    p50, p95, p99 = np.percentile(np.asarray(values) * 1000, [50, 95, 99])
+    return {"p50_ms": round(float(p50), 2), "p95_ms": round(float(p95), 2), "p99_ms": round(float(p99), 2)}
+
+def _student_id(u):
+    return f"bench-user-{u}"
+
+def _sample(u, r, run):
+    """A distinct submission for user u's request r. The marker is code, not a comment, because the
+    diagnosis cache normalizes comments away and would answer every request after the first."""
+    title, code, language = SAMPLE_SUBMISSIONS[(u + r) % len(SAMPLE_SUBMISSIONS)]
+    marker = f"sample_{run}_{u}_{r}"
+    return title, code + (f"\n{marker} = 0" if language == "Python" else f"\nint {marker} = 0;"), language
+
+def _seed_collections(gradio_app, size, users):
+    """Give retrieval realistic work: fill the throwaway expert collection and every simulated student's memories."""
+    import embedding_service
+
+    if size <= 0:
+        return
+    texts = [f"Problem {i}: mistake pattern {i % 37} around {['arrays', 'trees', 'graphs', 'strings'][i % 4]}"
+             for i in range(size)]
+    vectors = [v.tolist() if hasattr(v, "tolist") else v for v in embedding_service.embed_many(texts)]
+    for u in range(users):
+        gradio_app.get_user_collection(_student_id(u)).add(
+            ids=[f"seed_{i}" for i in range(size)], documents=texts, embeddings=vectors
+        )
+    gradio_app.get_expert_collection().add(
+        ids=[f"expert_{i}" for i in range(size)],
+        documents=[f"Problem: Problem {i}\nKey Idea:\n{t}" for i, t in enumerate(texts)],
+        metadatas=[{"problem_title": f"Problem {i}", "section": "key_idea"} for i in range(size)],
+        embeddings=vectors
+    )
+
+async def _drive_pipeline(gradio_app, users, requests_per_user, use_cache):
+    samples = {stage: [] for stage in E2E_STAGES}
+    errors = 0
+
+    async def user(u):
+        nonlocal errors
+        for r in range(requests_per_user):
+            title, code, language = _sample(u, r, "pipeline")
+            timings = {}
+            try:
+                async for _ in gradio_app.mentor_pipeline_stream(
+                    title, code, language, stream=True, use_cache=use_cache, timings=timings,
+                    student_id=_student_id(u)
+                ):
+                    pass
+            except Exception as e:
+                errors += 1
+                print(f"⚠️ Pipeline request failed: {e}")
+                continue
+            for stage, seconds in timings.items():
+                samples[stage].append(seconds)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(u) for u in range(users)))
+    elapsed = time.perf_counter() - start
+    if gradio_app._background_tasks:
+        await asyncio.gather(*gradio_app._background_tasks, return_exceptions=True)
+    return samples, elapsed, errors
+
+def _drive_gradio(gradio_app, users, requests_per_user):
+    from concurrent.futures import ThreadPoolExecutor
+    from gradio_client import Client
+
+    interface = gradio_app.create_interface()
+    interface.queue(default_concurrency_limit=gradio_app.GRADIO_CONCURRENCY)
+    _, url, _ = interface.launch(server_name="127.0.0.1", server_port=None, prevent_thread_lock=True, quiet=True)
+    samples = {"first_update": [], "total": []}
+    errors = 0
+
+    def user(u):
+        nonlocal errors
+        client = Client(url, verbose=False)
+        for r in range(requests_per_user):
+            title, code, language = _sample(u, r, "gradio")
+            start = time.perf_counter()
+            first = None
+            try:
+                job = client.submit(title, code, language, _student_id(u),
+                                    api_name="/process_code")
+                for _ in job:
+                    if first is None:
+                        first = time.perf_counter() - start
+                output = job.result()
+                if output.startswith("Error processing"):
+                    raise RuntimeError(output)
+            except Exception as e:
+                errors += 1
+                print(f"⚠️ Gradio request failed: {e}")
+                continue
+            samples["first_update"].append(first if first is not None else time.perf_counter() - start)
+            samples["total"].append(time.perf_counter() - start)
+
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=users) as pool:
+            list(pool.map(user, range(users)))
+        elapsed = time.perf_counter() - start
+    finally:
+        interface.close()
+    return samples, elapsed, errors
+
+def _report(name, samples, elapsed, errors):
+    completed = len(samples["total"])
+    result = {
+        "requests": completed,
+        "errors": errors,
+        "rps": round(completed / elapsed, 2) if elapsed else 0.0,
+        "stages": {stage: percentiles(values) for stage, values in samples.items() if values},
+    }
+    print(f"\n{name}: {completed} requests in {elapsed:.2f}s ({result['rps']} req/s, {errors} errors)")
+    for stage, stats in result["stages"].items():
+        print(f"  {stage:<13} p50 {stats['p50_ms']:9.2f} ms | p95 {stats['p95_ms']:9.2f} ms | p99 {stats['p99_ms']:9.2f} ms")
+    return result
+
+def _compare_baseline(results, baseline, tolerance):
+    """Regressions: p95 slower or throughput lower than the baseline by more than tolerance."""
+    ok = True
+    for target, result in results.items():
+        base = baseline.get(target)
+        if not base:
+            continue
+        if result["errors"] > base["errors"]:
+            print(f"❌ {target}: {result['errors']} errors (baseline {base['errors']})")
+            ok = False
+        if result["rps"] < base["rps"] * (1 - tolerance):
+            print(f"❌ {target}: {result['rps']} req/s vs baseline {base['rps']} req/s")
+            ok = False
+        for stage, stats in result["stages"].items():
+            base_stats = base["stages"].get(stage)
+            if base_stats and stats["p95_ms"] > base_stats["p95_ms"] * (1 + tolerance):
+                print(f"❌ {target}/{stage}: p95 {stats['p95_ms']} ms vs baseline {base_stats['p95_ms']} ms")
+                ok = False
+    return ok
+
+def bench_e2e(args):
+    """Concurrent simulated users against mentor_pipeline and the Gradio endpoint, with a stub LLM."""
+    import tempfile
+    from stub_llm_server import StubConfig, start_stub_server
+
+    server, url = start_stub_server(config=StubConfig(args.latency, args.token_latency, args.tokens))
+    print(f"🧪 Stub LLM at {url} (latency {args.latency}s, token latency {args.token_latency}s)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        import diagnosis_cache
+        import memory_manager
+        import student_profile
+        import gradio_app
+
+        # Never touch the real stores or the paid endpoint, and start every run from empty
+        # memories and profiles so runs stay comparable with the baseline
+        gradio_app.LLM_BASE_URL = url
+        gradio_app.api_key = "stub"
+        gradio_app.CHROMA_PATH = os.path.join(tmp, "chroma")
+        gradio_app.USE_VECTOR_INDEX = False
+        gradio_app.EXPERT_CATALOG_PATH = os.path.join(tmp, "expert_catalog.json")
+        diagnosis_cache.DIAGNOSIS_CACHE_FILE = os.path.join(tmp, "diagnosis_cache.db")
+        memory_manager.MEMORY_DB = os.path.join(tmp, "mentor_memory.db")
+        memory_manager.MEMORY_FILE = os.path.join(tmp, "mentor_memory.json")
+        student_profile.STUDENT_PROFILE_DB = os.path.join(tmp, "student_profiles.db")
+        student_profile.clear()
+        # Static analysis answers some samples locally; the diagnose stage should measure the LLM
+        gradio_app.STATIC_ANALYSIS = "off"
+        gradio_app.warm_up()
+        _seed_collections(gradio_app, args.seed, args.users)
+
+        results = {}
+        config = {"users": args.users, "requests": args.requests, "latency": args.latency,
+                  "token_latency": args.token_latency, "seed": args.seed}
+        if args.target in ("pipeline", "both"):
+            samples, elapsed, errors = asyncio.run(
+                _drive_pipeline(gradio_app, args.users, args.requests, args.use_cache)
+            )
+            results["pipeline"] = _report("mentor_pipeline", samples, elapsed, errors)
+        if args.target in ("gradio", "both"):
+            # The pooled LLM client belongs to the event loop that created it
+            gradio_app._components.pop("llm", None)
+            samples, elapsed, errors = _drive_gradio(gradio_app, args.users, args.requests)
+            results["gradio"] = _report("gradio endpoint", samples, elapsed, errors)
+        server.shutdown()
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"config": config, **results}, f, indent=2)
+        print(f"\n💾 Saved baseline to {args.baseline}")
+        return all(r["errors"] == 0 for r in results.values())
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one.")
+        return all(r["errors"] == 0 for r in results.values())
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("config") != config:
+        print(f"⚠️ Baseline was recorded with {baseline.get('config')}; comparing anyway.")
+    print(f"\nComparing with {args.baseline} (tolerance {args.tolerance:.0%})")
+    return _compare_baseline(results, baseline, args.tolerance)
+
+def bench_llm_resilience(args):
+    """Tail latency with and without hedging, retries under injected errors, and the breaker during an outage."""
+    from stub_llm_server import StubConfig, start_stub_server
+    import llm_resilience
+    import gradio_app
+
+    config = StubConfig(latency=args.latency, slow_rate=args.slow_rate, slow_latency=args.slow_latency)
+    server, url = start_stub_server(config=config)
+    gradio_app.LLM_BASE_URL = url
+    gradio_app.api_key = "stub"
+    print(f"🧪 Stub LLM at {url} (latency {args.latency}s, {args.slow_rate:.0%} of requests take {args.slow_latency}s)")
+
+    async def run_calls(n):
+        # The pooled LLM client belongs to the event loop that created it
+        gradio_app._components.pop("llm", None)
+        semaphore = asyncio.Semaphore(args.concurrency)
+        latencies, failures = [], 0
+
+        async def one(i):
+            nonlocal failures
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    await gradio_app.get_diagnosis(f"Problem: Two Sum\nCode:\nprint({i})")
+                except llm_resilience.LLMUnavailable:
+                    failures += 1
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(one(i) for i in range(n)))
+        return latencies, failures
+
+    def scenario(name, hedge_after, error_rate, calls):
+        llm_resilience.reset()
+        llm_resilience.LLM_HEDGE_AFTER = hedge_after
+        config.error_rate = error_rate
+        # Hedging on p95 needs a latency history first
+        asyncio.run(run_calls(llm_resilience.MIN_HEDGE_SAMPLES * 2))
+        requests_before = config.requests
+        latencies, failures = asyncio.run(run_calls(calls))
+        extra = (config.requests - requests_before) / calls - 1
+        latency = percentiles(latencies)
+        print(f"{name:<28} {latency['p50_ms']:9.1f} {latency['p95_ms']:9.1f} {latency['p99_ms']:9.1f} "
+              f"{extra:8.1%} {failures:9d}")
+        return latency, failures
+
+    print(f"{'scenario':<28} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'extra rq':>8} {'failures':>9}")
+    plain, _ = scenario("no hedging", "off", 0.0, args.calls)
+    hedged, _ = scenario("hedge after p95", "p95", 0.0, args.calls)
+    _, retry_failures = scenario(f"{args.error_rate:.0%} errors, retried", "off", args.error_rate, args.calls)
+
+    # Outage: the breaker opens and calls fail fast instead of waiting out their deadline
+    llm_resilience.reset()
+    config.error_rate = 1.0
+    latencies, failures = asyncio.run(run_calls(args.calls))
+    fast = sorted(latencies)[len(latencies) // 2] * 1000
+    print(f"{'upstream down':<28} {fast:9.1f} ms median, {failures}/{args.calls} fell back, "
+          f"breaker {llm_resilience.breaker.state}")
+    server.shutdown()
+    llm_resilience.reset()
+
+    return (hedged["p99_ms"] < plain["p99_ms"] and retry_failures < args.calls * args.error_rate
+            and llm_resilience.breaker.state == "closed" and failures == args.calls)
+
+def main():
+    parser = argparse.ArgumentParser(description="DSA Mentor benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    p = subparsers.add_parser("memory-ids", help="memory write latency vs collection size")
+    p.add_argument("--max-size", type=int, default=100_000)
+    p.add_argument("--samples", type=int, default=50)
+    p.add_argument("--scan-samples", type=int, default=5)
+    p.add_argument("--max-growth", type=float, default=3.0)
+    p.set_defaults(fn=bench_memory_ids)
+
+    p = subparsers.add_parser("memory-search", help="indexed search_similar vs linear scan")
+    p.add_argument("--size", type=int, default=1_000_000)
+    p.add_argument("--titles", type=int, default=100_000)
+    p.add_argument("--patterns", type=int, default=500)
+    p.add_argument("--queries", type=int, default=200)
+    p.add_argument("--linear-queries", type=int, default=5)
+    p.set_defaults(fn=bench_memory_search)
+
+    p = subparsers.add_parser("vector-index", help="NumPy expert index vs Chroma query latency")
+    p.add_argument("--size", type=int, default=5_000)
+    p.add_argument("--queries", type=int, default=200)
+    p.add_argument("--top-k", type=int, default=15)
+    p.set_defaults(fn=bench_vector_index)
+
+    p = subparsers.add_parser("memory-quantization", help="recall@k and footprint of compact memory vectors")
+    p.add_argument("--size", type=int, default=50_000)
+    p.add_argument("--queries", type=int, default=200)
+    p.add_argument("--timing-queries", type=int, default=50)
+    p.add_argument("--top-k", type=int, default=3)
+    p.add_argument("--rerank-factor", type=int, default=4)
+    p.add_argument("--min-recall", type=float, default=0.95)
+    p.add_argument("--chroma", action="store_true", help="also measure the current ChromaDB float32 collection")
+    p.add_argument("--chroma-path", help="evaluate on the stored mentor_memory vectors instead of synthetic ones")
+    p.set_defaults(fn=bench_memory_quantization)
+
+    p = subparsers.add_parser("embedding-batching", help="embedding throughput/latency with and without micro-batching")
+    p.add_argument("--callers", type=int, nargs="+", default=[1, 8, 64], help="concurrent callers to measure")
+    p.add_argument("--requests", type=int, default=20, help="texts embedded per caller")
+    p.add_argument("--bulk", type=int, default=2000, help="texts in the concurrent bulk job; 0 skips that part")
+    p.set_defaults(fn=bench_embedding_batching)
+
+    p = subparsers.add_parser("llm-resilience", help="hedging, retries and circuit breaker against a faulty stub LLM")
+    p.add_argument("--calls", type=int, default=200)
+    p.add_argument("--concurrency", type=int, default=8)
+    p.add_argument("--latency", type=float, default=0.05, help="usual stub LLM latency")
+    p.add_argument("--slow-rate", type=float, default=0.02, help="share of requests hitting the slow tail")
+    p.add_argument("--slow-latency", type=float, default=2.0, help="stub LLM latency of the slow tail")
+    p.add_argument("--error-rate", type=float, default=0.2, help="share of failing requests in the retry scenario")
+    p.set_defaults(fn=bench_llm_resilience)
+
+    p = subparsers.add_parser("e2e", help="end-to-end latency and throughput against a stub LLM")
+    p.add_argument("--target", choices=["pipeline", "gradio", "both"], default="both")
+    p.add_argument("--users", type=int, default=16, help="concurrent simulated users")
+    p.add_argument("--requests", type=int, default=8, help="requests per user")
+    p.add_argument("--latency", type=float, default=0.2, help="stub LLM seconds before the first token")
+    p.add_argument("--token-latency", type=float, default=0.005, help="stub LLM seconds between streamed tokens")
+    p.add_argument("--tokens", type=int, default=None, help="stub LLM streamed chunks per response")
+    p.add_argument("--seed", type=int, default=500, help="memories per simulated student and expert sections to pre-load")
+    p.add_argument("--use-cache", action="store_true", help="allow diagnosis cache hits")
+    p.add_argument("--baseline", default=E2E_BASELINE_FILE)
+    p.add_argument("--save-baseline", action="store_true", help="record this run as the new baseline")
+    p.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before failing")
+    p.set_defaults(fn=bench_e2e)
+
+    args = parser.parse_args()
+    ok = args.fn(args)
+    print("✅ PASS" if ok else "❌ REGRESSION")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Token-budgeted prompt context for DSA Mentor
+Expert solutions are indexed per section (statement, brute force, better,
+optimized, key idea). At query time the retrieved sections and past memories
+are deduplicated, ordered by priority and packed under an explicit token budget.
+"""
+
+import os
+import re
+
+EXPERT_CONTEXT_TOKENS = int(os.getenv("EXPERT_CONTEXT_TOKENS", "700"))
+MEMORY_CONTEXT_TOKENS = int(os.getenv("MEMORY_CONTEXT_TOKENS", "350"))
+
+# (section key, heading, dataset field) in document order
+EXPERT_SECTIONS = [
+    ("statement", "Problem Statement", "problem_statement"),
+    ("brute_force", "Brute Force Approach", "brute_force_explanation"),
+    ("better", "Better Approach", "better_approach"),
+    ("optimized", "Optimized Explanation", "optimized_explanation"),
+    ("key_idea", "Key Idea", "key_idea"),
+]
+SECTION_HEADINGS = {key: heading for key, heading, _ in EXPERT_SECTIONS}
+SECTION_ORDER = {key: i for i, (key, _, _) in enumerate(EXPERT_SECTIONS)}
+
+# Lower is more useful to a mentor nudging towards the optimal approach
+SECTION_PRIORITY = {"key_idea": 0, "optimized": 1, "better": 2, "brute_force": 3, "statement": 4, "full": 5}
+
+# Below this many tokens a truncated section is not worth including
+MIN_SECTION_TOKENS = 40
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token for English prose)."""
+    return len(text) // 4 + 1
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut text to roughly max_tokens, preferring a sentence or word boundary."""
+    limit = max_tokens * 4
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    boundary = max(cut.rfind(". "), cut.rfind("\n"))
+    if boundary < limit // 2:
+        boundary = cut.rfind(" ")
+    return cut[:boundary + 1 if boundary > 0 else limit].rstrip() + " …"
+
+def build_expert_chunks(item):
+    """Split one dataset problem into (section, document, metadata) chunks."""
+    title = item.get("problem_title", "")
+    chunks = []
+    for key, heading, field in EXPERT_SECTIONS:
+        body = (item.get(field) or "").strip()
+        if not body:
+            continue
+        document = f"Problem: {title}\n{heading}:\n{body}"
+        chunks.append((key, document, {
+            "problem_title": title,
+            "difficulty": item.get("difficulty", ""),
+            "topic": item.get("topic", ""),
+            "section": key,
+        }))
+    return chunks
+
+def _section_body(document, section):
+    if section == "full":
+        return document.strip()
+    # Drop the "Problem:" and heading lines added for embedding
+    parts = document.split("\n", 2)
+    return parts[2].strip() if len(parts) == 3 else document.strip()
+
+def build_expert_context(results, token_budget=EXPERT_CONTEXT_TOKENS, top_k=None):
+    """Pack retrieved expert sections of at most top_k problems under token_budget.
+
+    results is a list of (document, metadata, distance). Problems are ranked by
+    their best-matching section. The first pass takes the top-priority section
+    of every problem, so each relevant problem is represented. The second pass
+    fills the remaining budget with further sections, best problems first.
+    The "Expert Solution N" wrappers and separators count against the budget.
+    """
+    problems = {}
+    seen_text = set()
+    for document, meta, distance in sorted(results, key=lambda r: r[2]):
+        title = meta.get("problem_title", "Unknown")
+        section = meta.get("section", "full")
+        body = _section_body(document, section)
+        if body in seen_text:
+            continue
+        seen_text.add(body)
+        sections = problems.setdefault(title, {})
+        if section not in sections:
+            sections[section] = body
+
+    ranked = [
+        (rank, title, sorted(sections.items(), key=lambda s: SECTION_PRIORITY.get(s[0], 99)))
+        for rank, (title, sections) in enumerate(problems.items())
+    ][:top_k]
+    ordered = [(rank, title, sections[0]) for rank, title, sections in ranked if sections]
+    ordered += [(rank, title, s) for rank, title, sections in ranked for s in sections[1:]]
+
+    selected = {}
+    remaining = token_budget
+    for rank, title, (section, body) in ordered:
+        if (rank, title) in selected:
+            header = "\n\n"
+        else:
+            header = f"\n\nExpert Solution {len(selected) + 1}:\nProblem: {title}\n"
+        heading = f"{SECTION_HEADINGS[section]}:\n" if section in SECTION_HEADINGS else ""
+        cost = estimate_tokens(header + heading + body)
+        if cost > remaining:
+            available = remaining - estimate_tokens(header + heading)
+            if available < MIN_SECTION_TOKENS:
+                continue
+            body = truncate_to_tokens(body, available)
+            cost = estimate_tokens(header + heading + body)
+        selected.setdefault((rank, title), []).append((section, heading + body))
+        remaining -= cost
+
+    context = ""
+    for i, ((rank, title), sections) in enumerate(sorted(selected.items())):
+        # Present sections in their natural reading order
+        sections.sort(key=lambda s: SECTION_ORDER.get(s[0], -1))
+        context += f"\n\nExpert Solution {i+1}:\n"
+        context += f"Problem: {title}\n"
+        context += "\n\n".join(text for _, text in sections)
+    return context.strip()
+
+def build_memory_context(retrieved_memories, mistake_summary, top_n=3, token_budget=MEMORY_CONTEXT_TOKENS,
+                         profile_section=""):
+    """Past mistakes for the prompt: deduplicated, most similar first, within token_budget.
+
+    profile_section, the student's rendered profile, goes first when given.
+    """
+    context = f"{profile_section}\n\n" if profile_section else ""
+    context += "Here are the user's most relevant past mistakes:\n\n"
+    remaining = token_budget
+    seen_text = set()
+    count = 0
+    for mid, text, score in sorted(retrieved_memories, key=lambda m: m[2]):
+        if count >= top_n:
+            break
+        key = re.sub(r"\s+", " ", text).strip().lower()
+        if key in seen_text:
+            continue
+        seen_text.add(key)
+        header = f"Memory {count+1} (similarity: {1 - score:.2f}):\n"
+        cost = estimate_tokens(header + text)
+        if cost > remaining:
+            available = remaining - estimate_tokens(header)
+            if available < MIN_SECTION_TOKENS:
+                break
+            text = truncate_to_tokens(text, available)
+            cost = estimate_tokens(header + text)
+        context += f"{header}{text}\n\n"
+        remaining -= cost
+        count += 1
+    context += "Use this information to tailor your feedback for the current problem.\n\n"
+    context += f"User's current mistake summary:\n{mistake_summary}"
+    return context
@@ -0,0 +1,172 @@
+"""
+Persistent diagnosis cache for DSA Mentor
+Diagnoses are stored in SQLite, keyed by problem title, language and a hash of
+the code with comments and whitespace outside string literals stripped, so
+resubmitting the same solution does not pay for another LLM call.
+"""
+
+import io
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import tokenize
+
+DIAGNOSIS_CACHE_FILE = os.getenv("DIAGNOSIS_CACHE_FILE", "diagnosis_cache.db")
+DIAGNOSIS_CACHE_TTL = int(os.getenv("DIAGNOSIS_CACHE_TTL", str(7 * 24 * 3600)))
+DIAGNOSIS_CACHE_MAX_ENTRIES = int(os.getenv("DIAGNOSIS_CACHE_MAX_ENTRIES", "10000"))
+DIAGNOSIS_CACHE_BYPASS = os.getenv("DIAGNOSIS_CACHE_BYPASS", "0") == "1"
+
+# Run size-bounded eviction once every this many writes
+EVICT_EVERY = 64
+
+_conn = None
+_lock = threading.Lock()
+_writes = 0
+_stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+def _connect():
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(DIAGNOSIS_CACHE_FILE, check_same_thread=False)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+        _conn.execute("""
+            CREATE TABLE IF NOT EXISTS diagnoses (
+                key TEXT PRIMARY KEY,
+                diagnosis TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        _conn.execute("CREATE INDEX IF NOT EXISTS idx_diagnoses_last_access ON diagnoses(last_access)")
+        _conn.commit()
+    return _conn
+
+def _normalize_python(code):
+    """Token stream without comments or layout; INDENT/DEDENT keep the block structure."""
+    tokens = []
+    for tok in tokenize.generate_tokens(io.StringIO(code).readline):
+        if tok.type in (tokenize.COMMENT, tokenize.NL, tokenize.ENDMARKER):
+            continue
+        if tok.type == tokenize.INDENT:
+            tokens.append("<INDENT>")
+        elif tok.type == tokenize.DEDENT:
+            tokens.append("<DEDENT>")
+        elif tok.type == tokenize.NEWLINE:
+            tokens.append(";")
+        else:
+            tokens.append(tok.string)
+    return " ".join(tokens)
+
+C_LIKE_TOKEN = re.compile(r"""
+    (?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|`(?:\\.|[^`\\])*`)
+  | (?P<comment>/\*.*?\*/|//[^\n]*)
+  | (?P<space>\s+)
+  | (?P<word>\w+)
+  | (?P<punct>.)
+""", re.VERBOSE | re.DOTALL)
+
+def _normalize_c_like(code):
+    """Tokens without comments; string literals are kept verbatim, whitespace between tokens is not.
+
+    Spacing around punctuation is not significant in C-like languages, so a
+    single space is only kept where it separates two words.
+    """
+    parts, previous = [], None
+    for match in C_LIKE_TOKEN.finditer(code):
+        kind = match.lastgroup
+        if kind in ("comment", "space"):
+            if previous == "word":
+                previous = "gap"
+            continue
+        if kind == "word" and previous == "gap":
+            parts.append(" ")
+        parts.append(match.group())
+        previous = kind
+    return "".join(parts)
+
+def normalize_code(code, language):
+    """Strip comments and insignificant whitespace from a submission."""
+    if language.strip().lower() == "python":
+        try:
+            return _normalize_python(code)
+        except (tokenize.TokenError, IndentationError, SyntaxError):
+            # Not valid Python; fall back to dropping comments line by line
+            lines = [re.sub(r"#.*", "", line).rstrip() for line in code.splitlines()]
+            return "\n".join(line for line in lines if line.strip())
+    return _normalize_c_like(code)
+
+def cache_key(problem_title, language, code):
+    normalized = normalize_code(code, language)
+    raw = "\x00".join([problem_title.strip().lower(), language.strip().lower(), normalized])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def get(problem_title, language, code):
+    """Return the cached diagnosis dict, or None on a miss or expiry."""
+    key = cache_key(problem_title, language, code)
+    now = time.time()
+    with _lock:
+        conn = _connect()
+        row = conn.execute(
+            "SELECT diagnosis, created_at FROM diagnoses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            _stats["misses"] += 1
+            return None
+        diagnosis, created_at = row
+        if now - created_at > DIAGNOSIS_CACHE_TTL:
+            conn.execute("DELETE FROM diagnoses WHERE key = ?", (key,))
+            conn.commit()
+            _stats["misses"] += 1
+            _stats["expired"] += 1
+            return None
+        conn.execute("UPDATE diagnoses SET last_access = ? WHERE key = ?", (now, key))
+        conn.commit()
+        _stats["hits"] += 1
+    return json.loads(diagnosis)
+
+def put(problem_title, language, code, diagnosis_json):
+    """Store a diagnosis, evicting the least recently used entries when full."""
+    global _writes
+    key = cache_key(problem_title, language, code)
+    now = time.time()
+    with _lock:
+        conn = _connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO diagnoses (key, diagnosis, created_at, last_access) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(diagnosis_json), now, now)
+        )
+        _writes += 1
+        if _writes % EVICT_EVERY == 0:
+            _evict(conn, now)
+        conn.commit()
+
+def _evict(conn, now):
+    expired = conn.execute(
+        "DELETE FROM diagnoses WHERE created_at < ?", (now - DIAGNOSIS_CACHE_TTL,)
+    ).rowcount
+    overflow = conn.execute(
+        """DELETE FROM diagnoses WHERE key IN (
+               SELECT key FROM diagnoses ORDER BY last_access DESC LIMIT -1 OFFSET ?
+           )""",
+        (DIAGNOSIS_CACHE_MAX_ENTRIES,)
+    ).rowcount
+    _stats["expired"] += expired
+    _stats["evictions"] += overflow
+
+def cache_stats():
+    """Return diagnosis cache hit-rate metrics."""
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return dict(_stats, hit_rate=_stats["hits"] / lookups if lookups else 0.0)
+
+def clear():
+    """Remove every cached diagnosis."""
+    with _lock:
+        conn = _connect()
+        conn.execute("DELETE FROM diagnoses")
+        conn.commit()
@@ -0,0 +1,215 @@
+"""
+Shared embedding service for DSA Mentor
+All stages use the same all-MiniLM-L6-v2 model, and repeated texts are served
+from a bounded LRU cache instead of being encoded again.
+
+Texts that miss the cache are encoded by one worker thread that gathers the
+requests of every concurrent caller into micro-batches: a batch is encoded as
+soon as it holds EMBEDDING_BATCH_SIZE texts or its oldest text has waited
+EMBEDDING_BATCH_WAIT_MS. On CPU a batch of 32 costs little more than a batch
+of one, so concurrent pipelines share the model's throughput instead of
+queueing for it one text at a time.
+
+Bulk jobs (setup, memory sync, consolidation) submit with bulk=True to a
+second queue that only fills what is left of each batch after the interactive
+texts, so a large bulk job delays a live request by at most one batch.
+"""
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5"))
+
+_model = None
+_model_lock = threading.Lock()
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+def get_model():
+    """Return the shared SentenceTransformer, loading it on first use."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    return _model
+
+def _cache_key(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def _cache_get(key):
+    with _cache_lock:
+        vector = _cache.get(key)
+        if vector is None:
+            _stats["misses"] += 1
+            return None
+        _cache.move_to_end(key)
+        _stats["hits"] += 1
+        return vector
+
+def _cache_put(key, vector):
+    with _cache_lock:
+        _cache[key] = vector
+        _cache.move_to_end(key)
+        while len(_cache) > EMBEDDING_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+class _Request:
+    __slots__ = ("texts", "future", "results", "remaining")
+
+    def __init__(self, texts, future):
+        self.texts = texts
+        self.future = future
+        self.results = [None] * len(texts)
+        self.remaining = len(texts)
+
+class EmbeddingBatcher:
+    """Encodes texts submitted from any thread in shared micro-batches on one worker thread."""
+
+    def __init__(self, encode, max_batch=EMBEDDING_BATCH_SIZE, max_wait_ms=EMBEDDING_BATCH_WAIT_MS):
+        self.encode = encode
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._queue = deque()  # (request, index of the text in the request)
+        self._bulk = deque()   # the same, for bulk jobs
+        self._cond = threading.Condition()
+        self._thread = None
+        self.stats = {"batches": 0, "texts": 0, "bulk_texts": 0}
+
+    def submit(self, texts, bulk=False):
+        """Queue texts for encoding; the returned Future resolves to one vector per text.
+
+        Bulk texts are encoded only with the room interactive texts leave in a batch.
+        """
+        future = Future()
+        if not texts:
+            future.set_result([])
+            return future
+        request = _Request(list(texts), future)
+        with self._cond:
+            (self._bulk if bulk else self._queue).extend((request, i) for i in range(len(request.texts)))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="dsa-mentor-embedding", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return future
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._queue and not self._bulk:
+                self._cond.wait()
+            # Give other callers until the deadline to fill the batch
+            deadline = time.monotonic() + self.max_wait
+            while len(self._queue) + len(self._bulk) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = [self._queue.popleft() for _ in range(min(self.max_batch, len(self._queue)))]
+            bulk = min(self.max_batch - len(batch), len(self._bulk))
+            self.stats["bulk_texts"] += bulk
+            return batch + [self._bulk.popleft() for _ in range(bulk)]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                vectors = self.encode([request.texts[i] for request, i in batch])
+            except Exception as e:
+                for request, _ in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                continue
+            self.stats["batches"] += 1
+            self.stats["texts"] += len(batch)
+            for (request, i), vector in zip(batch, vectors):
+                request.results[i] = vector
+                request.remaining -= 1
+                if request.remaining == 0 and not request.future.done():
+                    request.future.set_result(request.results)
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+def get_batcher():
+    """Return the shared micro-batching worker, creating it on first use."""
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = EmbeddingBatcher(lambda texts: get_model().encode(texts, batch_size=EMBEDDING_BATCH_SIZE))
+    return _batcher
+
+def submit(texts, use_cache=True, bulk=False):
+    """Embed texts asynchronously; returns a Future of one list of floats per text.
+
+    Cached texts are answered at once and only the rest go to the batching
+    worker. Pass use_cache=False for bulk jobs whose texts would only evict
+    useful entries, and bulk=True so they yield to interactive requests.
+    Await from asyncio with asyncio.wrap_future(...).
+    """
+    result = Future()
+    keys = [_cache_key(text) for text in texts] if use_cache else None
+    vectors = [_cache_get(key) for key in keys] if use_cache else [None] * len(texts)
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    if not missing:
+        result.set_result([list(vector) for vector in vectors])
+        return result
+
+    def encoded(future):
+        try:
+            encoded_vectors = future.result()
+        except Exception as e:
+            result.set_exception(e)
+            return
+        for i, vector in zip(missing, encoded_vectors):
+            vectors[i] = vector.tolist()
+            if use_cache:
+                _cache_put(keys[i], vectors[i])
+        result.set_result([list(vector) for vector in vectors])
+
+    get_batcher().submit([texts[i] for i in missing], bulk=bulk).add_done_callback(encoded)
+    return result
+
+def embed_many(texts, use_cache=True, bulk=False):
+    """Embed a list of texts, encoding only the ones missing from the cache."""
+    return submit(texts, use_cache, bulk).result()
+
+def embed(text):
+    """Embed a single text and return it as a list of floats."""
+    return embed_many([text])[0]
+
+def batch_stats():
+    """Return micro-batching counters of the embedding worker."""
+    stats = dict(get_batcher().stats) if _batcher is not None else {"batches": 0, "texts": 0, "bulk_texts": 0}
+    stats["mean_batch_size"] = stats["texts"] / stats["batches"] if stats["batches"] else 0.0
+    return stats
+
+def cache_stats():
+    """Return embedding cache hit/miss counters."""
+    with _cache_lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {
+            "hits": _stats["hits"],
+            "misses": _stats["misses"],
+            "size": len(_cache),
+            "capacity": EMBEDDING_CACHE_SIZE,
+            "hit_rate": _stats["hits"] / lookups if lookups else 0.0,
+        }
+
+def clear_cache():
+    """Drop all cached vectors and reset the counters."""
+    with _cache_lock:
+        _cache.clear()
+        _stats["hits"] = 0
+        _stats["misses"] = 0
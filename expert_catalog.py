@@ -0,0 +1,142 @@
+"""
+Title and alias index over the expert dataset
+Students type the problem title, and the expert dataset is keyed by
+problem_title, so most requests can find their expert entry with a dictionary
+lookup instead of a semantic search. Titles are normalized (case, punctuation,
+apostrophes) and every title also registers its parts as aliases:
+"Kadane's Algorithm : Maximum Subarray Sum in an Array" answers to "kadanes
+algorithm" and to "maximum subarray sum in an array". An alias shared by
+several problems is dropped rather than guessed.
+
+setup_gradio.py writes the catalog next to the vector index, and the app loads
+it once at startup. The catalog only maps titles to the ids of their sections
+(and their dataset topics); the sections themselves are fetched from the expert
+collection, so neither setup nor the app holds the corpus in memory.
+"""
+
+import os
+import re
+import json
+import threading
+from collections import OrderedDict
+from context_builder import build_expert_chunks, build_expert_context, EXPERT_CONTEXT_TOKENS
+
+# Separators between the parts of a title, e.g. "Name : description" or "Name - description"
+ALIAS_SEPARATORS = re.compile(r"\s+[:\-–—|]\s+|\s*:\s*|\(|\)")
+MIN_ALIAS_LENGTH = 4
+# Packed contexts of recently requested problems
+CONTEXT_CACHE_SIZE = 256
+
+def normalize_title(title):
+    title = (title or "").lower().replace("&", " and ")
+    title = re.sub(r"['’`]", "", title)
+    title = re.sub(r"[^a-z0-9]+", " ", title)
+    return title.strip()
+
+def title_aliases(item):
+    """Normalized names a problem should be found under."""
+    title = item.get("problem_title", "")
+    aliases = [title] + ALIAS_SEPARATORS.split(title) + list(item.get("aliases") or [])
+    normalized = []
+    for alias in aliases:
+        alias = normalize_title(alias)
+        if len(alias) >= MIN_ALIAS_LENGTH and alias not in normalized:
+            normalized.append(alias)
+    return normalized
+
+def build_catalog(items, chunk_id):
+    """Build {"aliases": {alias: title}, "problems": {title: {"ids": [...], "topic": ...}}} from dataset items.
+
+    chunk_id maps a section document to its id in the expert collection.
+    """
+    full_titles = {}
+    partial = {}
+    problems = {}
+    for item in items:
+        title = item.get("problem_title", "")
+        if not title:
+            continue
+        problems[title] = {"ids": [chunk_id(document) for _, document, _ in build_expert_chunks(item)],
+                           "topic": item.get("topic", "")}
+        aliases = title_aliases(item)
+        full_titles[normalize_title(title)] = title
+        for alias in aliases[1:]:
+            partial.setdefault(alias, set()).add(title)
+
+    aliases = {alias: titles.pop() for alias, titles in partial.items() if len(titles) == 1}
+    # A problem's full title always wins over another problem's alias
+    aliases.update(full_titles)
+    return {"aliases": aliases, "problems": problems}
+
+def write_catalog(items, path, chunk_id, version=None):
+    catalog = build_catalog(items, chunk_id)
+    catalog["version"] = version
+    # Write to a temporary file first so running workers never read a torn catalog
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(catalog, f)
+    os.replace(path + ".tmp", path)
+    return len(catalog["problems"])
+
+def catalog_version(path):
+    """The version a saved catalog was built from, or None when there is none."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get("version")
+
+def load_catalog(path, collection):
+    """Load a saved catalog over the expert collection, or return None if setup has not written one yet."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        catalog = json.load(f)
+    if any(not isinstance(problem, dict) for problem in catalog["problems"].values()):
+        print("⚠️ Expert catalog is in an old format; run setup_gradio.py to rebuild it.")
+        return None
+    return ExpertCatalog(catalog["aliases"], catalog["problems"], collection)
+
+class ExpertCatalog:
+    """O(1) problem lookup by normalized title or alias."""
+
+    def __init__(self, aliases, problems, collection=None, cache_size=CONTEXT_CACHE_SIZE):
+        self.aliases = aliases
+        self.problems = problems
+        self.collection = collection
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.problems)
+
+    def lookup(self, problem_title):
+        """The dataset's problem_title for what the student typed, or None."""
+        return self.aliases.get(normalize_title(problem_title))
+
+    def topics(self, problem_title):
+        """Dataset topics of a known problem, e.g. ["Arrays", "Hashing"]; [] when the title is unknown."""
+        problem = self.problems.get(self.lookup(problem_title)) or {}
+        return [t.strip() for t in problem.get("topic", "").split(",") if t.strip()]
+
+    def context(self, problem_title, token_budget=EXPERT_CONTEXT_TOKENS):
+        """Packed expert context for a known title, or None when the title is unknown."""
+        title = self.lookup(problem_title)
+        if title is None or self.collection is None or not self.problems.get(title, {}).get("ids"):
+            return None
+        key = (title, token_budget)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        ids = self.problems[title]["ids"]
+        found = self.collection.get(ids=ids, include=["documents", "metadatas"])
+        sections = dict(zip(found["ids"], zip(found["documents"], found["metadatas"])))
+        if not sections:
+            # The collection no longer has this problem; let vector search answer
+            return None
+        context = build_expert_context([(*sections[mid], 0.0) for mid in ids if mid in sections], token_budget)
+        with self._lock:
+            self._cache[key] = context
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return context
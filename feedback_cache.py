@@ -0,0 +1,122 @@
+"""
+Semantic cache for mentor feedback
+Many students make the same mistake on the same problem (brute-force Two Sum,
+say), and each of them used to pay for a fresh, long feedback completion.
+Feedback is cached per problem title, language and set of error types, and a
+new request reuses an entry when the embedding of its mistake summary is within
+FEEDBACK_CACHE_THRESHOLD cosine similarity of the entry's. Entries expire
+after FEEDBACK_CACHE_TTL seconds and the least recently used ones are evicted
+beyond FEEDBACK_CACHE_MAX_ENTRIES.
+
+Cached feedback is shared between students, so it is generated from the
+mistake and the expert solutions only. The student's own history is added as
+a short preamble rendered locally from their retrieved memories and profile,
+which costs no LLM call.
+"""
+
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+from context_builder import estimate_tokens
+from expert_catalog import normalize_title
+
+FEEDBACK_CACHE = os.getenv("FEEDBACK_CACHE", "0") == "1"
+FEEDBACK_CACHE_THRESHOLD = float(os.getenv("FEEDBACK_CACHE_THRESHOLD", "0.92"))
+FEEDBACK_CACHE_TTL = int(os.getenv("FEEDBACK_CACHE_TTL", str(24 * 3600)))
+FEEDBACK_CACHE_MAX_ENTRIES = int(os.getenv("FEEDBACK_CACHE_MAX_ENTRIES", "2000"))
+
+# A retrieved memory counts as "the same mistake again" for the preamble at this similarity
+SIMILAR_MEMORY = 0.5
+PREAMBLE_TITLES = 3
+PREAMBLE_PATTERNS = 3
+
+_entries = OrderedDict()      # entry id -> entry, least recently used first
+_by_key = {}                  # cache key -> set of entry ids
+_lock = threading.Lock()
+_next_id = 0
+_stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "saved_tokens": 0}
+
+def cache_key(problem_title, language, error_types):
+    return (normalize_title(problem_title), language.strip().lower(), tuple(sorted(error_types)))
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+def _remove(entry_id):
+    entry = _entries.pop(entry_id)
+    ids = _by_key[entry["key"]]
+    ids.discard(entry_id)
+    if not ids:
+        del _by_key[entry["key"]]
+
+def get(key, vector, now=None):
+    """Cached feedback for the closest entry under `key` at or above the threshold, or None."""
+    now = time.time() if now is None else now
+    query = _unit(vector)
+    with _lock:
+        best_id, best_similarity = None, FEEDBACK_CACHE_THRESHOLD
+        for entry_id in list(_by_key.get(key, ())):
+            entry = _entries[entry_id]
+            if now - entry["created_at"] > FEEDBACK_CACHE_TTL:
+                _remove(entry_id)
+                _stats["expired"] += 1
+                continue
+            similarity = float(np.dot(query, entry["vector"]))
+            if similarity >= best_similarity:
+                best_id, best_similarity = entry_id, similarity
+        if best_id is None:
+            _stats["misses"] += 1
+            return None
+        _entries.move_to_end(best_id)
+        entry = _entries[best_id]
+        _stats["hits"] += 1
+        _stats["saved_tokens"] += entry["tokens"]
+        return entry["feedback"]
+
+def put(key, vector, feedback, prompt, now=None):
+    """Cache feedback generated for `prompt` (the request's messages), evicting the LRU entries when full."""
+    global _next_id
+    tokens = sum(estimate_tokens(m["content"]) for m in prompt) + estimate_tokens(feedback)
+    with _lock:
+        _next_id += 1
+        _entries[_next_id] = {"key": key, "vector": _unit(vector), "feedback": feedback, "tokens": tokens,
+                              "created_at": time.time() if now is None else now}
+        _by_key.setdefault(key, set()).add(_next_id)
+        while len(_entries) > FEEDBACK_CACHE_MAX_ENTRIES:
+            _remove(next(iter(_entries)))
+            _stats["evictions"] += 1
+
+def preamble(retrieved_memories, profile=None):
+    """Short note on the student's own history to put before shared feedback; "" when there is none."""
+    titles = []
+    for _, text, score in sorted(retrieved_memories, key=lambda m: m[2]):
+        match = re.match(r"Problem:\s*(.+)", text)
+        if 1 - score >= SIMILAR_MEMORY and match and match.group(1).strip() not in titles:
+            titles.append(match.group(1).strip())
+    lines = []
+    if titles:
+        lines.append("You have made a similar mistake before, in: " + ", ".join(titles[:PREAMBLE_TITLES]) + ".")
+    if profile and profile.get("patterns"):
+        top = sorted(profile["patterns"].items(), key=lambda item: item[1]["score"], reverse=True)[:PREAMBLE_PATTERNS]
+        lines.append("Your most frequent mistakes lately: "
+                     + ", ".join(f"{pattern} (x{stats['count']})" for pattern, stats in top) + ".")
+    if not lines:
+        return ""
+    return "📌 **From your history:** " + " ".join(lines) + "\n\n"
+
+def cache_stats():
+    """Return feedback cache hit-rate and saved-token metrics (tokens are estimated)."""
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return dict(_stats, entries=len(_entries), hit_rate=_stats["hits"] / lookups if lookups else 0.0)
+
+def clear():
+    """Remove every cached feedback."""
+    with _lock:
+        _entries.clear()
+        _by_key.clear()
@@ -1,12 +1,32 @@
-import gradio as gr
 import os
+
+# Set cache directories before any model library is imported so they take effect
+os.environ.setdefault("HF_HOME", "D:/huggingface_cache")
+os.environ.setdefault("TRANSFORMERS_CACHE", "D:/huggingface_cache")
+os.environ.setdefault("TORCH_HOME", "D:/huggingface_cache")
+os.environ.setdefault("CHROMA_CACHE_DIR", "D:/chroma_cache")
+
 import json
 import sys
+import time
+import uuid
+import asyncio
 import importlib
+import threading
 from dotenv import load_dotenv
-from openai import OpenAI
-import chromadb
-from sentence_transformers import SentenceTransformer
+import embedding_service
+import diagnosis_cache
+import feedback_cache
+import context_builder
+import telemetry
+import static_analyzer
+import llm_resilience
+import simple_gradio_app
+import quantized_store
+import memory_partitions
+import memory_consolidation
+import memory_sync
+import student_profile
 import memory_manager
 from memory_manager import create_memory_entry, update_memory_entry, find_existing_memory, load_memory
 
@@ -16,23 +36,190 @@ load_dotenv(override=True)
 # Initialize components
 api_key = os.getenv('ZnapAI_API_KEY')
 MODEL = 'gpt-4o-mini'
-openai = OpenAI(
-    api_key=api_key,
-    base_url="https://api.znapai.com/"
-)
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.znapai.com/")
+CHROMA_PATH = "D:/Projects/DSA Mentor/chroma_data"
+EXPERT_INDEX_PATH = os.path.join(CHROMA_PATH, "expert_index")
+EXPERT_CATALOG_PATH = os.path.join(CHROMA_PATH, "expert_catalog.json")
+USE_VECTOR_INDEX = os.getenv("USE_VECTOR_INDEX", "1") == "1"
+
+# Concurrency settings
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "64"))
+GRADIO_CONCURRENCY = int(os.getenv("GRADIO_CONCURRENCY", "32"))
+STREAM_FEEDBACK = os.getenv("STREAM_FEEDBACK", "1") == "1"
+# "hint": always ask the LLM but include the static findings, "answer": skip the diagnosis LLM
+# when static analysis is conclusive, "off": do not run static analysis
+STATIC_ANALYSIS = os.getenv("STATIC_ANALYSIS", "hint")
+# Once a student's profile covers this many submissions it summarizes their history,
+# and only PROFILE_MEMORY_TOP_K raw memories are retrieved instead of 3
+PROFILE_MIN_ATTEMPTS = int(os.getenv("PROFILE_MIN_ATTEMPTS", "3"))
+PROFILE_MEMORY_TOP_K = int(os.getenv("PROFILE_MEMORY_TOP_K", "1"))
+
+# Heavy components are built on first use (or by warm_up) rather than at import
+_components = {}
+_components_lock = threading.RLock()
+_ready = threading.Event()
+
+def _get_component(name, factory):
+    component = _components.get(name)
+    if component is None:
+        with _components_lock:
+            component = _components.get(name)
+            if component is None:
+                component = factory()
+                _components[name] = component
+    return component
+
+def _create_llm_client():
+    import httpx
+    from openai import AsyncOpenAI
+
+    # One pooled HTTP connection pool shared by every request
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_CONNECTIONS,
+        )
+    )
+    # Deadlines and retries are enforced by llm_resilience, so the client itself never retries
+    return AsyncOpenAI(
+        api_key=api_key,
+        base_url=LLM_BASE_URL,
+        http_client=http_client,
+        max_retries=0,
+        timeout=max(llm_resilience.STAGE_DEADLINES.values())
+    )
+
+def _create_chroma_client():
+    import chromadb
+    return chromadb.PersistentClient(path=CHROMA_PATH)
+
+def get_llm_client():
+    return _get_component("llm", _create_llm_client)
+
+def get_chroma_client():
+    return _get_component("chroma", _create_chroma_client)
+
+def _open_user_partition(student_id):
+    storage = quantized_store.MEMORY_VECTOR_STORAGE
+    if storage == "float32":
+        return get_chroma_client().get_or_create_collection(
+            name=memory_partitions.collection_name(student_id),
+            metadata={"student_id": student_id}
+        )
+
+    partition_dir = os.path.join(CHROMA_PATH, f"mentor_memory_{storage}")
+    os.makedirs(partition_dir, exist_ok=True)
+    path = os.path.join(partition_dir, memory_partitions.partition_key(student_id) + ".db")
+    return quantized_store.QuantizedMemoryStore(path, storage)
+
+_user_partitions = memory_partitions.PartitionRegistry(_open_user_partition)
+
+def get_user_collection(student_id=None):
+    """One student's memory partition: a ChromaDB collection, or a compact quantized store."""
+    return _user_partitions.get(student_id)
+
+def get_expert_collection():
+    return _get_component("expert_collection", lambda: get_chroma_client().get_or_create_collection(name="expert_solutions"))
+
+def _create_expert_search():
+    if USE_VECTOR_INDEX:
+        import vector_index
+
+        index = vector_index.load_index(EXPERT_INDEX_PATH, get_expert_collection())
+        if index is not None:
+            return index
+    return get_expert_collection()
+
+def get_expert_search():
+    """The expert corpus searcher: the in-process vector index when available, else ChromaDB."""
+    search = _get_component("expert_search", _create_expert_search)
+    # Reload an index that setup has rebuilt or removed since this worker loaded it
+    if getattr(search, "stale", None) and search.stale():
+        with _components_lock:
+            if _components.get("expert_search") is search:
+                del _components["expert_search"]
+                print("🔄 Expert vector index changed on disk; reloading it.")
+        search = _get_component("expert_search", _create_expert_search)
+    return search
+
+def _create_expert_catalog():
+    import expert_catalog
+
+    # An empty catalog (setup not run yet) sends every request to vector search
+    return (expert_catalog.load_catalog(EXPERT_CATALOG_PATH, get_expert_collection())
+            or expert_catalog.ExpertCatalog({}, {}))
+
+def get_expert_catalog():
+    """Title/alias index over the expert dataset."""
+    return _get_component("expert_catalog", _create_expert_catalog)
+
+def _cache_metrics():
+    """Embedding and diagnosis cache statistics for the metrics endpoint."""
+    metrics = []
+    feedback_stats = feedback_cache.cache_stats()
+    for cache, stats in (("embedding", embedding_service.cache_stats()), ("diagnosis", diagnosis_cache.cache_stats()),
+                         ("feedback", feedback_stats)):
+        for key in ("hits", "misses", "hit_rate"):
+            metrics.append((f"{telemetry.PREFIX}_cache_{key}", {"cache": cache}, stats[key]))
+    metrics.append((f"{telemetry.PREFIX}_cache_saved_tokens", {"cache": "feedback"}, feedback_stats["saved_tokens"]))
+    return metrics
+
+telemetry.register_collector(_cache_metrics)
+
+def _embedding_metrics():
+    """Micro-batching counters of the shared embedding worker."""
+    stats = embedding_service.batch_stats()
+    return [(f"{telemetry.PREFIX}_embedding_batches_total", {}, stats["batches"]),
+            (f"{telemetry.PREFIX}_embedding_batch_texts_total", {}, stats["texts"]),
+            (f"{telemetry.PREFIX}_embedding_bulk_texts_total", {}, stats["bulk_texts"])]
+
+telemetry.register_collector(_embedding_metrics)
 
-embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
+def warm_up():
+    """Build every component and load the embedding model, then sync the memory store in the background."""
+    try:
+        get_llm_client()
+        get_user_collection()
+        get_expert_search()
+        get_expert_catalog()
+        embedding_service.get_model().encode(["warm up"])
+        print("✅ DSA Mentor is warmed up and ready.")
+    except Exception as e:
+        print(f"⚠️ Warm-up failed, components will load on first request: {e}")
+    finally:
+        _ready.set()
+    # The first sync embeds the whole memory_manager history; requests must not wait for it
+    start_memory_sync()
+
+def sync_memory_store(student_id=None):
+    """Mirror memory_manager's records changed since the last sync into the student's memory partition."""
+    result = memory_sync.sync_memories(get_user_collection(student_id), student_id)
+    if result["embedded"] or result["updated"] or result["deleted"]:
+        print(f"🔄 Synced memory store: {result['embedded']} embedded, {result['updated']} updated, "
+              f"{result['deleted']} deleted")
+    return result
+
+def _sync_memory_store_logged():
+    try:
+        sync_memory_store()
+    except Exception as e:
+        print(f"⚠️ Memory store sync failed, it will be retried on the next start: {e}")
 
-# Set cache directories
-os.environ["HF_HOME"] = "D:/huggingface_cache"
-os.environ["TRANSFORMERS_CACHE"] = "D:/huggingface_cache"
-os.environ["TORCH_HOME"] = "D:/huggingface_cache"
-os.environ["CHROMA_CACHE_DIR"] = "D:/chroma_cache"
+def start_memory_sync():
+    """Sync the memory store in a background thread."""
+    thread = threading.Thread(target=_sync_memory_store_logged, name="dsa-mentor-memory-sync", daemon=True)
+    thread.start()
+    return thread
 
-# Initialize ChromaDB
-chroma_client = chromadb.PersistentClient(path="D:/Projects/DSA Mentor/chroma_data")
-user_collection = chroma_client.get_or_create_collection(name="mentor_memory")
-EXPERT_SOLUTION_collection = chroma_client.get_or_create_collection(name="expert_solutions")
+def start_warm_up():
+    """Warm up in a background thread so startup is not blocked."""
+    thread = threading.Thread(target=warm_up, name="dsa-mentor-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+def is_ready():
+    """Readiness check: True once warm-up has finished."""
+    return _ready.is_set()
 
 # System prompts
 SYSTEM_PROMPT_DIAGNOSE = """You are a precise DSA problem analyzer.
@@ -53,14 +240,23 @@ Do not give the full solution directly — nudge them toward the right logic.
 If a past mistake pattern repeats, point it out and explain how to fix their thinking."""
 
 # Utility functions
-def embed_text(text, embedding_model=embedding_model):
-    return embedding_model.encode([text])[0].tolist()
+def embed_text(text):
+    with telemetry.span("embed"):
+        return embedding_service.embed(text)
 
-def retrieve_similar_memories_chroma(user_collection, query_text, top_k=3):
-    results = user_collection.query(
-        query_texts=[query_text],
-        n_results=top_k
-    )
+async def embed_text_async(text):
+    """Embed without holding a thread; the text joins the shared embedding micro-batch."""
+    with telemetry.span("embed"):
+        vectors = await asyncio.wrap_future(embedding_service.submit([text]))
+    return vectors[0]
+
+def retrieve_similar_memories_chroma(user_collection, query_embedding, top_k=3):
+    with telemetry.span("memory_query", top_k=top_k):
+        results = user_collection.query(
+            query_embeddings=[query_embedding],
+            n_results=top_k
+        )
+    telemetry.record_retrieval("memory", results["distances"][0])
     
     retrieved = []
     for i in range(len(results["ids"][0])):
@@ -71,49 +267,113 @@ def retrieve_similar_memories_chroma(user_collection, query_text, top_k=3):
         ))
     return retrieved
 
-def build_retrieval_context(retrieved_memories, mistake_summary, top_n=3):
-    context = "Here are the user's most relevant past mistakes:\n\n"
-    for idx, (mid, text, score) in enumerate(retrieved_memories[:top_n]):
-        context += f"Memory {idx+1} (similarity: {1 - score:.2f}):\n{text}\n\n"
-    context += "Use this information to tailor your feedback for the current problem.\n\n"
-    context += f"User's current mistake summary:\n{mistake_summary}"
-    return context
+def build_retrieval_context(retrieved_memories, mistake_summary, top_n=3, profile_section=""):
+    return context_builder.build_memory_context(retrieved_memories, mistake_summary, top_n=top_n,
+                                                profile_section=profile_section)
 
-def get_diagnosis(user_code):
-    diagnosis = openai.chat.completions.create(
-        model=MODEL,
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT_DIAGNOSE},
-            {"role": "user", "content": user_code}
-        ]
-    )
+def format_user_message(problem_title, user_code, language):
+    """Format the user message similar to the notebook"""
+    return f"""
+Problem: {problem_title}
+Language: {language}
+My reasoning: Please analyze my approach
+Outcome: Needs analysis
+Code:
+{user_code}
+"""
+
+async def get_diagnosis(user_code):
+    async def request():
+        return await get_llm_client().chat.completions.create(
+            model=MODEL,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT_DIAGNOSE},
+                {"role": "user", "content": user_code}
+            ]
+        )
+
+    with telemetry.span("diagnosis_llm", model=MODEL):
+        diagnosis = await llm_resilience.call("diagnosis", request)
+    telemetry.record_llm_usage("diagnosis", diagnosis.usage)
+    content = diagnosis.choices[0].message.content
     try:
-        diagnosis_json = json.loads(diagnosis.choices[0].message.content)
+        diagnosis_json = json.loads(content)
     except json.JSONDecodeError:
+        diagnosis_json = None
+    if not isinstance(diagnosis_json, dict):
         print("⚠️ Could not parse model output as JSON. Using raw text fallback.")
-        diagnosis_json = {"mistake_summary": diagnosis.choices[0].message.content, "issues": []}
+        # Marked so the raw text is not cached as if it were a diagnosis
+        return {"mistake_summary": content, "issues": [], "raw_text": True}
+    diagnosis_json.setdefault("mistake_summary", content)
+    diagnosis_json.setdefault("issues", [])
     return diagnosis_json
 
-def retrieve_expert_context(query, embedding_model, collection, top_k=3):
-    query_embedding = embedding_model.encode([query]).tolist()
+async def diagnose(problem_title, user_code, language, use_cache=True, fallback=True):
+    """Return a diagnosis, reusing a cached one for an equivalent earlier submission.
 
-    results = collection.query(
-        query_embeddings=query_embedding,
-        n_results=top_k
-    )
+    Conclusive static analysis findings are returned without calling the LLM;
+    otherwise they are passed to the LLM as hints. With fallback=True the
+    static findings also stand in for the LLM when it is unavailable.
+    """
+    use_cache = use_cache and not diagnosis_cache.DIAGNOSIS_CACHE_BYPASS
+    if use_cache:
+        cached = await asyncio.to_thread(diagnosis_cache.get, problem_title, language, user_code)
+        if cached is not None:
+            return cached
 
-    context = ""
-    for i in range(len(results["documents"][0])):
-        meta = results["metadatas"][0][i]
-        doc = results["documents"][0][i]
+    user_message = format_user_message(problem_title, user_code, language)
+    findings = None
+    if STATIC_ANALYSIS != "off":
+        with telemetry.span("static_analysis", language=language) as attrs:
+            findings = static_analyzer.analyze(user_code, language)
+            attrs["issues"] = len(findings["issues"])
+        if STATIC_ANALYSIS == "answer" and static_analyzer.is_conclusive(findings):
+            outcome = "answered"
+        else:
+            outcome = "hinted" if findings["issues"] else "clean"
+        telemetry.inc(f"{telemetry.PREFIX}_static_diagnoses_total", help="Submissions run through static analysis",
+                      outcome=outcome)
+        if outcome == "answered":
+            return findings
+        if findings["issues"]:
+            user_message += f"\nStatic analysis findings:\n{static_analyzer.format_findings(findings)}\n"
 
-        context += f"\n\nExpert Solution {i+1}:\n"
-        context += f"Problem: {meta.get('problem_title', 'Unknown')}\n"
-        context += doc[:1500]
+    try:
+        diagnosis_json = await get_diagnosis(user_message)
+    except llm_resilience.LLMUnavailable as e:
+        if not fallback:
+            raise
+        print(f"⚠️ Diagnosis LLM unavailable ({e}); using static analysis instead.")
+        telemetry.inc(f"{telemetry.PREFIX}_llm_fallbacks_total", help="Answers served by the local fallback",
+                      stage="diagnosis")
+        return findings if findings is not None else static_analyzer.analyze(user_code, language)
 
-    return context.strip()
+    # Raw-text fallbacks are not worth caching; a clean diagnosis with no issues is
+    if use_cache and not diagnosis_json.get("raw_text"):
+        await asyncio.to_thread(diagnosis_cache.put, problem_title, language, user_code, diagnosis_json)
+    return diagnosis_json
+
+def retrieve_expert_context(query_embedding, collection, top_k=3):
+    # Expert solutions are indexed per section, so fetch several sections per problem
+    with telemetry.span("expert_query", top_k=top_k):
+        results = collection.query(
+            query_embeddings=[query_embedding],
+            n_results=top_k * len(context_builder.EXPERT_SECTIONS)
+        )
+    telemetry.record_retrieval("expert", results["distances"][0])
 
-def get_mentor_feedback(mentor_context, expert_context):
+    retrieved = list(zip(results["documents"][0], results["metadatas"][0], results["distances"][0]))
+    return context_builder.build_expert_context(retrieved, top_k=top_k)
+
+def lookup_expert_context(problem_title):
+    """Expert context for a known problem title, or None when vector search is needed."""
+    with telemetry.span("expert_lookup"):
+        context = get_expert_catalog().context(problem_title)
+    telemetry.inc(f"{telemetry.PREFIX}_expert_title_lookups_total", help="Expert lookups by problem title",
+                  result="hit" if context is not None else "miss")
+    return context
+
+def build_feedback_messages(mentor_context, expert_context):
     final_prompt = f"""
 
 The user made the following mistake:
@@ -127,69 +387,321 @@ Using this information, give the user clear, structured feedback on:
 2. How they can improve.
 3. Step-by-step reasoning toward an optimal approach.
     """
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT_FEEDBACK},
+        {"role": "user", "content": final_prompt}
+    ]
 
-    feedback = openai.chat.completions.create(
-        model=MODEL,
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT_FEEDBACK},
-            {"role": "user", "content": final_prompt}
-        ]
-    )
+async def get_mentor_feedback(mentor_context, expert_context):
+    async def request():
+        return await get_llm_client().chat.completions.create(
+            model=MODEL,
+            messages=build_feedback_messages(mentor_context, expert_context)
+        )
+
+    with telemetry.span("feedback_llm", model=MODEL, stream=False):
+        feedback = await llm_resilience.call("feedback", request)
+    telemetry.record_llm_usage("feedback", feedback.usage)
     response = feedback.choices[0].message.content
     return response
 
-def mentor_pipeline(problem_title, user_code):
-    """Runs full reasoning–retrieval–feedback pipeline."""
-    
-    # STEP 1 — Diagnose user's logic
-    diagnosis_json = get_diagnosis(user_code)
-    mistake_summary = diagnosis_json["mistake_summary"]
-    
-    # STEP 2 — Retrieve from ChromaDB
-    similar_memories = retrieve_similar_memories_chroma(user_collection, mistake_summary, top_k=3)
+async def open_feedback_stream(messages):
+    """Start a streamed completion and read up to its first token; returns (stream, chunks, chunks read so far)."""
+    stream = await get_llm_client().chat.completions.create(
+        model=MODEL,
+        messages=messages,
+        stream=True,
+        stream_options={"include_usage": True}
+    )
+    chunks = stream.__aiter__()
+    buffered = []
+    try:
+        async for chunk in chunks:
+            buffered.append(chunk)
+            if chunk.choices and chunk.choices[0].delta.content:
+                break
+    except BaseException:
+        await stream.close()
+        raise
+    return stream, chunks, buffered
 
-    # STEP 3.a — Build mentor context
-    mentor_context = build_retrieval_context(similar_memories, mistake_summary)
+async def _close_feedback_stream(opened):
+    await opened[0].close()
 
-    # STEP 3.b - Retrieve expert context
-    expert_context = retrieve_expert_context(mistake_summary, embedding_model, EXPERT_SOLUTION_collection, top_k=3)
+async def stream_mentor_feedback(mentor_context, expert_context):
+    """Yield mentor feedback incrementally as the model produces it.
 
-    # STEP 4 — Generate mentor-style feedback
-    mentor_feedback = get_mentor_feedback(mentor_context, expert_context)
-    
-    # STEP 5 — Store this new memory
-    vector = embed_text(mistake_summary)
-    user_collection.add(
-        ids=[f"{problem_title}_{len(user_collection.get()['ids'])}"],
-        documents=[f"Problem: {problem_title}\nMistake Summary: {mistake_summary}\nIssues: {diagnosis_json['issues']}"],
-        embeddings=[vector]
-    )
+    Retries and hedging apply until the first token arrives; after that each
+    token must follow within LLM_STREAM_IDLE_TIMEOUT and the whole answer
+    within the feedback deadline, or LLMUnavailable is raised.
+    """
+    messages = build_feedback_messages(mentor_context, expert_context)
+    with telemetry.span("feedback_llm", model=MODEL, stream=True) as attrs:
+        started = time.perf_counter()
+        ends_at = time.monotonic() + llm_resilience.LLM_FEEDBACK_DEADLINE
+        stream, chunks, buffered = await llm_resilience.call(
+            "feedback", lambda: open_feedback_stream(messages), cleanup=_close_feedback_stream,
+            attempt_timeout=llm_resilience.LLM_ATTEMPT_TIMEOUT
+        )
+        try:
+            while True:
+                if buffered:
+                    chunk = buffered.pop(0)
+                else:
+                    timeout = min(llm_resilience.LLM_STREAM_IDLE_TIMEOUT, ends_at - time.monotonic())
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), max(timeout, 0))
+                    except StopAsyncIteration:
+                        break
+                    except asyncio.TimeoutError as e:
+                        raise llm_resilience.LLMUnavailable("feedback: stream stalled") from e
+                # The final chunk carries token usage and no choices
+                if chunk.usage is not None:
+                    telemetry.record_llm_usage("feedback", chunk.usage)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if "first_token_ms" not in attrs:
+                        attrs["first_token_ms"] = round((time.perf_counter() - started) * 1000, 2)
+                    yield chunk.choices[0].delta.content
+        finally:
+            await stream.close()
+
+def fallback_feedback(problem_title, user_code, language, interrupted=False):
+    """Local analysis shown when the feedback LLM is unavailable."""
+    if interrupted:
+        notice = "\n\n⚠️ The AI mentor stopped responding before finishing. Here is a quick local analysis as well:\n"
+    else:
+        notice = "⚠️ The AI mentor is unavailable right now, so here is a quick local analysis instead:\n"
+    return notice + simple_gradio_app.format_static_analysis(problem_title, user_code, language)
+
+def new_memory_id(problem_title):
+    """Allocate a collision-free memory id without scanning the collection."""
+    return f"{problem_title}_{uuid.uuid4().hex}"
+
+def memory_document(problem_title, diagnosis_json):
+    return f"Problem: {problem_title}\nMistake Summary: {diagnosis_json['mistake_summary']}\nIssues: {diagnosis_json['issues']}"
+
+def memory_metadata(problem_title, student_id, diagnosis_json):
+    return {
+        "problem_title": problem_title,
+        "student_id": memory_partitions.normalize_student_id(student_id),
+        "error_types": ",".join(memory_consolidation.error_types(diagnosis_json["issues"])),
+        "created_at": memory_consolidation.now_iso(),
+    }
+
+def record_profile(student_id, problem_title, diagnosis_json):
+    """Fold a diagnosed submission into the student's thinking fingerprint."""
+    # An unparsed LLM reply has no issue list; counting it would score the attempt as clean
+    if diagnosis_json.get("raw_text"):
+        return
+    student_profile.record_attempt(student_id, problem_title,
+                                   memory_consolidation.error_types(diagnosis_json["issues"]),
+                                   get_expert_catalog().topics(problem_title))
+
+def store_memory(problem_title, diagnosis_json, vector, student_id=None):
+    """Persist the diagnosis and its embedding to the student's memory partition."""
+    with telemetry.span("memory_store"):
+        get_user_collection(student_id).add(
+            ids=[new_memory_id(problem_title)],
+            documents=[memory_document(problem_title, diagnosis_json)],
+            metadatas=[memory_metadata(problem_title, student_id, diagnosis_json)],
+            embeddings=[vector]
+        )
+    memory_consolidation.mark_dirty(memory_partitions.normalize_student_id(student_id))
+    record_profile(student_id, problem_title, diagnosis_json)
+
+def store_memories(memories):
+    """Bulk upsert of (memory_id, student_id, problem_title, diagnosis_json, vector) records, one call per student."""
+    by_student = {}
+    for memory in memories:
+        by_student.setdefault(memory_partitions.normalize_student_id(memory[1]), []).append(memory)
+    for student_id, records in by_student.items():
+        with telemetry.span("memory_store", batch=len(records)):
+            get_user_collection(student_id).upsert(
+                ids=[memory_id for memory_id, _, _, _, _ in records],
+                documents=[memory_document(title, diagnosis_json) for _, _, title, diagnosis_json, _ in records],
+                metadatas=[memory_metadata(title, student_id, diagnosis_json) for _, _, title, diagnosis_json, _ in records],
+                embeddings=[vector for _, _, _, _, vector in records]
+            )
+        memory_consolidation.mark_dirty(student_id)
+        for _, _, title, diagnosis_json, _ in records:
+            record_profile(student_id, title, diagnosis_json)
+
+# Keep references to fire-and-forget tasks so they are not garbage collected
+_background_tasks = set()
+
+def _on_background_done(task):
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"⚠️ Background task failed: {task.exception()}")
+
+def run_in_background(coro):
+    """Schedule a coroutine off the response path."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_on_background_done)
+    return task
+
+async def mentor_pipeline_stream(problem_title, user_code, language="Python", stream=STREAM_FEEDBACK, use_cache=True, store=True,
+                                 timings=None, student_id=None, fallback=True):
+    """Runs the pipeline, yielding ("status", message), ("diagnosis", {...}) and ("token", text) events.
+
+    With store=False the new memory is not written; the caller gets the diagnosis
+    and its embedding from the "diagnosis" event and can store it in bulk.
+    If a timings dict is passed, the seconds spent in each stage are recorded in it.
+    Past mistakes are retrieved from and stored to student_id's memory partition.
+    Every request gets a telemetry request id and its stages are traced as spans.
+    With fallback=True a local static analysis stands in for an unavailable LLM;
+    otherwise llm_resilience.LLMUnavailable is raised.
+    """
+    timings = {} if timings is None else timings
+    started = stage_started = time.perf_counter()
+
+    def mark(stage):
+        nonlocal stage_started
+        now = time.perf_counter()
+        timings[stage] = now - stage_started
+        stage_started = now
+
+    telemetry.start_request()
+    with telemetry.span("pipeline", problem_title=problem_title, language=language):
+        # STEP 1 — Diagnose user's logic, resolving the expert entry by title meanwhile
+        yield "status", "🔍 Diagnosing your code…"
+        expert_lookup = asyncio.create_task(asyncio.to_thread(lookup_expert_context, problem_title))
+        try:
+            diagnosis_json = await diagnose(problem_title, user_code, language, use_cache=use_cache, fallback=fallback)
+        except BaseException:
+            expert_lookup.cancel()
+            raise
+        mistake_summary = diagnosis_json["mistake_summary"]
+        mark("diagnose")
+
+        # STEP 2 — Embed the summary once and reuse it for every stage
+        yield "status", "📚 Retrieving your past mistakes and expert solutions…"
+        vector = await embed_text_async(mistake_summary)
+        mark("embed")
+        yield "diagnosis", {"diagnosis": diagnosis_json, "embedding": vector}
+
+        # STEP 3 — A feedback cache hit needs neither past memories nor expert solutions, so it is
+        # checked first. Otherwise retrieve past memories, and search expert solutions only for
+        # unknown titles. An established profile stands in for most of the raw memories.
+        use_feedback_cache = feedback_cache.FEEDBACK_CACHE and use_cache
+        cached_feedback = None
+        if use_feedback_cache:
+            feedback_key = feedback_cache.cache_key(problem_title, language,
+                                                    memory_consolidation.error_types(diagnosis_json["issues"]))
+            cached_feedback = feedback_cache.get(feedback_key, vector)
+        profile = await asyncio.to_thread(student_profile.get_profile, student_id)
+        memory_top_k = PROFILE_MEMORY_TOP_K if profile and profile["attempts"] >= PROFILE_MIN_ATTEMPTS else 3
+        if cached_feedback is not None:
+            expert_lookup.cancel()
+            similar_memories, expert_context = [], ""
+        else:
+            expert_context = await expert_lookup
+            if expert_context is None:
+                similar_memories, expert_context = await asyncio.gather(
+                    asyncio.to_thread(retrieve_similar_memories_chroma, get_user_collection(student_id), vector, memory_top_k),
+                    asyncio.to_thread(retrieve_expert_context, vector, get_expert_search(), 3)
+                )
+            else:
+                similar_memories = await asyncio.to_thread(
+                    retrieve_similar_memories_chroma, get_user_collection(student_id), vector, memory_top_k
+                )
+
+        # STEP 4 — Build mentor context. Feedback shared through the feedback cache is written
+        # from the mistake alone, and the student's history becomes a locally rendered preamble
+        # (from the profile only on a hit, since no memories were retrieved for it).
+        if use_feedback_cache:
+            mentor_context = f"User's current mistake summary:\n{mistake_summary}"
+        else:
+            mentor_context = build_retrieval_context(similar_memories, mistake_summary, top_n=memory_top_k,
+                                                     profile_section=student_profile.render(profile))
+        mark("retrieve")
+
+        # STEP 5 — Generate mentor-style feedback
+        yield "status", "✍️ Writing feedback…"
+        if use_feedback_cache:
+            personal = feedback_cache.preamble(similar_memories, profile)
+            if personal:
+                yield "token", personal
+        first_token = True
+        feedback_parts = []
+        try:
+            if cached_feedback is not None:
+                timings["first_token"] = time.perf_counter() - started
+                first_token = False
+                yield "token", cached_feedback
+            elif stream:
+                async for token in stream_mentor_feedback(mentor_context, expert_context):
+                    if first_token:
+                        timings["first_token"] = time.perf_counter() - started
+                        first_token = False
+                    feedback_parts.append(token)
+                    yield "token", token
+            else:
+                feedback_parts.append(await get_mentor_feedback(mentor_context, expert_context))
+                yield "token", feedback_parts[-1]
+            if use_feedback_cache and feedback_parts:
+                feedback_cache.put(feedback_key, vector, "".join(feedback_parts),
+                                   build_feedback_messages(mentor_context, expert_context))
+        except llm_resilience.LLMUnavailable as e:
+            if not fallback:
+                raise
+            print(f"⚠️ Feedback LLM unavailable ({e}); answering with static analysis.")
+            telemetry.inc(f"{telemetry.PREFIX}_llm_fallbacks_total", help="Answers served by the local fallback",
+                          stage="feedback")
+            yield "token", fallback_feedback(problem_title, user_code, language, interrupted=not first_token)
+        mark("feedback")
+        timings["total"] = time.perf_counter() - started
     
-    return mentor_feedback
+    # STEP 6 — Store this new memory without blocking the response
+    if store:
+        run_in_background(asyncio.to_thread(store_memory, problem_title, diagnosis_json, vector, student_id))
+
+async def mentor_pipeline(problem_title, user_code, language="Python", use_cache=True, student_id=None):
+    """Runs full reasoning–retrieval–feedback pipeline."""
+    tokens = []
+    async for kind, text in mentor_pipeline_stream(problem_title, user_code, language, stream=False, use_cache=use_cache,
+                                                   student_id=student_id):
+        if kind == "token":
+            tokens.append(text)
+    return "".join(tokens)
+
+def resolve_student_id(student_id="", request=None):
+    """Who is submitting: the logged-in Gradio user, else the Student ID field, else the default student.
+
+    A logged-in user always gets their own partition, so the field cannot be
+    used to read or write another student's memories.
+    """
+    username = getattr(request, "username", None)
+    if username:
+        return memory_partitions.normalize_student_id(username)
+    return memory_partitions.normalize_student_id(student_id)
 
-def process_code(problem_title, user_code, language):
-    """Process user code and return mentor feedback"""
+async def process_code(problem_title, user_code, language, student_id=None):
+    """Process user code and stream mentor feedback as it is generated"""
     if not problem_title.strip() or not user_code.strip():
-        return "Please provide both a problem title and your code."
+        yield "Please provide both a problem title and your code."
+        return
     
     try:
-        # Format the user message similar to the notebook
-        user_msg = f"""
-Problem: {problem_title}
-Language: {language}
-My reasoning: Please analyze my approach
-Outcome: Needs analysis
-Code:
-{user_code}
-"""
-        
-        feedback = mentor_pipeline(problem_title, user_msg)
-        return feedback
+        if not is_ready():
+            yield "⏳ Warming up the mentor…"
+            await asyncio.to_thread(_ready.wait)
+
+        feedback = ""
+        async for kind, text in mentor_pipeline_stream(problem_title, user_code, language, student_id=student_id):
+            if kind == "status":
+                yield text
+            elif kind == "token":
+                feedback += text
+                yield feedback
     except Exception as e:
-        return f"Error processing your code: {str(e)}"
+        yield f"Error processing your code: {str(e)}"
 
 # Create Gradio interface
 def create_interface():
+    import gradio as gr
+
     with gr.Blocks(
         title="DSA Mentor",
         theme=gr.themes.Soft(),
@@ -227,6 +739,11 @@ def create_interface():
         with gr.Row():
             with gr.Column(scale=1):
                 gr.HTML('<div class="problem-section">')
+                student_id = gr.Textbox(
+                    label="Student ID",
+                    placeholder="Your name or student ID, so feedback builds on your own past mistakes (logged-in users always use their own)",
+                    lines=1
+                )
                 problem_title = gr.Textbox(
                     label="Problem Title",
                     placeholder="e.g., Two Sum, Remove Nth Node From End of List",
@@ -274,10 +791,15 @@ def create_interface():
             """)
         
         # Connect the submit button
+        async def submit(problem_title, user_code, language, student_id, request: gr.Request):
+            async for update in process_code(problem_title, user_code, language, resolve_student_id(student_id, request)):
+                yield update
+
         submit_btn.click(
-            fn=process_code,
-            inputs=[problem_title, user_code, language],
-            outputs=feedback_output
+            fn=submit,
+            inputs=[problem_title, user_code, language, student_id],
+            outputs=feedback_output,
+            api_name="process_code"
         )
         
         # Add some example data
@@ -293,7 +815,11 @@ def create_interface():
 
 if __name__ == "__main__":
     # Create and launch the interface
+    start_warm_up()
+    telemetry.start_metrics_server()
+    memory_consolidation.start_worker(get_user_collection)
     interface = create_interface()
+    interface.queue(default_concurrency_limit=GRADIO_CONCURRENCY)
     interface.launch(
         server_name="127.0.0.1",
         server_port=7860,
@@ -0,0 +1,273 @@
+"""
+Tail-latency controls for upstream LLM calls
+Every diagnosis and feedback call goes through call():
+
+- a per-stage deadline bounds the whole call, retries included, and each
+  attempt gets at most the stage's attempt timeout of it: LLM_ATTEMPT_TIMEOUT
+  for diagnoses, LLM_FEEDBACK_ATTEMPT_TIMEOUT for a complete non-streamed
+  feedback (streamed feedback ends an attempt at the first token, so it uses
+  LLM_ATTEMPT_TIMEOUT, and later tokens must keep arriving within
+  LLM_STREAM_IDLE_TIMEOUT);
+- timeouts, connection errors, 429s and 5xxs are retried with full-jitter
+  exponential backoff, but only while the process-wide retry budget allows,
+  so a struggling upstream is not hit with a retry storm;
+- optionally, a second (hedged) request is sent when the first has not
+  answered after the stage's recent p95 latency, and the first answer wins;
+- a circuit breaker opens after LLM_BREAKER_FAILURES consecutive failures and
+  fails calls immediately for LLM_BREAKER_COOLDOWN seconds, then lets one
+  probe through.
+
+When a call cannot be completed it raises LLMUnavailable, and the pipeline
+falls back to the local static analysis.
+"""
+
+import os
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+import telemetry
+
+LLM_DIAGNOSIS_DEADLINE = float(os.getenv("LLM_DIAGNOSIS_DEADLINE", "20"))
+LLM_FEEDBACK_DEADLINE = float(os.getenv("LLM_FEEDBACK_DEADLINE", "60"))
+LLM_ATTEMPT_TIMEOUT = float(os.getenv("LLM_ATTEMPT_TIMEOUT", "15"))
+# A non-streamed feedback attempt has to produce the whole completion
+LLM_FEEDBACK_ATTEMPT_TIMEOUT = float(os.getenv("LLM_FEEDBACK_ATTEMPT_TIMEOUT", str(LLM_FEEDBACK_DEADLINE)))
+LLM_STREAM_IDLE_TIMEOUT = float(os.getenv("LLM_STREAM_IDLE_TIMEOUT", "10"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BACKOFF = float(os.getenv("LLM_RETRY_BACKOFF", "0.25"))
+LLM_RETRY_BUDGET = float(os.getenv("LLM_RETRY_BUDGET", "0.2"))
+# "off", "p95" (the stage's recent 95th percentile latency) or a fixed delay in milliseconds
+LLM_HEDGE_AFTER = os.getenv("LLM_HEDGE_AFTER", "off")
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+STAGE_DEADLINES = {"diagnosis": LLM_DIAGNOSIS_DEADLINE, "feedback": LLM_FEEDBACK_DEADLINE}
+STAGE_ATTEMPT_TIMEOUTS = {"diagnosis": LLM_ATTEMPT_TIMEOUT, "feedback": LLM_FEEDBACK_ATTEMPT_TIMEOUT}
+# Hedging needs this many observed latencies before p95 means anything
+MIN_HEDGE_SAMPLES = 20
+LATENCY_WINDOW = 500
+MAX_BACKOFF = 5.0
+
+class LLMUnavailable(Exception):
+    """The upstream LLM could not answer within the deadline, retries or breaker state allowed."""
+
+class RetryBudget:
+    """Every call earns `ratio` of a retry and every retry or hedge spends one, capped at `burst`."""
+
+    def __init__(self, ratio=LLM_RETRY_BUDGET, burst=10.0):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = burst
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_spend(self):
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+class LatencyTracker:
+    """Sliding window of recent successful call latencies per stage."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self._samples.setdefault(stage, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, stage, q):
+        with self._lock:
+            samples = sorted(self._samples.get(stage, ()))
+        if len(samples) < MIN_HEDGE_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * q / 100))]
+
+class CircuitBreaker:
+    """closed -> open after `failures` consecutive failures -> half-open after `cooldown` -> closed on success."""
+
+    def __init__(self, failures=LLM_BREAKER_FAILURES, cooldown=LLM_BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.state = "closed"
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = "half-open"
+                self._probing = False
+            if self.state == "half-open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._consecutive = 0
+            self._probing = False
+            self.state = "closed"
+
+    def release(self):
+        """Give up a half-open probe that ended without an answer either way, e.g. when cancelled."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive += 1
+            self._probing = False
+            if self.state == "half-open" or self._consecutive >= self.failures:
+                if self.state != "open":
+                    print(f"🔌 LLM circuit breaker opened after {self._consecutive} consecutive failures")
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+budget = RetryBudget()
+latencies = LatencyTracker()
+breaker = CircuitBreaker()
+
+def reset():
+    """Fresh budget, latency history and breaker (used by tests and benchmarks)."""
+    global budget, latencies, breaker
+    budget, latencies, breaker = RetryBudget(), LatencyTracker(), CircuitBreaker()
+
+def is_retryable(error):
+    """Timeouts, dropped connections, rate limits and server errors are worth another attempt."""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    try:
+        import openai
+    except ImportError:
+        return False
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+def hedge_delay(stage):
+    """Seconds to wait before hedging a call of this stage, or None when hedging is off."""
+    setting = LLM_HEDGE_AFTER.strip().lower()
+    if setting in ("", "off", "0"):
+        return None
+    if setting.startswith("p"):
+        return latencies.percentile(stage, float(setting[1:]))
+    return float(setting) / 1000
+
+async def _discard(task, cleanup):
+    """Cancel a losing attempt, releasing its result if it finished anyway."""
+    task.cancel()
+    try:
+        result = await task
+    except BaseException:
+        return
+    if cleanup is not None:
+        await cleanup(result)
+
+async def _attempt(stage, request, timeout, cleanup):
+    """One attempt, hedged with a second request when the first is slower than usual."""
+    delay = hedge_delay(stage)
+    first = asyncio.ensure_future(request())
+    if delay is None or delay >= timeout:
+        return await asyncio.wait_for(first, timeout)
+
+    tasks = [first]
+    hedged = False
+    started = time.monotonic()
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done and budget.try_spend():
+            telemetry.inc(f"{telemetry.PREFIX}_llm_hedges_total", help="Hedged LLM requests sent", stage=stage)
+            tasks.append(asyncio.ensure_future(request()))
+            hedged = True
+        while tasks:
+            remaining = timeout - (time.monotonic() - started)
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            done, _ = await asyncio.wait(tasks, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                raise asyncio.TimeoutError()
+            for task in done:
+                tasks.remove(task)
+                if task.exception() is None:
+                    if hedged:
+                        telemetry.inc(f"{telemetry.PREFIX}_llm_hedge_wins_total", help="Hedged calls by winning request",
+                                      stage=stage, winner="first" if task is first else "hedge")
+                    return task.result()
+                # Keep waiting for the other request; re-raise only when none is left
+                if not tasks:
+                    raise task.exception()
+        raise asyncio.TimeoutError()
+    finally:
+        for task in tasks:
+            await _discard(task, cleanup)
+
+async def call(stage, request, deadline=None, cleanup=None, attempt_timeout=None):
+    """Run `request` (a coroutine function) under the stage's deadline, retry, hedging and breaker policy.
+
+    `attempt_timeout` overrides the stage's per-attempt timeout, e.g. for a
+    request that returns at its first streamed token. `cleanup` releases the result of a hedged request that lost the race,
+    e.g. closes an open stream. Raises LLMUnavailable when the upstream
+    cannot answer; non-retryable errors such as a bad request are raised as is.
+    """
+    if not breaker.allow():
+        telemetry.inc(f"{telemetry.PREFIX}_llm_rejected_total", help="LLM calls rejected by the open circuit breaker",
+                      stage=stage)
+        raise LLMUnavailable(f"{stage}: circuit breaker is open")
+    budget.deposit()
+    deadline = STAGE_DEADLINES.get(stage, LLM_ATTEMPT_TIMEOUT) if deadline is None else deadline
+    if attempt_timeout is None:
+        attempt_timeout = STAGE_ATTEMPT_TIMEOUTS.get(stage, LLM_ATTEMPT_TIMEOUT)
+    ends_at = time.monotonic() + deadline
+    attempt = 0
+    while True:
+        started = time.monotonic()
+        try:
+            result = await _attempt(stage, request, min(attempt_timeout, ends_at - started), cleanup)
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception as e:
+            if not is_retryable(e):
+                # The upstream answered, it just rejected this request
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+            attempt += 1
+            error = type(e).__name__
+            backoff = random.uniform(0, min(MAX_BACKOFF, LLM_RETRY_BACKOFF * 2 ** attempt))
+            if attempt > LLM_MAX_RETRIES or time.monotonic() + backoff >= ends_at:
+                raise LLMUnavailable(f"{stage}: gave up after {attempt} attempts ({error})") from e
+            if not breaker.allow():
+                raise LLMUnavailable(f"{stage}: circuit breaker opened ({error})") from e
+            if not budget.try_spend():
+                telemetry.inc(f"{telemetry.PREFIX}_llm_retry_budget_exhausted_total",
+                              help="LLM retries skipped because the retry budget was spent", stage=stage)
+                raise LLMUnavailable(f"{stage}: retry budget exhausted ({error})") from e
+            telemetry.inc(f"{telemetry.PREFIX}_llm_retries_total", help="Retried LLM calls", stage=stage, error=error)
+            await asyncio.sleep(backoff)
+            continue
+        breaker.record_success()
+        latencies.record(stage, time.monotonic() - started)
+        return result
+
+def _breaker_metrics():
+    return [(f"{telemetry.PREFIX}_llm_breaker_open", {}, 0 if breaker.state == "closed" else 1),
+            (f"{telemetry.PREFIX}_llm_retry_budget_tokens", {}, budget.tokens)]
+
+telemetry.register_collector(_breaker_metrics)
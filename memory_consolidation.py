@@ -0,0 +1,234 @@
+"""
+Background consolidation of near-duplicate mistake memories
+Every submission stores a new memory, so a student who keeps making the same
+mistake accumulates near-identical entries. Consolidation clusters a student's
+memories per problem: two memories belong together when their embeddings are
+close and they share an error pattern. Each cluster is merged into one
+summarized record with a repeat count and first/last seen times.
+
+Runs are incremental. A pass fetches only the memories not yet consolidated
+(a metadata filter) and compares each with its nearest consolidated records
+(a filtered vector query), so its cost follows the new memories rather than
+the student's whole history. Only records that actually absorbed new memories
+are re-embedded. Partitions are queued as memories are stored and drained by a
+background thread.
+"""
+
+import os
+import re
+import ast
+import time
+import datetime
+import threading
+import numpy as np
+import embedding_service
+from context_builder import truncate_to_tokens
+
+CONSOLIDATION_SIMILARITY = float(os.getenv("CONSOLIDATION_SIMILARITY", "0.9"))
+CONSOLIDATION_INTERVAL = int(os.getenv("CONSOLIDATION_INTERVAL", "300"))
+# Keep merged summaries and issue lists short enough for the prompt budget
+MAX_SUMMARY_TOKENS = 80
+MAX_MERGED_ISSUES = 6
+# Metadata "source" of memories mirrored from memory_manager by memory_sync
+SYNCED_SOURCE = "memory_manager"
+# Memories a pass works on; those synced from memory_manager are owned by memory_sync
+UNCONSOLIDATED = {"$and": [{"consolidated": {"$ne": True}}, {"source": {"$ne": SYNCED_SOURCE}}]}
+# Consolidated records compared with each new memory
+ANCHOR_CANDIDATES = 16
+
+_dirty = set()
+_dirty_lock = threading.Lock()
+_stats = {"runs": 0, "merged": 0, "removed": 0, "marked": 0}
+
+def now_iso():
+    return datetime.datetime.now().isoformat(timespec="seconds")
+
+def error_types(issues):
+    """Normalized error pattern names from a diagnosis issue list."""
+    names = set()
+    for issue in issues or []:
+        if isinstance(issue, dict):
+            name = issue.get("type") or issue.get("issue") or ""
+            name = re.sub(r"[\s_]+", "-", str(name).strip().lower())
+            if name:
+                names.add(name)
+    return sorted(names)
+
+def parse_document(document):
+    """Recover (summary, issues) from a stored memory document."""
+    summary = re.search(r"^Mistake Summary: (.*)$", document or "", re.MULTILINE)
+    issues = re.search(r"^Issues: (.*)$", document or "", re.MULTILINE)
+    try:
+        issues = ast.literal_eval(issues.group(1)) if issues else []
+    except (ValueError, SyntaxError):
+        issues = []
+    return (summary.group(1).strip() if summary else ""), issues if isinstance(issues, list) else []
+
+def merged_document(problem_title, summaries, issues, count, last_seen):
+    summary = truncate_to_tokens(" / ".join(summaries), MAX_SUMMARY_TOKENS)
+    return (f"Problem: {problem_title}\nMistake Summary: {summary}\nIssues: {issues[:MAX_MERGED_ISSUES]}\n"
+            f"Seen {count} times, last on {last_seen[:10]}")
+
+def _title_from_document(document):
+    match = re.match(r"Problem: (.*)", document or "")
+    return match.group(1).strip() if match else ""
+
+class _Record:
+    def __init__(self, mid, document, metadata, vector):
+        self.id = mid
+        self.document = document
+        self.metadata = dict(metadata or {})
+        self.vector = vector
+        self.summary, self.issues = parse_document(document)
+        self.patterns = set(self.metadata.get("error_types", "").split(",")) - {""} or set(error_types(self.issues))
+        self.title = self.metadata.get("problem_title") or _title_from_document(document)
+        self.count = int(self.metadata.get("count", 1))
+        seen = self.metadata.get("created_at") or now_iso()
+        self.first_seen = self.metadata.get("first_seen", seen)
+        self.last_seen = self.metadata.get("last_seen", seen)
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def _cluster(records, threshold):
+    """Attach every new record to the closest similar cluster of its problem, oldest first."""
+    clusters = [[r] for r in records if r.metadata.get("consolidated")]
+    new = sorted((r for r in records if not r.metadata.get("consolidated")), key=lambda r: r.first_seen)
+    for record in new:
+        best, best_score = None, threshold
+        for cluster in clusters:
+            anchor = cluster[0]
+            if anchor.title.strip().lower() != record.title.strip().lower():
+                continue
+            # Share an error pattern, unless neither has any
+            if (anchor.patterns or record.patterns) and not (anchor.patterns & record.patterns):
+                continue
+            score = float(anchor.vector @ record.vector)
+            if score >= best_score:
+                best, best_score = cluster, score
+        if best is None:
+            clusters.append([record])
+        else:
+            best.append(record)
+    return clusters
+
+def _clusters_changed(clusters):
+    """Clusters that contain at least one memory not yet consolidated."""
+    return [c for c in clusters if any(not r.metadata.get("consolidated") for r in c)]
+
+def _anchors(collection, new_records, n_results=ANCHOR_CANDIDATES):
+    """Consolidated records nearest to any of the new memories: the only clusters they can join."""
+    found = collection.query(
+        query_embeddings=[r.vector.tolist() for r in new_records],
+        n_results=n_results,
+        where={"consolidated": True},
+        include=["embeddings", "documents", "metadatas"]
+    )
+    anchors = {}
+    for ids, documents, metadatas, embeddings in zip(found["ids"], found["documents"], found["metadatas"],
+                                                     found["embeddings"]):
+        if len(ids):
+            for mid, doc, meta, vec in zip(ids, documents, metadatas, _normalize(embeddings)):
+                anchors.setdefault(mid, _Record(mid, doc, meta, vec))
+    return list(anchors.values())
+
+def consolidate_partition(collection, threshold=CONSOLIDATION_SIMILARITY):
+    """Merge near-duplicate memories in one student's partition; returns counts of what changed."""
+    data = collection.get(where=UNCONSOLIDATED, include=["embeddings", "documents", "metadatas"])
+    result = {"merged": 0, "removed": 0, "marked": 0}
+    if not len(data["ids"]):
+        return result
+    new_records = [_Record(mid, doc, meta, vec) for mid, doc, meta, vec
+                   in zip(data["ids"], data["documents"], data["metadatas"], _normalize(data["embeddings"]))]
+    records = _anchors(collection, new_records) + new_records
+
+    merged, singles, removed = [], [], []
+    for cluster in _clusters_changed(_cluster(records, threshold)):
+        if len(cluster) == 1:
+            singles.append(cluster[0])
+            continue
+        anchor = cluster[0]
+        summaries, issues, seen_issues = [], [], set()
+        # Most recent first, so the newest wording leads the summary
+        for record in sorted(cluster, key=lambda r: r.last_seen, reverse=True):
+            if record.summary and record.summary not in summaries:
+                summaries.append(record.summary)
+            for issue in record.issues:
+                key = repr(sorted(issue.items())) if isinstance(issue, dict) else repr(issue)
+                if key not in seen_issues:
+                    seen_issues.add(key)
+                    issues.append(issue)
+        count = sum(r.count for r in cluster)
+        first_seen = min(r.first_seen for r in cluster)
+        last_seen = max(r.last_seen for r in cluster)
+        patterns = sorted(set().union(*(r.patterns for r in cluster)))
+        metadata = dict(anchor.metadata, consolidated=True, count=count, first_seen=first_seen,
+                        last_seen=last_seen, error_types=",".join(patterns))
+        metadata.pop("created_at", None)
+        merged.append((anchor.id, merged_document(anchor.title, summaries, issues, count, last_seen), metadata))
+        removed.extend(r.id for r in cluster[1:])
+
+    if merged:
+        # Only merged records need a new embedding
+        summaries = [parse_document(document)[0] for _, document, _ in merged]
+        collection.upsert(
+            ids=[mid for mid, _, _ in merged],
+            documents=[document for _, document, _ in merged],
+            metadatas=[metadata for _, _, metadata in merged],
+            embeddings=embedding_service.embed_many(summaries, bulk=True)
+        )
+    if removed:
+        collection.delete(ids=removed)
+    if singles:
+        collection.update(
+            ids=[r.id for r in singles],
+            metadatas=[dict(r.metadata, consolidated=True, count=r.count, first_seen=r.first_seen,
+                            last_seen=r.last_seen, error_types=",".join(sorted(r.patterns)))
+                       for r in singles]
+        )
+    result.update(merged=len(merged), removed=len(removed), marked=len(singles))
+    return result
+
+def mark_dirty(student_id):
+    """Queue a student's partition for the next consolidation pass."""
+    with _dirty_lock:
+        _dirty.add(student_id)
+
+def run_pending(get_partition, threshold=CONSOLIDATION_SIMILARITY):
+    """Consolidate every queued partition once."""
+    with _dirty_lock:
+        pending = list(_dirty)
+        _dirty.clear()
+    for student_id in pending:
+        try:
+            result = consolidate_partition(get_partition(student_id), threshold)
+        except Exception as e:
+            print(f"⚠️ Memory consolidation failed for {student_id!r}: {e}")
+            mark_dirty(student_id)
+            continue
+        _stats["runs"] += 1
+        for key in ("merged", "removed", "marked"):
+            _stats[key] += result[key]
+        if result["removed"]:
+            print(f"🧹 Consolidated {result['removed']} duplicate memories for {student_id!r}")
+    return len(pending)
+
+def start_worker(get_partition, interval=CONSOLIDATION_INTERVAL):
+    """Drain the queue every `interval` seconds in a daemon thread; 0 disables it."""
+    if interval <= 0:
+        return None
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            run_pending(get_partition)
+
+    thread = threading.Thread(target=loop, name="dsa-mentor-consolidation", daemon=True)
+    thread.start()
+    return thread
+
+def consolidation_stats():
+    return dict(_stats, pending=len(_dirty))
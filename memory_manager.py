@@ -1,8 +1,116 @@
-import json, os, uuid, datetime
+import json, os, re, heapq, uuid, datetime, sqlite3, threading
+from collections import Counter
 
 MEMORY_FILE = "mentor_memory.json"
+MEMORY_DB = os.getenv("MEMORY_DB", "mentor_memory.db")
 
-def load_memory():
+_local = threading.local()
+
+# In-memory inverted index used by search_similar. Posting lists are dicts so
+# they keep memories in recency order; "titles" maps each distinct lowercased
+# title to its memories and "title_words" maps a word to the titles containing
+# it. "seq" is the store's change sequence the index reflects, and a mismatch
+# (e.g. a write from another process) triggers a rebuild on the next search.
+_index_lock = threading.Lock()
+_index = {"path": None, "seq": None, "clock": 0, "entries": {}, "patterns": {}, "titles": {}, "title_words": {}}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS memories (
+    memory_id TEXT PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    problem_title TEXT NOT NULL,
+    title_norm TEXT NOT NULL,
+    user_code TEXT,
+    outcome TEXT,
+    error_patterns TEXT NOT NULL,
+    notes TEXT,
+    fix_attempts INTEGER NOT NULL DEFAULT 1,
+    updated_seq INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_memories_title_norm ON memories(title_norm);
+
+-- Deleted memory ids, kept until every sync target has seen the delete
+CREATE TABLE IF NOT EXISTS deleted_memories (
+    memory_id TEXT PRIMARY KEY,
+    deleted_seq INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS error_patterns (
+    pattern TEXT NOT NULL,
+    memory_id TEXT NOT NULL REFERENCES memories(memory_id) ON DELETE CASCADE,
+    PRIMARY KEY (pattern, memory_id)
+);
+CREATE INDEX IF NOT EXISTS idx_error_patterns_memory ON error_patterns(memory_id);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+def _normalize_title(problem_title):
+    return problem_title.strip().lower()
+
+def _title_words(problem_title):
+    return set(re.findall(r"\w+", problem_title.lower()))
+
+def _connect():
+    """Return this thread's connection, creating and migrating the store if needed."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.path == MEMORY_DB:
+        return conn
+
+    conn = sqlite3.connect(MEMORY_DB, isolation_level=None, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    _add_change_tracking(conn)
+    conn.executescript(SCHEMA)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_memories_updated_seq ON memories(updated_seq)")
+    _local.conn = conn
+    _local.path = MEMORY_DB
+    _migrate_json(conn)
+    return conn
+
+def _add_change_tracking(conn):
+    """Give stores created before change tracking an updated_seq column; existing rows count as changed."""
+    columns = [r["name"] for r in conn.execute("PRAGMA table_info(memories)").fetchall()]
+    if columns and "updated_seq" not in columns:
+        conn.execute("ALTER TABLE memories ADD COLUMN updated_seq INTEGER NOT NULL DEFAULT 1")
+
+def _migrate_json(conn):
+    """One-time import of the legacy mentor_memory.json file."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+            conn.execute("COMMIT")
+            return
+        memories = _load_json_file()
+        seq = _bump_seq(conn)
+        for m in memories:
+            _insert(conn, m, seq)
+        conn.execute("INSERT INTO meta (key, value) VALUES ('json_migrated', ?)", (str(len(memories)),))
+        conn.execute("COMMIT")
+        if memories:
+            print(f"✅ Migrated {len(memories)} memories from {MEMORY_FILE} to {MEMORY_DB}")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+def _bump_seq(conn):
+    """Advance the store's change sequence inside the current write transaction."""
+    conn.execute(
+        """INSERT INTO meta (key, value) VALUES ('change_seq', '1')
+           ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"""
+    )
+    return _current_seq(conn)
+
+def _current_seq(conn):
+    row = conn.execute("SELECT value FROM meta WHERE key = 'change_seq'").fetchone()
+    return int(row["value"]) if row else 0
+
+def _load_json_file():
     if not os.path.exists(MEMORY_FILE):
         return []
     try:
@@ -12,18 +120,77 @@ def load_memory():
                 return []
             return json.loads(content)
     except (json.JSONDecodeError, ValueError):
-        print("⚠️ Memory file corrupted or empty JSON. Resetting it.")
+        print("⚠️ Memory file corrupted or empty JSON. Skipping migration.")
         return []
-    except Exception as e:
+
+def _insert(conn, m, seq):
+    """Write one memory as changed at change sequence `seq`."""
+    conn.execute(
+        """INSERT OR REPLACE INTO memories
+           (memory_id, timestamp, problem_title, title_norm, user_code, outcome, error_patterns, notes, fix_attempts,
+            updated_seq)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        (
+            m["memory_id"], m["timestamp"], m["problem_title"], _normalize_title(m["problem_title"]),
+            m.get("user_code", ""), m.get("outcome", ""), json.dumps(m.get("error_patterns", [])),
+            m.get("notes", ""), m.get("fix_attempts", 1), seq
+        )
+    )
+    conn.execute("DELETE FROM deleted_memories WHERE memory_id = ?", (m["memory_id"],))
+    _index_patterns(conn, m["memory_id"], m.get("error_patterns", []))
+
+def _index_patterns(conn, memory_id, error_patterns):
+    conn.execute("DELETE FROM error_patterns WHERE memory_id = ?", (memory_id,))
+    conn.executemany(
+        "INSERT OR IGNORE INTO error_patterns (pattern, memory_id) VALUES (?, ?)",
+        [(p, memory_id) for p in error_patterns]
+    )
+
+def _row_to_entry(row):
+    return {
+        "memory_id": row["memory_id"],
+        "timestamp": row["timestamp"],
+        "problem_title": row["problem_title"],
+        "user_code": row["user_code"],
+        "outcome": row["outcome"],
+        "error_patterns": json.loads(row["error_patterns"]),
+        "notes": row["notes"],
+        "fix_attempts": row["fix_attempts"]
+    }
+
+def load_memory():
+    try:
+        rows = _connect().execute("SELECT * FROM memories ORDER BY rowid").fetchall()
+        return [_row_to_entry(r) for r in rows]
+    except sqlite3.DatabaseError as e:
         print(f"⚠️ Unexpected error while loading memory: {e}")
         return []
 
 def save_memory(memories):
-    with open(MEMORY_FILE, "w", encoding="utf-8") as f:
-        json.dump(memories, f, indent=2)
+    """Replace the whole store with the given list of memories."""
+    conn = _connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        seq = _bump_seq(conn)
+        kept = {m["memory_id"] for m in memories}
+        conn.executemany(
+            "INSERT OR REPLACE INTO deleted_memories (memory_id, deleted_seq) VALUES (?, ?)",
+            [(r["memory_id"], seq) for r in conn.execute("SELECT memory_id FROM memories").fetchall()
+             if r["memory_id"] not in kept]
+        )
+        conn.execute("DELETE FROM memories")
+        for m in memories:
+            _insert(conn, m, seq)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+def get_memory(memory_id):
+    row = _connect().execute("SELECT * FROM memories WHERE memory_id = ?", (memory_id,)).fetchone()
+    return _row_to_entry(row) if row else None
 
 def create_memory_entry(problem_title, user_code, outcome, error_patterns, notes):
-    memories = load_memory()
     memory_id = str(uuid.uuid4())[:8]
     entry = {
         "memory_id": memory_id,
@@ -35,39 +202,260 @@ def create_memory_entry(problem_title, user_code, outcome, error_patterns, notes
         "notes": notes,
         "fix_attempts": 1
     }
-    memories.append(entry)
-    save_memory(memories)
+    conn = _connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        seq = _bump_seq(conn)
+        _insert(conn, entry, seq)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    _index_after_write(seq, entry)
     return memory_id
 
 def update_memory_entry(memory_id, new_error_patterns=None, new_notes=None):
-    memories = load_memory()
-    for m in memories:
-        if m["memory_id"] == memory_id:
+    conn = _connect()
+    # BEGIN IMMEDIATE takes the write lock up front so concurrent updates cannot interleave
+    conn.execute("BEGIN IMMEDIATE")
+    m = None
+    try:
+        row = conn.execute("SELECT * FROM memories WHERE memory_id = ?", (memory_id,)).fetchone()
+        if row is not None:
+            m = _row_to_entry(row)
             if new_error_patterns:
                 m["error_patterns"] = list(set(m["error_patterns"] + new_error_patterns))
             if new_notes:
                 m["notes"] = (m.get("notes", "") + "\n" + new_notes).strip()
             m["fix_attempts"] = m.get("fix_attempts", 0) + 1
             m["timestamp"] = datetime.datetime.utcnow().isoformat()
-    save_memory(memories)
+            seq = _bump_seq(conn)
+            conn.execute(
+                """UPDATE memories SET error_patterns = ?, notes = ?, fix_attempts = ?, timestamp = ?, updated_seq = ?
+                   WHERE memory_id = ?""",
+                (json.dumps(m["error_patterns"]), m["notes"], m["fix_attempts"], m["timestamp"], seq, memory_id)
+            )
+            if new_error_patterns:
+                _index_patterns(conn, memory_id, m["error_patterns"])
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    if m is not None:
+        _index_after_write(seq, m)
     return True
 
-def search_similar(problem_title, keywords):
-    """Naive text search for similar problems / error patterns"""
-    memories = load_memory()
-    results = []
-    for m in memories:
-        if problem_title.lower() in m["problem_title"].lower() or any(k in m["error_patterns"] for k in keywords):
-            results.append(m)
+def delete_memory_entry(memory_id):
+    """Delete a memory, leaving a tombstone so sync targets drop it too. Returns False if it did not exist."""
+    conn = _connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        deleted = conn.execute("DELETE FROM memories WHERE memory_id = ?", (memory_id,)).rowcount > 0
+        if deleted:
+            seq = _bump_seq(conn)
+            conn.execute(
+                "INSERT OR REPLACE INTO deleted_memories (memory_id, deleted_seq) VALUES (?, ?)", (memory_id, seq)
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    if deleted:
+        with _index_lock:
+            if _index["path"] == MEMORY_DB and _index["seq"] == seq - 1:
+                _index_remove(memory_id)
+                _index["seq"] = seq
+            else:
+                _index["seq"] = None
+    return deleted
+
+def changes_since(seq):
+    """Memories written and ids deleted after change sequence `seq`, read from one snapshot.
+
+    Returns (current_seq, changed_entries, deleted_ids).
+    """
+    conn = _connect()
+    conn.execute("BEGIN")
+    try:
+        current = _current_seq(conn)
+        rows = conn.execute(
+            "SELECT * FROM memories WHERE updated_seq > ? ORDER BY updated_seq", (seq,)
+        ).fetchall()
+        deleted = conn.execute(
+            "SELECT memory_id FROM deleted_memories WHERE deleted_seq > ? ORDER BY deleted_seq", (seq,)
+        ).fetchall()
+    finally:
+        conn.execute("COMMIT")
+    return current, [dict(_row_to_entry(r), updated_seq=r["updated_seq"]) for r in rows], [r["memory_id"] for r in deleted]
+
+def get_sync_watermark(target):
+    """Change sequence a sync target has caught up to (0 if it never synced)."""
+    row = _connect().execute("SELECT value FROM meta WHERE key = ?", (f"synced_seq:{target}",)).fetchone()
+    return int(row["value"]) if row else 0
+
+def set_sync_watermark(target, seq):
+    """Record that `target` reflects every change up to `seq`, and drop tombstones all targets have seen."""
+    conn = _connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (f"synced_seq:{target}", str(seq))
+        )
+        row = conn.execute(
+            "SELECT MIN(CAST(value AS INTEGER)) AS seq FROM meta WHERE key LIKE 'synced_seq:%'"
+        ).fetchone()
+        conn.execute("DELETE FROM deleted_memories WHERE deleted_seq <= ?", (row["seq"],))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+def _index_put(m):
+    """Add or refresh one memory in the inverted index (caller holds _index_lock)."""
+    memory_id = m["memory_id"]
+    _index_remove(memory_id)
+    _index["clock"] += 1
+    patterns = tuple(dict.fromkeys(m["error_patterns"]))
+    title = m["problem_title"].lower()
+    _index["entries"][memory_id] = (patterns, title, _index["clock"], m.get("fix_attempts", 1))
+    for p in patterns:
+        _index["patterns"].setdefault(p, {})[memory_id] = None
+    if title not in _index["titles"]:
+        for word in _title_words(title):
+            _index["title_words"].setdefault(word, set()).add(title)
+    _index["titles"].setdefault(title, {})[memory_id] = None
+
+def _index_remove(memory_id):
+    old = _index["entries"].pop(memory_id, None)
+    if old is None:
+        return
+    for key, postings in ((old[0], _index["patterns"]), ((old[1],), _index["titles"])):
+        for k in key:
+            postings[k].pop(memory_id, None)
+            if not postings[k]:
+                del postings[k]
+    if old[1] not in _index["titles"]:
+        for word in _title_words(old[1]):
+            _index["title_words"][word].discard(old[1])
+            if not _index["title_words"][word]:
+                del _index["title_words"][word]
+
+def _index_after_write(seq, m):
+    """Apply a committed write to the index, or mark it stale if writes raced."""
+    with _index_lock:
+        if _index["path"] == MEMORY_DB and _index["seq"] == seq - 1:
+            _index_put(m)
+            _index["seq"] = seq
+        else:
+            _index["seq"] = None
+
+def _ensure_index(conn):
+    if _index["path"] == MEMORY_DB and _index["seq"] == _current_seq(conn):
+        return
+    # Read the sequence and the rows from one snapshot so they agree
+    conn.execute("BEGIN")
+    try:
+        seq = _current_seq(conn)
+        rows = conn.execute(
+            "SELECT memory_id, problem_title, error_patterns, fix_attempts FROM memories ORDER BY timestamp"
+        ).fetchall()
+    finally:
+        conn.execute("COMMIT")
+    _index.update(path=MEMORY_DB, seq=seq, clock=0, entries={}, patterns={}, titles={}, title_words={})
+    for r in rows:
+        _index_put({
+            "memory_id": r["memory_id"],
+            "problem_title": r["problem_title"],
+            "error_patterns": json.loads(r["error_patterns"]),
+            "fix_attempts": r["fix_attempts"]
+        })
+
+def _title_matches(problem_title):
+    """Memories whose title contains problem_title, case-insensitively (caller holds _index_lock).
+
+    Only the words strictly inside the query are known to be whole title words;
+    the first and last may be cut off ("subarr", "Kadane"), so they are not used
+    to narrow the distinct titles that get the substring test.
+    """
+    query = problem_title.lower()
+    inner = re.findall(r"\w+", query)[1:-1]
+    titles = (min((_index["title_words"].get(w, set()) for w in inner), key=len) if inner
+              else _index["titles"].keys())
+    return {mid for title in titles if query in title for mid in _index["titles"][title]}
+
+def _top_full_matches(title_hits, keywords, limit):
+    """Fast path: newest memories matching every keyword, title matches first.
+
+    Posting lists are in recency order, so walking the smallest one backwards
+    yields the best-ranked memories first and usually stops after `limit` hits.
+    """
+    entries = _index["entries"]
+    postings = sorted((_index["patterns"].get(k, {}) for k in keywords), key=len)
+    if keywords and not postings[0]:
+        return []
+
+    results = sorted(
+        (mid for mid in title_hits if all(mid in p for p in postings)),
+        key=lambda mid: entries[mid][2:], reverse=True
+    )[:limit]
+    if postings:
+        for mid in reversed(postings[0]):
+            if len(results) >= limit:
+                break
+            if mid not in title_hits and all(mid in p for p in postings[1:]):
+                results.append(mid)
     return results
 
+def search_similar(problem_title, keywords, limit=None):
+    """Ranked search for similar problems / error patterns using an inverted index.
 
-def find_existing_memory(problem_title):
-    """ Return memory_id if a memory entry for this problem already exists."""
-    memories = load_memory()
-    for m in memories:
-        if m["problem_title"].strip().lower() == problem_title.strip().lower():
-            return m["memory_id"]
-    return None
+    A memory matches when problem_title is a case-insensitive substring of its
+    title or it shares an error pattern with keywords. Results are ordered by
+    the number of matched patterns, then title match, recency and fix_attempts.
+    """
+    keywords = list(dict.fromkeys(keywords))
+    conn = _connect()
+
+    with _index_lock:
+        _ensure_index(conn)
+
+        title_hits = _title_matches(problem_title)
+
+        entries = _index["entries"]
+        ranked = []
+        if limit is not None:
+            ranked = _top_full_matches(title_hits, keywords, limit)
 
+        if limit is None or len(ranked) < limit:
+            # Slow path: score every candidate
+            matched = Counter()
+            for k in keywords:
+                matched.update(_index["patterns"].get(k, {}).keys())
 
+            def rank(mid):
+                _, _, recency, fix_attempts = entries[mid]
+                return (matched[mid], mid in title_hits, recency, fix_attempts)
+
+            candidates = title_hits.union(matched).difference(ranked)
+            if limit is None:
+                ranked += sorted(candidates, key=rank, reverse=True)
+            else:
+                ranked += heapq.nlargest(limit - len(ranked), candidates, key=rank)
+
+    if not ranked:
+        return []
+    rows = conn.execute(
+        f"SELECT * FROM memories WHERE memory_id IN ({','.join('?' * len(ranked))})", ranked
+    ).fetchall()
+    by_id = {r["memory_id"]: _row_to_entry(r) for r in rows}
+    return [by_id[mid] for mid in ranked if mid in by_id]
+
+
+def find_existing_memory(problem_title):
+    """ Return memory_id if a memory entry for this problem already exists."""
+    row = _connect().execute(
+        "SELECT memory_id FROM memories WHERE title_norm = ? ORDER BY rowid LIMIT 1",
+        (_normalize_title(problem_title),)
+    ).fetchone()
+    return row["memory_id"] if row else None
@@ -0,0 +1,120 @@
+"""
+Per-student partitions of the user memory store
+Every student's mistake memories live in their own partition: a ChromaDB
+collection named after a hash of the student id, or one compact store file per
+student when MEMORY_VECTOR_STORAGE is float16/int8. Retrieval only touches the
+requesting student's partition, so its cost depends on that student's history
+rather than on total platform traffic.
+
+Memories written before partitioning live untagged in the global
+"mentor_memory" collection. Move them into a student's partition with:
+
+    python memory_partitions.py migrate --student-id alice
+"""
+
+import os
+import re
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+
+DEFAULT_STUDENT_ID = os.getenv("DEFAULT_STUDENT_ID", "anonymous")
+MAX_OPEN_PARTITIONS = int(os.getenv("MAX_OPEN_PARTITIONS", "256"))
+LEGACY_COLLECTION = "mentor_memory"
+MIGRATION_BATCH_SIZE = 1000
+
+def normalize_student_id(student_id):
+    """Canonical student id: trimmed, lower-case, DEFAULT_STUDENT_ID when empty."""
+    student_id = re.sub(r"\s+", " ", (student_id or "").strip().lower())
+    return student_id or DEFAULT_STUDENT_ID
+
+def partition_key(student_id):
+    """Stable, name-safe partition key for a student id."""
+    return hashlib.sha256(normalize_student_id(student_id).encode("utf-8")).hexdigest()[:16]
+
+def collection_name(student_id):
+    return f"{LEGACY_COLLECTION}_{partition_key(student_id)}"
+
+class PartitionRegistry:
+    """Opens partitions on demand and keeps the most recently used ones open."""
+
+    def __init__(self, opener, max_open=MAX_OPEN_PARTITIONS):
+        self.opener = opener
+        self.max_open = max_open
+        self._open = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, student_id):
+        student_id = normalize_student_id(student_id)
+        evicted = []
+        with self._lock:
+            partition = self._open.get(student_id)
+            if partition is not None:
+                self._open.move_to_end(student_id)
+                return partition
+            partition = self.opener(student_id)
+            self._open[student_id] = partition
+            # Evicted partitions are closed, and simply reopened on their next request
+            while len(self._open) > self.max_open:
+                evicted.append(self._open.popitem(last=False)[1])
+        # Outside the lock: closing waits for the partition's in-flight operations
+        for old in evicted:
+            _close(old)
+        return partition
+
+    def clear(self):
+        with self._lock:
+            partitions = list(self._open.values())
+            self._open.clear()
+        for partition in partitions:
+            _close(partition)
+
+def _close(partition):
+    # Compact stores hold a SQLite connection; ChromaDB collections share the client and have nothing to close
+    close = getattr(partition, "close", None)
+    if close is not None:
+        close()
+
+def migrate_untagged_memories(source, target, student_id, batch_size=MIGRATION_BATCH_SIZE, delete_source=False):
+    """Copy every memory in the global collection into one student's partition.
+
+    Upserts keep the original ids, so an interrupted migration can simply be
+    run again. Returns the number of memories copied.
+    """
+    student_id = normalize_student_id(student_id)
+    copied = 0
+    while True:
+        batch = source.get(include=["embeddings", "documents", "metadatas"], limit=batch_size,
+                           offset=0 if delete_source else copied)
+        if not batch["ids"]:
+            break
+        metadatas = [dict(meta or {}, student_id=student_id) for meta in batch["metadatas"]]
+        target.upsert(ids=batch["ids"], embeddings=batch["embeddings"], documents=batch["documents"],
+                      metadatas=metadatas)
+        if delete_source:
+            source.delete(ids=batch["ids"])
+        copied += len(batch["ids"])
+        print(f"🔄 Migrated {copied} memories to student {student_id!r}")
+    return copied
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage per-student memory partitions")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    p = subparsers.add_parser("migrate", help="move untagged memories from the global collection into a student's partition")
+    p.add_argument("--student-id", default=DEFAULT_STUDENT_ID, help="student who owns the untagged memories")
+    p.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE)
+    p.add_argument("--delete-source", action="store_true", help="remove memories from the global collection once copied")
+    args = parser.parse_args()
+
+    import gradio_app
+
+    source = gradio_app.get_chroma_client().get_or_create_collection(name=LEGACY_COLLECTION)
+    total = source.count()
+    if not total:
+        print("✅ No untagged memories to migrate.")
+    else:
+        print(f"🚀 Migrating {total} untagged memories to student {normalize_student_id(args.student_id)!r}...")
+        target = gradio_app.get_user_collection(args.student_id)
+        copied = migrate_untagged_memories(source, target, args.student_id, args.batch_size, args.delete_source)
+        print(f"✅ Migrated {copied} memories.")
@@ -0,0 +1,117 @@
+"""
+Incremental sync from memory_manager's store into a Chroma memory partition
+memory_manager keeps the detailed memory records (error patterns, notes, fix
+attempts; mentor_memory.json is imported into it on first use), while the app
+retrieves past mistakes from a vector collection. Every write to the store
+stamps the memory with the store's change sequence and every delete leaves a
+tombstone, so a sync only embeds and upserts the memories changed since the
+target's watermark and deletes the tombstoned ones. Keeping the collection
+current costs O(changes) instead of re-embedding the whole history.
+
+Memories whose text did not change (e.g. only fix_attempts moved) get their
+metadata updated without being embedded again.
+
+    python memory_sync.py --student-id alice
+"""
+
+import hashlib
+import argparse
+import embedding_service
+import memory_manager
+import memory_partitions
+import memory_consolidation
+
+SYNC_BATCH_SIZE = 256
+# Synced memories get ids in their own namespace so they never collide with pipeline memories
+ID_PREFIX = "mm_"
+SOURCE = memory_consolidation.SYNCED_SOURCE
+
+def memory_text(memory):
+    """Text embedded for a memory, the same summary the notebook built in prepare_text_chunks."""
+    patterns = ", ".join(memory.get("error_patterns", []))
+    notes = (memory.get("notes") or "").replace("\n", " ").strip()
+    return f"Problem: {memory.get('problem_title', '')}\nMistakes: {patterns}\nNotes: {notes}"
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+def vector_id(memory_id):
+    return f"{ID_PREFIX}{memory_id}"
+
+def sync_metadata(memory, student_id, digest):
+    return {
+        "problem_title": memory["problem_title"],
+        "student_id": memory_partitions.normalize_student_id(student_id),
+        "error_types": ",".join(memory_consolidation.error_types(
+            [{"type": pattern} for pattern in memory.get("error_patterns", [])])),
+        "created_at": memory["timestamp"],
+        "fix_attempts": memory.get("fix_attempts", 1),
+        "source": SOURCE,
+        "version": memory["updated_seq"],
+        "text_hash": digest,
+    }
+
+def sync_target(student_id):
+    """Watermark name for one student's partition."""
+    return f"chroma:{memory_partitions.partition_key(student_id)}"
+
+def sync_memories(collection, student_id=None, batch_size=SYNC_BATCH_SIZE):
+    """Bring `collection` up to date with memory_manager's store; returns counts of what changed.
+
+    The watermark only advances after the collection accepted every change,
+    and upserts and deletes are idempotent, so an interrupted sync simply
+    repeats its last batch next time.
+    """
+    target = sync_target(student_id)
+    watermark = memory_manager.get_sync_watermark(target)
+    seq, changed, deleted = memory_manager.changes_since(watermark)
+    result = {"embedded": 0, "updated": 0, "deleted": 0, "seq": seq}
+    if seq == watermark:
+        return result
+
+    for start in range(0, len(changed), batch_size):
+        batch = changed[start:start + batch_size]
+        ids = [vector_id(m["memory_id"]) for m in batch]
+        texts = [memory_text(m) for m in batch]
+        digests = [text_hash(text) for text in texts]
+        existing = collection.get(ids=ids, include=["metadatas"])
+        stored = {mid: (meta or {}).get("text_hash") for mid, meta in zip(existing["ids"], existing["metadatas"])}
+
+        to_embed = [i for i, mid in enumerate(ids) if stored.get(mid) != digests[i]]
+        to_update = [i for i, mid in enumerate(ids) if mid in stored and stored[mid] == digests[i]]
+        if to_embed:
+            vectors = embedding_service.embed_many([texts[i] for i in to_embed], use_cache=False, bulk=True)
+            collection.upsert(
+                ids=[ids[i] for i in to_embed],
+                documents=[texts[i] for i in to_embed],
+                metadatas=[sync_metadata(batch[i], student_id, digests[i]) for i in to_embed],
+                embeddings=vectors
+            )
+        if to_update:
+            collection.update(
+                ids=[ids[i] for i in to_update],
+                metadatas=[sync_metadata(batch[i], student_id, digests[i]) for i in to_update]
+            )
+        result["embedded"] += len(to_embed)
+        result["updated"] += len(to_update)
+
+    for start in range(0, len(deleted), batch_size):
+        ids = [vector_id(mid) for mid in deleted[start:start + batch_size]]
+        collection.delete(ids=ids)
+        result["deleted"] += len(ids)
+
+    memory_manager.set_sync_watermark(target, seq)
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync memory_manager's memories into a student's vector partition")
+    parser.add_argument("--student-id", default=memory_partitions.DEFAULT_STUDENT_ID,
+                        help="student whose memory partition receives the memories")
+    parser.add_argument("--batch-size", type=int, default=SYNC_BATCH_SIZE)
+    args = parser.parse_args()
+
+    import gradio_app
+
+    result = sync_memories(gradio_app.get_user_collection(args.student_id), args.student_id, args.batch_size)
+    print(f"✅ Synced to change {result['seq']}: {result['embedded']} embedded, "
+          f"{result['updated']} metadata-only updates, {result['deleted']} deleted.")
@@ -0,0 +1,414 @@
+"""
+Compact vector storage for the user memory collection
+Mistake memories can be stored as float16 vectors (2x smaller) or as int8
+codes with one float scale per vector (about 4x smaller in RAM) instead of
+ChromaDB's float32. Only the compact codes are held in RAM and scanned for a
+query. With int8 codes, the best n_results * rerank_factor candidates are
+re-scored after adding back a 4-bit code of their quantization error, read from
+disk for just those rows, which recovers the ranking of the float32 search.
+That residual keeps int8 about 2x smaller than float32 on disk as well.
+
+Queries scan every stored code, so they cost O(n) where ChromaDB's HNSW index
+is sublinear: at 20k memories an int8 query takes a few milliseconds against
+about 1.5 ms for ChromaDB, and float16 is several times slower than int8
+because NumPy converts half precision in software. The compact formats trade
+that latency for RAM; per-student partitions keep n small.
+
+QuantizedMemoryStore implements the parts of the Chroma collection API the app
+uses (add, upsert, update, query, get, delete, count, and metadata `where`
+filters with $eq, $ne, $in, $nin, $and and $or), so it can stand in for the
+"mentor_memory" collection.
+"""
+
+import os
+import re
+import json
+import sqlite3
+import threading
+import numpy as np
+
+MEMORY_VECTOR_STORAGE = os.getenv("MEMORY_VECTOR_STORAGE", "float32")
+MEMORY_RERANK_FACTOR = int(os.getenv("MEMORY_RERANK_FACTOR", "4"))
+STORAGE_TYPES = ("float16", "int8")
+
+# Rows scored per block: small enough that the float32 copy stays in cache
+QUERY_CHUNK_ROWS = 256
+# Levels on each side of zero for the re-ranking residual, which is stored in 4 bits
+RESIDUAL_LEVELS = 7
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS vectors (
+    rowid INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    document TEXT,
+    metadata TEXT,
+    code BLOB NOT NULL,
+    scale REAL,
+    rerank BLOB
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def quantize_int8(vectors):
+    """Symmetric per-vector int8 quantization; returns (codes, scales)."""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+def dequantize_int8(codes, scales):
+    return codes.astype(np.float32) * scales[:, None]
+
+def quantize_residual(vectors, codes, scales):
+    """What int8 quantization lost, as a float32 scale plus 4-bit codes packed two per byte, one blob per vector."""
+    residual = vectors - dequantize_int8(codes, scales)
+    residual_scales = np.abs(residual).max(axis=1) / RESIDUAL_LEVELS
+    residual_scales[residual_scales == 0] = 1.0
+    levels = np.clip(np.rint(residual / residual_scales[:, None]), -RESIDUAL_LEVELS, RESIDUAL_LEVELS)
+    nibbles = (levels + 8).astype(np.uint8)
+    if nibbles.shape[1] % 2:
+        nibbles = np.hstack([nibbles, np.full((len(nibbles), 1), 8, dtype=np.uint8)])
+    packed = nibbles[:, 0::2] | (nibbles[:, 1::2] << 4)
+    return [scale.tobytes() + row.tobytes() for scale, row in zip(residual_scales.astype(np.float32), packed)]
+
+def refine_int8(code, scale, blob):
+    """The float32 vector behind an int8 code, using its re-ranking blob (float16 in stores written before the residual)."""
+    if len(blob) == 2 * len(code):
+        return np.frombuffer(blob, dtype=np.float16).astype(np.float32)
+    residual_scale = np.frombuffer(blob, dtype=np.float32, count=1)[0]
+    packed = np.frombuffer(blob, dtype=np.uint8, offset=4)
+    nibbles = np.empty(2 * len(packed), dtype=np.float32)
+    nibbles[0::2] = packed & 0x0F
+    nibbles[1::2] = packed >> 4
+    return code.astype(np.float32) * scale + (nibbles[:len(code)] - 8) * residual_scale
+
+def where_sql(where):
+    """Translate a Chroma metadata filter into (SQL condition, params) over the metadata JSON column.
+
+    Like Chroma, $ne and $nin also match records that do not have the key.
+    """
+    clauses, params = [], []
+    for key, condition in where.items():
+        if key in ("$and", "$or"):
+            parts = [where_sql(w) for w in condition]
+            clauses.append("(" + f" {key[1:].upper()} ".join(sql for sql, _ in parts) + ")")
+            params += [p for _, part_params in parts for p in part_params]
+            continue
+        if not re.fullmatch(r"\w+", key):
+            raise ValueError(f"unsupported metadata key {key!r}")
+        op, value = next(iter(condition.items())) if isinstance(condition, dict) else ("$eq", condition)
+        column = f"json_extract(metadata, '$.{key}')"
+        if op == "$eq":
+            clauses.append(f"{column} = ?")
+            params.append(value)
+        elif op == "$ne":
+            clauses.append(f"{column} IS NOT ?")
+            params.append(value)
+        elif op in ("$in", "$nin"):
+            placeholders = ",".join("?" * len(value))
+            if op == "$in":
+                clauses.append(f"{column} IN ({placeholders})")
+            else:
+                clauses.append(f"({column} IS NULL OR {column} NOT IN ({placeholders}))")
+            params += list(value)
+        else:
+            raise ValueError(f"unsupported filter operator {op!r}")
+    return " AND ".join(clauses) or "1", params
+
+class QuantizedMemoryStore:
+    """A SQLite-backed vector store keeping compact float16 or int8 vectors in RAM."""
+
+    def __init__(self, path, storage="int8", rerank_factor=MEMORY_RERANK_FACTOR):
+        if storage not in STORAGE_TYPES:
+            raise ValueError(f"storage must be one of {STORAGE_TYPES}, got {storage!r}")
+        self.path = path
+        self.storage = storage
+        self.rerank_factor = rerank_factor
+        self._lock = threading.RLock()
+        self._db = None
+        self._conn.executescript(SCHEMA)
+        stored = self._conn.execute("SELECT value FROM meta WHERE key = 'storage'").fetchone()
+        if stored is None:
+            self._conn.execute("INSERT INTO meta (key, value) VALUES ('storage', ?)", (storage,))
+        elif stored[0] != storage:
+            raise ValueError(f"{path} holds {stored[0]} vectors, not {storage}")
+        self._load()
+
+    @property
+    def _conn(self):
+        """The SQLite connection, reopened if the store was closed while someone still held it."""
+        with self._lock:
+            if self._db is None:
+                self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("PRAGMA synchronous=NORMAL")
+            return self._db
+
+    def close(self):
+        """Release the SQLite connection once in-flight operations finish."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # In-RAM layout: row i of _codes/_scales belongs to _ids[i] / _rowids[i]
+    def _load(self):
+        self._ids = []
+        self._positions = {}
+        self._codes = None
+        self._scales = np.empty(0, dtype=np.float32)
+        self._rowids = np.empty(0, dtype=np.int64)
+        self._size = 0
+        dtype = np.int8 if self.storage == "int8" else np.float16
+        for rowid, mid, code, scale in self._conn.execute("SELECT rowid, id, code, scale FROM vectors ORDER BY rowid"):
+            self._append(mid, rowid, np.frombuffer(code, dtype=dtype), scale or 1.0)
+
+    def _reserve(self, dim, needed):
+        capacity = 0 if self._codes is None else self._codes.shape[0]
+        if needed <= capacity:
+            return
+        # Grow geometrically so appends are amortized O(1)
+        capacity = max(needed, capacity * 2, 1024)
+        codes = np.zeros((capacity, dim), dtype=np.int8 if self.storage == "int8" else np.float16)
+        scales = np.ones(capacity, dtype=np.float32)
+        rowids = np.zeros(capacity, dtype=np.int64)
+        if self._size:
+            codes[:self._size] = self._codes[:self._size]
+            scales[:self._size] = self._scales[:self._size]
+            rowids[:self._size] = self._rowids[:self._size]
+        self._codes, self._scales, self._rowids = codes, scales, rowids
+
+    def _append(self, mid, rowid, code, scale):
+        position = self._positions.get(mid)
+        if position is None:
+            self._reserve(code.shape[0], self._size + 1)
+            position = self._size
+            self._size += 1
+            self._ids.append(mid)
+            self._positions[mid] = position
+        self._codes[position] = code
+        self._scales[position] = scale
+        self._rowids[position] = rowid
+
+    def _remove(self, mid):
+        position = self._positions.pop(mid, None)
+        if position is None:
+            return
+        # Move the last row into the hole
+        last = self._size - 1
+        if position != last:
+            moved = self._ids[last]
+            self._ids[position] = moved
+            self._positions[moved] = position
+            self._codes[position] = self._codes[last]
+            self._scales[position] = self._scales[last]
+            self._rowids[position] = self._rowids[last]
+        self._ids.pop()
+        self._size -= 1
+
+    def _encode(self, embeddings):
+        vectors = normalize(embeddings)
+        if self.storage == "float16":
+            return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32), None
+        codes, scales = quantize_int8(vectors)
+        rerank = quantize_residual(vectors, codes, scales) if self.rerank_factor > 1 else None
+        return codes, scales, rerank
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        """Insert or replace vectors by id."""
+        codes, scales, rerank = self._encode(embeddings)
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [None] * len(ids)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rowids = []
+                for i, mid in enumerate(ids):
+                    self._conn.execute(
+                        """INSERT INTO vectors (id, document, metadata, code, scale, rerank) VALUES (?, ?, ?, ?, ?, ?)
+                           ON CONFLICT(id) DO UPDATE SET document = excluded.document, metadata = excluded.metadata,
+                               code = excluded.code, scale = excluded.scale, rerank = excluded.rerank""",
+                        (mid, documents[i], json.dumps(metadatas[i]) if metadatas[i] is not None else None,
+                         codes[i].tobytes(), float(scales[i]), rerank[i] if rerank is not None else None)
+                    )
+                    rowids.append(self._conn.execute("SELECT rowid FROM vectors WHERE id = ?", (mid,)).fetchone()[0])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            for mid, rowid, code, scale in zip(ids, rowids, codes, scales):
+                self._append(mid, rowid, code, scale)
+
+    def update(self, ids, documents=None, metadatas=None):
+        """Replace the documents and/or metadata of existing records, keeping their vectors."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for i, mid in enumerate(ids):
+                    if documents is not None:
+                        self._conn.execute("UPDATE vectors SET document = ? WHERE id = ?", (documents[i], mid))
+                    if metadatas is not None:
+                        self._conn.execute("UPDATE vectors SET metadata = ? WHERE id = ?",
+                                           (json.dumps(metadatas[i]) if metadatas[i] is not None else None, mid))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def add(self, ids, embeddings, documents=None, metadatas=None):
+        with self._lock:
+            existing = [mid for mid in ids if mid in self._positions]
+            if existing:
+                raise ValueError(f"IDs already exist: {existing[:5]}")
+            self.upsert(ids, embeddings, documents, metadatas)
+
+    def delete(self, ids):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany("DELETE FROM vectors WHERE id = ?", [(mid,) for mid in ids])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            for mid in ids:
+                self._remove(mid)
+
+    def count(self):
+        return self._size
+
+    def _rows(self, rowids, columns):
+        placeholders = ",".join("?" * len(rowids))
+        rows = self._conn.execute(
+            f"SELECT rowid, {columns} FROM vectors WHERE rowid IN ({placeholders})", [int(r) for r in rowids]
+        ).fetchall()
+        return {row[0]: row[1:] for row in rows}
+
+    def _scan(self, queries, k, positions=None):
+        """Top-k positions and similarities against the compact codes (only `positions`, if given)."""
+        size = self._size if positions is None else len(positions)
+        scores = np.empty((len(queries), size), dtype=np.float32)
+        if positions is None:
+            # Widen one block at a time into a reused buffer, and scale the scores rather than every code
+            buffer = np.empty((min(size, QUERY_CHUNK_ROWS), self._codes.shape[1]), dtype=np.float32)
+            for start in range(0, size, QUERY_CHUNK_ROWS):
+                end = min(start + QUERY_CHUNK_ROWS, size)
+                block = buffer[:end - start]
+                np.copyto(block, self._codes[start:end], casting="unsafe")
+                scores[:, start:end] = queries @ block.T
+            if self.storage == "int8":
+                scores *= self._scales[:size]
+        else:
+            for start in range(0, size, QUERY_CHUNK_ROWS):
+                scores[:, start:start + QUERY_CHUNK_ROWS] = queries @ self._vectors(positions[start:start + QUERY_CHUNK_ROWS]).T
+        if k < size:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(size), (len(queries), 1))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        return (top if positions is None else positions[top]), top_scores
+
+    def _matching_positions(self, where):
+        condition, params = where_sql(where)
+        ids = self._conn.execute(f"SELECT id FROM vectors WHERE {condition}", params).fetchall()
+        return np.array(sorted(self._positions[mid] for mid, in ids if mid in self._positions), dtype=np.int64)
+
+    def _vectors(self, positions):
+        block = self._codes[positions].astype(np.float32)
+        if self.storage == "int8":
+            block *= self._scales[positions, None]
+        return block
+
+    def _rerank(self, query, positions, scores):
+        rerank = self._rows(self._rowids[positions], "rerank")
+        exact = scores.copy()
+        for i, position in enumerate(positions):
+            blob = rerank.get(int(self._rowids[position]), (None,))[0]
+            if blob is not None:
+                exact[i] = float(query @ refine_int8(self._codes[position], self._scales[position], blob))
+        return exact
+
+    def query(self, query_embeddings, n_results=10, include=("documents", "metadatas", "distances"), where=None,
+              **kwargs):
+        """Chroma-shaped top-k search; distances are 2 - 2 * cosine, like Chroma's "l2" space."""
+        queries = normalize(query_embeddings)
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        if "embeddings" in include:
+            result["embeddings"] = []
+        with self._lock:
+            candidates = self._matching_positions(where) if where else None
+            size = self._size if candidates is None else len(candidates)
+            if size == 0 or n_results <= 0:
+                for _ in queries:
+                    for values in result.values():
+                        values.append([])
+                return result
+
+            rerank = self.storage == "int8" and self.rerank_factor > 1
+            k = min(size, n_results * self.rerank_factor if rerank else n_results)
+            top, scores = self._scan(queries, k, candidates)
+
+            for query, positions, candidate_scores in zip(queries, top, scores):
+                if rerank:
+                    candidate_scores = self._rerank(query, positions, candidate_scores)
+                order = np.argsort(-candidate_scores)[:n_results]
+                positions, best = positions[order], candidate_scores[order]
+                rows = self._rows(self._rowids[positions], "document, metadata")
+                fetched = [rows.get(int(self._rowids[p]), (None, None)) for p in positions]
+                result["ids"].append([self._ids[p] for p in positions])
+                result["documents"].append([document for document, _ in fetched])
+                result["metadatas"].append([json.loads(meta) if meta else None for _, meta in fetched])
+                result["distances"].append(np.maximum(2.0 - 2.0 * best, 0.0).tolist())
+                if "embeddings" in include:
+                    result["embeddings"].append(self._vectors(positions).tolist())
+        return result
+
+    def get(self, ids=None, include=("documents", "metadatas"), limit=None, offset=0, where=None, **kwargs):
+        """Fetch stored records by id and/or metadata filter (or all, paged with limit/offset)."""
+        sql = "SELECT id, document, metadata, code, scale FROM vectors"
+        conditions, params = [], []
+        if ids is not None:
+            conditions.append(f"id IN ({','.join('?' * len(ids))})")
+            params = list(ids)
+        if where:
+            condition, where_params = where_sql(where)
+            conditions.append(condition)
+            params += where_params
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY rowid"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params += [limit, offset]
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        result = {"ids": [row[0] for row in rows]}
+        if "documents" in include:
+            result["documents"] = [row[1] for row in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [json.loads(row[2]) if row[2] else None for row in rows]
+        if "embeddings" in include:
+            dtype = np.int8 if self.storage == "int8" else np.float16
+            result["embeddings"] = [
+                (np.frombuffer(code, dtype=dtype).astype(np.float32) * (scale or 1.0)).tolist()
+                for _, _, _, code, scale in rows
+            ]
+        return result
+
+    def memory_bytes(self):
+        """Bytes of vector data held in RAM."""
+        if self._codes is None:
+            return 0
+        per_row = self._codes.itemsize * self._codes.shape[1] + (4 if self.storage == "int8" else 0)
+        return per_row * self._size
@@ -1,102 +1,280 @@
 """
 Setup script to initialize the DSA Mentor Gradio app
 This script will load the expert solutions dataset into ChromaDB
+
+Each problem is indexed as one chunk per section (statement, brute force,
+better, optimized, key idea) so retrieval can pick the most useful parts.
+
+Ingestion is incremental: every chunk gets an id derived from a hash of its
+content, and a manifest next to the Chroma store records what has already been
+ingested. Re-running only embeds new or changed problems, removes problems that
+disappeared from the dataset, and resumes where an interrupted run stopped.
+
+The dataset (a JSON array or JSONL file) is streamed record by record and
+embedded in fixed-size batches, so documents and embeddings are never all in
+memory at once. Peak memory is still O(section ids): the manifest and the set
+of ids seen in this run (to find deleted problems) hold every id, a few
+hundred bytes per section.
 """
 
 import json
 import os
-import chromadb
-from sentence_transformers import SentenceTransformer
-
-def setup_expert_solutions():
-    """Load expert solutions into ChromaDB"""
-    
-    # Initialize ChromaDB
-    chroma_client = chromadb.PersistentClient(path="D:/Projects/DSA Mentor/chroma_data")
-    EXPERT_SOLUTION_collection = chroma_client.get_or_create_collection(
+import time
+import hashlib
+import argparse
+import embedding_service
+from context_builder import build_expert_chunks
+
+CHROMA_PATH = "D:/Projects/DSA Mentor/chroma_data"
+EXPERT_SOLUTION_DATASET = "data_set/striver_sde/problems.json"
+EXPERT_MANIFEST_FILE = os.path.join(CHROMA_PATH, "expert_manifest.jsonl")
+EXPERT_INDEX_PATH = os.path.join(CHROMA_PATH, "expert_index")
+EXPERT_CATALOG_PATH = os.path.join(CHROMA_PATH, "expert_catalog.json")
+EXPERT_BATCH_SIZE = int(os.getenv("EXPERT_BATCH_SIZE", "32"))
+EXPERT_ADD_CHUNK_SIZE = int(os.getenv("EXPERT_ADD_CHUNK_SIZE", "512"))
+READ_CHUNK_SIZE = 1 << 16
+
+def document_id(document):
+    """Content-addressed id: unchanged sections keep their id across runs."""
+    return "expert_" + hashlib.sha256(document.encode("utf-8")).hexdigest()[:16]
+
+def iter_json_array(f, chunk_size=READ_CHUNK_SIZE):
+    """Yield the elements of a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    eof = False
+    while True:
+        # Skip whitespace, separators and the opening bracket
+        i = 0
+        while i < len(buffer) and (buffer[i].isspace() or buffer[i] == "," or (not started and buffer[i] == "[")):
+            started = started or buffer[i] == "["
+            i += 1
+        buffer = buffer[i:]
+
+        if buffer and not started:
+            raise ValueError("Expert dataset must be a JSON array of problems")
+        if buffer.startswith("]"):
+            return
+        if buffer:
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                buffer = buffer[end:]
+                yield item
+                continue
+        elif eof:
+            return
+
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+
+def iter_expert_data(path):
+    """Stream problems from a JSON array (.json) or JSON Lines (.jsonl) file."""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from iter_json_array(f)
+
+def iter_records(path):
+    """Yield (id, document, metadata) for every section of every problem in the dataset."""
+    for item in iter_expert_data(path):
+        for _, document, metadata in build_expert_chunks(item):
+            yield document_id(document), document, metadata
+
+def load_manifest():
+    """Replay the append-only manifest into {id: problem_title}."""
+    if not os.path.exists(EXPERT_MANIFEST_FILE):
+        return None
+    ids = {}
+    with open(EXPERT_MANIFEST_FILE, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A torn final line from an interrupted run; that batch will be redone
+                continue
+            if entry.get("deleted"):
+                ids.pop(entry["id"], None)
+            else:
+                ids[entry["id"]] = entry.get("problem_title", "")
+    return ids
+
+def append_manifest(entries):
+    """Checkpoint a batch of manifest changes; cost is proportional to the batch."""
+    with open(EXPERT_MANIFEST_FILE, "a", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+def compact_manifest(ids):
+    # Write to a temporary file first so an interrupted run never leaves a torn manifest
+    tmp_path = EXPERT_MANIFEST_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for mid, title in ids.items():
+            f.write(json.dumps({"id": mid, "problem_title": title}) + "\n")
+    os.replace(tmp_path, EXPERT_MANIFEST_FILE)
+
+def manifest_version(ids):
+    """Digest of the manifest's section ids; the index and catalog record the version they were built from."""
+    digest = hashlib.sha256()
+    for mid in sorted(ids):
+        digest.update(mid.encode("utf-8") + b"\n")
+    return digest.hexdigest()[:16]
+
+def get_expert_collection():
+    import chromadb
+
+    chroma_client = chromadb.PersistentClient(path=CHROMA_PATH)
+    return chroma_client.get_or_create_collection(
         name="expert_solutions",
         metadata={"description": "Expert algorithm solutions and explanations"}
     )
-    
-    # Initialize embedding model
-    embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
-    
-    # Load expert data
-    EXPERT_SOLUTION_DATASET = "data_set/striver_sde/problems.json"
-    
-    if not os.path.exists(EXPERT_SOLUTION_DATASET):
-        print(f"❌ Expert dataset not found at {EXPERT_SOLUTION_DATASET}")
+
+def setup_expert_solutions(batch_size=EXPERT_BATCH_SIZE, add_chunk_size=EXPERT_ADD_CHUNK_SIZE,
+                           dataset=EXPERT_SOLUTION_DATASET):
+    """Stream new or changed expert solutions into ChromaDB"""
+
+    if not os.path.exists(dataset):
+        print(f"❌ Expert dataset not found at {dataset}")
         print("Please make sure the dataset file exists.")
         return False
-    
-    with open(EXPERT_SOLUTION_DATASET, "r", encoding="utf-8") as f:
-        expert_data = json.load(f)
-    
-    print(f"✅ Loaded {len(expert_data)} problems from dataset.")
-    
-    # Prepare documents for ChromaDB
-    EXPERT_SOLUTION_documents = []
-    EXPERT_SOLUTION_metadatas = []
-    EXPERT_SOLUTION_ids = []
-    
-    for idx, item in enumerate(expert_data):
-        # Create a combined document text for better semantic retrieval
-        combined_text = f"""
-Problem: {item.get('problem_title', '')}
-Difficulty: {item.get('difficulty', '')}
-Topic: {item.get('topic', '')}
-
-Problem Statement:
-{item.get('problem_statement', '')}
-
-Brute Force Approach:
-{item.get('brute_force_explanation', '')}
-
-Better Approach:
-{item.get('better_approach', '')}
-
-Optimized Explanation:
-{item.get('optimized_explanation', '')}
-
-Key Idea:
-{item.get('key_idea', '')}
-"""
-        
-        EXPERT_SOLUTION_documents.append(combined_text)
-        EXPERT_SOLUTION_metadatas.append({
-            "problem_title": item.get("problem_title", ""),
-            "difficulty": item.get("difficulty", ""),
-            "topic": item.get("topic", ""),
-        })
-        EXPERT_SOLUTION_ids.append(f"expert_{idx}")
-    
-    # Generate embeddings
-    print("🔄 Generating embeddings...")
-    EXPERT_SOLUTION_embeddings = embedding_model.encode(EXPERT_SOLUTION_documents, show_progress_bar=True).tolist()
-    
-    # Add to ChromaDB
-    EXPERT_SOLUTION_collection.add(
-        documents=EXPERT_SOLUTION_documents,
-        metadatas=EXPERT_SOLUTION_metadatas,
-        ids=EXPERT_SOLUTION_ids,
-        embeddings=EXPERT_SOLUTION_embeddings
-    )
-    
-    print(f"✅ Successfully added {len(EXPERT_SOLUTION_documents)} expert solutions to ChromaDB")
+
+    collection = None
+    manifest = load_manifest()
+    if manifest is None:
+        # First run (or lost manifest): reconcile against what the collection holds
+        collection = get_expert_collection()
+        manifest = {mid: "" for mid in collection.get(include=[])["ids"]}
+        compact_manifest(manifest)
+
+    pending = []
+    chunk = {"ids": [], "documents": [], "metadatas": [], "embeddings": []}
+    seen = set()
+    stats = {"read": 0, "added": 0}
+    started = time.perf_counter()
+
+    def report():
+        elapsed = time.perf_counter() - started
+        print(f"🔄 {stats['read']} sections read, {stats['added']} embedded "
+              f"({stats['added'] / elapsed if elapsed else 0:.1f} docs/s)")
+
+    def encode_pending():
+        # Expert documents are embedded once, so keep them out of the query cache
+        embeddings = embedding_service.embed_many([doc for _, doc, _ in pending], use_cache=False, bulk=True)
+        for (mid, doc, meta), vector in zip(pending, embeddings):
+            chunk["ids"].append(mid)
+            chunk["documents"].append(doc)
+            chunk["metadatas"].append(meta)
+            chunk["embeddings"].append(vector)
+        pending.clear()
+
+    def flush_chunk():
+        nonlocal collection
+        if not chunk["ids"]:
+            return
+        if collection is None:
+            collection = get_expert_collection()
+        collection.upsert(**chunk)
+        append_manifest({"id": mid, "problem_title": meta["problem_title"]}
+                        for mid, meta in zip(chunk["ids"], chunk["metadatas"]))
+        for mid, meta in zip(chunk["ids"], chunk["metadatas"]):
+            manifest[mid] = meta["problem_title"]
+        stats["added"] += len(chunk["ids"])
+        for values in chunk.values():
+            values.clear()
+        report()
+
+    for mid, document, metadata in iter_records(dataset):
+        stats["read"] += 1
+        if mid in seen:  # duplicate section in the dataset
+            continue
+        seen.add(mid)
+        if mid in manifest:
+            continue
+        pending.append((mid, document, metadata))
+        if len(pending) >= batch_size:
+            encode_pending()
+            if len(chunk["ids"]) >= add_chunk_size:
+                flush_chunk()
+
+    if pending:
+        encode_pending()
+    flush_chunk()
+
+    print(f"✅ Read {stats['read']} sections from dataset.")
+
+    # Problems that disappeared from the dataset
+    to_delete = [mid for mid in manifest if mid not in seen]
+    if to_delete:
+        if collection is None:
+            collection = get_expert_collection()
+        for start in range(0, len(to_delete), add_chunk_size):
+            batch_ids = to_delete[start:start + add_chunk_size]
+            collection.delete(ids=batch_ids)
+            append_manifest({"id": mid, "deleted": True} for mid in batch_ids)
+        for mid in to_delete:
+            del manifest[mid]
+        print(f"🗑️ Removed {len(to_delete)} expert solutions no longer in the dataset")
+
+    if stats["added"] or to_delete:
+        compact_manifest(manifest)
+        print(f"✅ Successfully added {stats['added']} expert solutions to ChromaDB")
+    else:
+        print("✅ Expert solutions are already up to date.")
+
+    # Refresh the in-process vector index and the title catalog whenever they were built from
+    # another manifest, including after a run that crashed between flushing sections and rebuilding
+    import vector_index
+    import expert_catalog
+
+    version = manifest_version(manifest)
+    if vector_index.index_version(EXPERT_INDEX_PATH) != version:
+        if collection is None:
+            collection = get_expert_collection()
+        rows = vector_index.build_index(collection, EXPERT_INDEX_PATH, version=version)
+        if rows is None:
+            print(f"⚠️ Expert collection is larger than {vector_index.VECTOR_INDEX_MAX_ROWS} sections; "
+                  f"the app will search ChromaDB instead of a vector index")
+        else:
+            print(f"✅ Built vector index with {rows} expert sections")
+
+    # Title/alias catalog the app uses to find expert entries without a vector search
+    if expert_catalog.catalog_version(EXPERT_CATALOG_PATH) != version:
+        problems = expert_catalog.write_catalog(iter_expert_data(dataset), EXPERT_CATALOG_PATH, document_id,
+                                                version=version)
+        print(f"✅ Built title catalog for {problems} expert problems")
     return True
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Set up the DSA Mentor Gradio app")
+    parser.add_argument("--batch-size", type=int, default=EXPERT_BATCH_SIZE,
+                        help="number of expert solutions embedded per batch")
+    parser.add_argument("--add-chunk-size", type=int, default=EXPERT_ADD_CHUNK_SIZE,
+                        help="number of embedded solutions written to ChromaDB per call")
+    parser.add_argument("--dataset", default=EXPERT_SOLUTION_DATASET,
+                        help="expert dataset as a JSON array or JSONL file")
+    args = parser.parse_args()
+
     print("🚀 Setting up DSA Mentor Gradio App...")
-    
+
     # Check if .env file exists
     if not os.path.exists(".env"):
         print("❌ .env file not found!")
         print("Please create a .env file with your API key:")
         print("ZnapAI_API_KEY=your_api_key_here")
         exit(1)
-    
+
     # Setup expert solutions
-    if setup_expert_solutions():
+    if setup_expert_solutions(batch_size=args.batch_size, add_chunk_size=args.add_chunk_size, dataset=args.dataset):
         print("✅ Setup complete! You can now run the Gradio app with:")
         print("python gradio_app.py")
     else:
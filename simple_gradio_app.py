@@ -6,39 +6,51 @@ This version has minimal dependencies and focuses on the core functionality
 import os
 import json
 from dotenv import load_dotenv
+import static_analyzer
 
 # Load environment variables
 load_dotenv(override=True)
 
-def process_code_simple(problem_title, user_code, language):
-    """Simplified code processing without AI analysis"""
-    if not problem_title.strip() or not user_code.strip():
-        return "Please provide both a problem title and your code."
-    
-    # Simple analysis without AI
+def format_static_analysis(problem_title, user_code, language):
+    """Local static analysis report; also used by the full app when the LLM is unavailable"""
+    diagnosis = static_analyzer.analyze(user_code, language)
+    if diagnosis["issues"]:
+        findings = "\n".join(
+            f"{i}. [{issue['type']}, {issue['confidence']} confidence] {issue['evidence']}"
+            for i, issue in enumerate(diagnosis["issues"], 1)
+        )
+    else:
+        findings = """No common mistake patterns found. Still worth checking:
+1. Edge cases (empty inputs, single elements, etc.)
+2. Boundary conditions (array bounds, loop termination)
+3. Time and space complexity (is it optimal?)"""
+
     analysis = f"""
 Problem Analysis for: {problem_title}
 Language: {language}
 
+Summary: {diagnosis['mistake_summary']}
+
+Findings:
+{findings}
+
 Code Review:
 - Code length: {len(user_code)} characters
 - Lines of code: {len(user_code.split(chr(10)))}
-- Language: {language}
-
-Common things to check:
-1. Edge cases (empty inputs, single elements, etc.)
-2. Boundary conditions (array bounds, loop termination)
-3. Time complexity (is it optimal?)
-4. Space complexity (can it be improved?)
-5. Correct data structures for the problem
-6. Proper initialization of variables
-7. Loop conditions and termination
-
-For detailed AI-powered feedback, please ensure all dependencies are installed and run the full version.
 """
     
     return analysis
 
+def process_code_simple(problem_title, user_code, language):
+    """Simplified code processing with local static analysis instead of AI"""
+    if not problem_title.strip() or not user_code.strip():
+        return "Please provide both a problem title and your code."
+    
+    analysis = format_static_analysis(problem_title, user_code, language)
+    return analysis + """
+For detailed AI-powered feedback, please ensure all dependencies are installed and run the full version.
+"""
+
 def create_simple_interface():
     """Create a simple Gradio interface"""
     try:
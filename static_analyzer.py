@@ -0,0 +1,392 @@
+"""
+Local static pre-analysis of submissions
+Catches the classic mistakes that do not need a language model: nested loops
+over the same input, odd loop bounds such as range(i+7, n), indexing an input
+without an empty-input guard, recursion without a base case. Python code is
+analyzed with the ast module; other languages go through a small tokenizer
+that understands C-style braces and Go/Rust-style loop headers.
+
+analyze() returns the same {"mistake_summary", "issues"} schema as the LLM
+diagnosis, so its result can be shown, stored and cached like any other.
+"""
+
+import re
+import ast
+
+# Loop offsets above this are reported as suspicious, e.g. range(i + 7, n); from
+# CONCLUSIVE_LOOP_OFFSET on they are rated high confidence, since range(i + 2, n) is often intended
+MAX_LOOP_OFFSET = 1
+CONCLUSIVE_LOOP_OFFSET = 3
+MAX_EVIDENCE_CHARS = 120
+
+CONFIDENCE_ORDER = {"high": 0, "medium": 1, "low": 2}
+
+SUMMARIES = {
+    "syntax-error": "The code does not parse: {evidence}.",
+    "time-complexity": "Nested loops over the same input make the solution quadratic or worse.",
+    "off-by-one": "A loop bound skips or overruns elements of the input.",
+    "edge-case": "The input is indexed without first handling the empty case.",
+    "logic-gap": "A recursive function has no base case that stops the recursion.",
+}
+
+def _issue(issue_type, confidence, evidence):
+    evidence = " ".join(str(evidence).split())
+    if len(evidence) > MAX_EVIDENCE_CHARS:
+        evidence = evidence[:MAX_EVIDENCE_CHARS - 1] + "…"
+    return {"type": issue_type, "confidence": confidence, "evidence": evidence}
+
+def _offset_confidence(offset):
+    return "high" if offset >= CONCLUSIVE_LOOP_OFFSET else "low"
+
+def _diagnosis(issues):
+    """Order issues by confidence and summarize the most important one."""
+    issues = sorted(issues, key=lambda i: CONFIDENCE_ORDER.get(i["confidence"], 3))
+    if not issues:
+        return {"mistake_summary": "No common mistake patterns found by static analysis.", "issues": []}
+    top = issues[0]
+    summary = SUMMARIES.get(top["type"], "Static analysis found a likely mistake.").format(evidence=top["evidence"])
+    return {"mistake_summary": summary, "issues": issues}
+
+# --- Python -------------------------------------------------------------------
+
+def _names(node):
+    return {n.id for n in ast.walk(node) if isinstance(n, ast.Name)}
+
+def _const_int(node):
+    if isinstance(node, ast.Constant) and isinstance(node.value, int) and not isinstance(node.value, bool):
+        return node.value
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        value = _const_int(node.operand)
+        return None if value is None else -value
+    return None
+
+def _bound_names(node):
+    """Names used directly in a loop bound like i + 1, ignoring those inside calls such as len(grid[i])."""
+    if isinstance(node, ast.Name):
+        return {node.id}
+    if isinstance(node, ast.BinOp):
+        return _bound_names(node.left) | _bound_names(node.right)
+    if isinstance(node, ast.UnaryOp):
+        return _bound_names(node.operand)
+    return set()
+
+def _range_args(node):
+    """The argument list of a range(...) iterator, or None."""
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "range":
+        return node.args
+    return None
+
+def _len_target(node):
+    """'nums' for len(nums), else None."""
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "len"
+            and len(node.args) == 1 and isinstance(node.args[0], ast.Name)):
+        return node.args[0].id
+    return None
+
+def _iterated_collection(loop):
+    """Name of the input a for loop walks over: nums for range(len(nums)), range(i, len(nums)) or nums itself."""
+    args = _range_args(loop.iter)
+    if args is None:
+        target = loop.iter
+        if isinstance(target, ast.Call) and isinstance(target.func, ast.Name) and target.func.id == "enumerate" and target.args:
+            target = target.args[0]
+        return target.id if isinstance(target, ast.Name) else None
+    stop = args[-1] if len(args) <= 2 else args[1]
+    if isinstance(stop, ast.BinOp):
+        stop = stop.left
+    return _len_target(stop) or (stop.id if isinstance(stop, ast.Name) else None)
+
+def _is_constant_loop(loop):
+    """Loops with a fixed trip count, e.g. range(4) or over a literal, do not add a factor of n."""
+    args = _range_args(loop.iter)
+    if args is not None:
+        return all(_const_int(a) is not None for a in args)
+    return isinstance(loop.iter, (ast.List, ast.Tuple, ast.Set, ast.Constant))
+
+class _PythonAnalyzer(ast.NodeVisitor):
+    def __init__(self, source):
+        self.lines = source.splitlines()
+        self.issues = []
+        self.loops = []  # enclosing for loops that scale with the input
+        self.reported_nesting = set()
+
+    def line(self, node):
+        number = getattr(node, "lineno", 0)
+        text = self.lines[number - 1].strip() if 0 < number <= len(self.lines) else ""
+        return f"line {number}: {text}"
+
+    def visit_For(self, node):
+        self.check_bounds(node)
+        scales = not _is_constant_loop(node)
+        if scales and self.loops:
+            self.check_nesting(node)
+        if scales:
+            self.loops.append(node)
+        self.generic_visit(node)
+        if scales:
+            self.loops.pop()
+
+    visit_AsyncFor = visit_For
+
+    def check_nesting(self, node):
+        outer = self.loops[-1]
+        # range(i + 1, n) depends on the outer index; "for c in row" over the outer row is a 2-D walk, not n^2
+        args = _range_args(node.iter) or []
+        depends_on_outer = any(_bound_names(a) & _names(outer.target) for a in args)
+        collection = _iterated_collection(node)
+        same_input = collection is not None and collection == _iterated_collection(outer)
+        if not (depends_on_outer or same_input) or id(outer) in self.reported_nesting:
+            return
+        self.reported_nesting.add(id(outer))
+        depth = len(self.loops) + 1
+        complexity = "O(n^2)" if depth == 2 else f"O(n^{depth})"
+        # Nesting alone is never conclusive: an O(n^2) 3Sum with a hash set is already optimal
+        self.issues.append(_issue(
+            "time-complexity", "medium",
+            f"{self.line(node)} is nested inside {self.line(outer).split(':', 1)[0]}, so the work grows as {complexity}"
+        ))
+
+    def check_bounds(self, node):
+        args = _range_args(node.iter)
+        if not args:
+            return
+        start = args[0] if len(args) >= 2 else None
+        stop = args[-1] if len(args) <= 2 else args[1]
+        # range(i + 7, n): the inner loop skips the elements right after i
+        if isinstance(start, ast.BinOp) and isinstance(start.op, ast.Add):
+            offset = _const_int(start.right)
+            if offset is not None and offset > MAX_LOOP_OFFSET and isinstance(start.left, ast.Name):
+                self.issues.append(_issue(
+                    "off-by-one", _offset_confidence(offset),
+                    f"{self.line(node)} starts at {start.left.id}+{offset}, skipping the {offset - 1} elements after "
+                    f"{start.left.id}; pairs usually start at {start.left.id}+1"
+                ))
+        # range(len(nums) + 1) while indexing nums[...] with the loop variable
+        if isinstance(stop, ast.BinOp) and isinstance(stop.op, ast.Add) and (_const_int(stop.right) or 0) > 0:
+            collection = _len_target(stop.left)
+            loop_vars = _names(node.target)
+            indexed = any(isinstance(n, ast.Subscript) and isinstance(n.value, ast.Name) and n.value.id == collection
+                          and _names(n.slice) & loop_vars
+                          for n in ast.walk(node))
+            if collection and indexed:
+                self.issues.append(_issue(
+                    "off-by-one", "high",
+                    f"{self.line(node)} runs past the end of {collection}, so {collection}[...] raises IndexError"
+                ))
+
+    def visit_FunctionDef(self, node):
+        self.check_empty_guard(node)
+        self.check_recursion(node)
+        # A nested function starts its own loop nesting
+        loops, self.loops = self.loops, []
+        self.generic_visit(node)
+        self.loops = loops
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def check_empty_guard(self, node):
+        params = {a.arg for a in node.args.args + node.args.kwonlyargs} - {"self", "cls"}
+        if not params:
+            return
+        guarded = set()
+        for child in ast.walk(node):
+            if isinstance(child, (ast.If, ast.While, ast.IfExp, ast.Assert)):
+                guarded |= _names(child.test)
+            elif isinstance(child, ast.Try):
+                return
+        for child in ast.walk(node):
+            target = None
+            if isinstance(child, ast.Subscript) and isinstance(child.value, ast.Name) and _const_int(child.slice) is not None:
+                target = child.value.id
+            elif (isinstance(child, ast.Call) and isinstance(child.func, ast.Name) and child.func.id in ("max", "min")
+                  and len(child.args) == 1 and not child.keywords and isinstance(child.args[0], ast.Name)):
+                target = child.args[0].id
+            if target in params and target not in guarded:
+                self.issues.append(_issue(
+                    "edge-case", "medium",
+                    f"{self.line(child)} assumes {target} is non-empty, but there is no check for an empty {target}"
+                ))
+                return
+
+    def check_recursion(self, node):
+        calls = [n for n in ast.walk(node)
+                 if isinstance(n, ast.Call) and (
+                     (isinstance(n.func, ast.Name) and n.func.id == node.name)
+                     or (isinstance(n.func, ast.Attribute) and n.func.attr == node.name
+                         and isinstance(n.func.value, ast.Name) and n.func.value.id == "self"))]
+        if not calls:
+            return
+        # A base case is any branch or loop that decides whether to recurse
+        has_branch = any(isinstance(n, (ast.If, ast.IfExp, ast.While, ast.For, ast.BoolOp, ast.Try, ast.Match))
+                         for n in ast.walk(node))
+        if not has_branch:
+            self.issues.append(_issue(
+                "logic-gap", "high",
+                f"{self.line(calls[0])} calls {node.name} recursively, but {node.name} has no base case"
+            ))
+
+def analyze_python(user_code):
+    try:
+        tree = ast.parse(user_code)
+    except SyntaxError as e:
+        evidence = f"line {e.lineno}: {e.msg}" if e.lineno else e.msg
+        return _diagnosis([_issue("syntax-error", "high", evidence)])
+    analyzer = _PythonAnalyzer(user_code)
+    analyzer.visit(tree)
+    return _diagnosis(analyzer.issues)
+
+# --- Other languages ----------------------------------------------------------
+
+TOKEN_PATTERN = re.compile(r"""
+    (?P<comment>//[^\n]*|/\*.*?\*/|\#[^\n]*)
+  | (?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|`(?:\\.|[^`\\])*`)
+  | (?P<word>[A-Za-z_]\w*)
+  | (?P<number>\d+)
+  | (?P<op>\+\+|--|\+=|-=|<=|>=|==|!=|&&|\|\||::|:=|->|=>|[{}()\[\];,.<>=+\-*/%!&|?:])
+  | (?P<newline>\n)
+""", re.VERBOSE | re.DOTALL)
+
+LOOP_KEYWORDS = {"for", "while", "loop"}
+EMPTY_CHECKS = re.compile(r"\b(length|size|len|empty|isEmpty|is_empty|null|nullptr|nil|None|undefined)\b")
+
+class _Token:
+    __slots__ = ("kind", "text", "line")
+
+    def __init__(self, kind, text, line):
+        self.kind = kind
+        self.text = text
+        self.line = line
+
+def tokenize_code(user_code):
+    """Words, numbers and operators with line numbers; comments and string literals are dropped."""
+    tokens, line = [], 1
+    for match in TOKEN_PATTERN.finditer(user_code):
+        kind, text = match.lastgroup, match.group()
+        if kind == "newline":
+            line += 1
+            continue
+        if kind not in ("comment", "string"):
+            tokens.append(_Token(kind, text, line))
+        line += text.count("\n")
+    return tokens
+
+def _loop_header(tokens, i):
+    """Token span of a loop header starting at tokens[i]; returns (header, index of the body's first token)."""
+    j = i + 1
+    if j < len(tokens) and tokens[j].text == "(":
+        depth = 0
+        for k in range(j, len(tokens)):
+            depth += {"(": 1, ")": -1}.get(tokens[k].text, 0)
+            if depth == 0:
+                return tokens[j + 1:k], k + 1
+        return tokens[j + 1:], len(tokens)
+    # Go / Rust style: for i := 0; i < n; i++ { ... }
+    k = j
+    while k < len(tokens) and tokens[k].text != "{":
+        k += 1
+    return tokens[j:k], k
+
+def _header_text(header):
+    return " ".join(t.text for t in header)
+
+def _is_constant_header(header):
+    """for (int k = 0; k < 4; k++) style loops with a literal bound."""
+    text = _header_text(header)
+    bounds = re.findall(r"[<>]=? (\w+)", text)
+    return bool(bounds) and all(b.isdigit() for b in bounds)
+
+def analyze_tokens(user_code):
+    tokens = tokenize_code(user_code)
+    lines = user_code.splitlines()
+    issues = []
+
+    def line(number):
+        text = lines[number - 1].strip() if 0 < number <= len(lines) else ""
+        return f"line {number}: {text}"
+
+    # Each open loop is (loop token, header, brace depth its body closes at, or None for a single statement)
+    loops = []
+    reported_nesting = False
+    depth = 0
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token.text == "{":
+            depth += 1
+        elif token.text == "}":
+            depth -= 1
+            while loops and loops[-1][2] is not None and loops[-1][2] > depth:
+                loops.pop()
+        elif token.text == ";":
+            while loops and loops[-1][2] is None:
+                loops.pop()
+        elif token.kind == "word" and token.text in LOOP_KEYWORDS:
+            if token.text == "loop":
+                header, body = [], i + 1
+            else:
+                header, body = _loop_header(tokens, i)
+            # do { ... } while (cond); has no body of its own
+            if token.text == "while" and i and tokens[i - 1].text == "}" and body < len(tokens) and tokens[body].text == ";":
+                i = body + 1
+                continue
+            header_text = _header_text(header)
+
+            offset = re.search(r"= (\w+) \+ (\d+) ;", header_text)
+            if offset and int(offset.group(2)) > MAX_LOOP_OFFSET:
+                start, amount = offset.group(1), int(offset.group(2))
+                issues.append(_issue("off-by-one", _offset_confidence(amount),
+                                     f"{line(token.line)} starts at {start}+{amount}, skipping the {amount - 1} "
+                                     f"elements after {start}; pairs usually start at {start}+1"))
+            if re.search(r"<= \w+ \. (length|size \( \)|Length|Count|len \( \))", header_text):
+                issues.append(_issue("off-by-one", "high",
+                                     f"{line(token.line)} loops while the index is <= the length, one step past the end"))
+
+            scales = token.text == "for" and not _is_constant_header(header)
+            if scales and not reported_nesting and any(outer[3] for outer in loops):
+                outer = next(o for o in reversed(loops) if o[3])
+                reported_nesting = True
+                nesting = 1 + sum(1 for o in loops if o[3])
+                complexity = "O(n^2)" if nesting == 2 else f"O(n^{nesting})"
+                issues.append(_issue("time-complexity", "medium",
+                                     f"{line(token.line)} is nested inside line {outer[0].line}, so the work grows "
+                                     f"as {complexity}"))
+
+            opens_block = body < len(tokens) and tokens[body].text == "{"
+            loops.append((token, header, depth + 1 if opens_block else None, scales))
+            if opens_block:
+                depth += 1
+                body += 1
+            i = body
+            continue
+        i += 1
+
+    # Indexing [0] into a name that is never compared against a length, null or empty check
+    checked = set()
+    for k, token in enumerate(tokens):
+        if token.kind == "word" and EMPTY_CHECKS.match(token.text):
+            for t in tokens[max(0, k - 4):k + 4]:
+                if t.kind == "word":
+                    checked.add(t.text)
+    for k in range(len(tokens) - 3):
+        name, bracket, index, close = tokens[k:k + 4]
+        if (name.kind == "word" and bracket.text == "[" and index.text == "0" and close.text == "]"
+                and name.text not in checked):
+            issues.append(_issue("edge-case", "medium",
+                                 f"{line(name.line)} reads {name.text}[0] without checking that {name.text} is non-empty"))
+            break
+
+    return _diagnosis(issues)
+
+def analyze(user_code, language="Python"):
+    """Diagnose a submission locally, in the same schema as the LLM diagnosis."""
+    if (language or "").strip().lower() in ("python", "py", "python3"):
+        return analyze_python(user_code)
+    return analyze_tokens(user_code)
+
+def is_conclusive(diagnosis):
+    """Whether static findings are reliable enough to answer without the diagnosis LLM."""
+    return any(issue["confidence"] == "high" for issue in diagnosis["issues"])
+
+def format_findings(diagnosis):
+    """Findings as prompt lines for the diagnosis LLM."""
+    return "\n".join(f"- {issue['type']} ({issue['confidence']}): {issue['evidence']}" for issue in diagnosis["issues"])
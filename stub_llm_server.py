@@ -0,0 +1,212 @@
+"""
+Local OpenAI-compatible stub for DSA Mentor benchmarks
+Answers POST /chat/completions (and /v1/chat/completions) with canned
+responses after a configurable delay, so the pipeline can be load-tested
+without calling the paid endpoint. Diagnosis requests get a canned JSON
+diagnosis; every other request gets mentor-style feedback, streamed as
+server-sent events when the client asks for stream=True. Faults can be
+injected to exercise timeouts, retries, hedging and the circuit breaker: a
+share of requests can fail with HTTP 503 or be delayed by a slow tail.
+
+    python stub_llm_server.py --port 8008 --latency 0.3 --token-latency 0.01
+    python stub_llm_server.py --slow-rate 0.05 --slow-latency 5 --error-rate 0.1
+    LLM_BASE_URL=http://127.0.0.1:8008/ python gradio_app.py
+"""
+
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CANNED_DIAGNOSIS = {
+    "mistake_summary": "Nested loops make the solution O(n^2); a hash map lookup would make it O(n).",
+    "issues": [
+        {"type": "time-complexity", "confidence": "high", "evidence": "for j in range(i+1, len(nums))"},
+        {"type": "edge-case", "confidence": "medium", "evidence": "no handling when no pair exists"},
+    ],
+}
+
+CANNED_FEEDBACK = (
+    "1. What you missed: for every element you scan the rest of the array, "
+    "so the work grows quadratically with the input.\n"
+    "2. How to improve: think about what you need to remember about the numbers "
+    "you have already seen, and which data structure answers that in O(1).\n"
+    "3. Reasoning: for each number, ask whether its complement has been seen before; "
+    "if not, record the number and move on."
+)
+
+class StubConfig:
+    """Response timing and content for the stub server."""
+
+    def __init__(self, latency=0.2, token_latency=0.0, tokens=None, diagnosis=None, feedback=CANNED_FEEDBACK,
+                 error_rate=0.0, slow_rate=0.0, slow_latency=5.0):
+        self.latency = latency              # seconds before the first byte / token
+        self.token_latency = token_latency  # seconds between streamed tokens
+        self.tokens = tokens                # number of streamed chunks (default: one per word)
+        self.diagnosis = diagnosis or CANNED_DIAGNOSIS
+        self.feedback = feedback
+        self.error_rate = error_rate        # share of requests answered with HTTP 503
+        self.slow_rate = slow_rate          # share of requests delayed by slow_latency instead of latency
+        self.slow_latency = slow_latency
+        self.requests = 0                   # chat completion requests received
+
+def _is_diagnosis_request(messages):
+    system = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+    return "analyzer" in system.lower() or "json" in system.lower()
+
+def _split_tokens(text, count):
+    words = text.split(" ")
+    if not count or count >= len(words):
+        return [w if i == 0 else " " + w for i, w in enumerate(words)]
+    size = -(-len(words) // count)
+    return [(" " if i else "") + " ".join(words[i:i + size]) for i in range(0, len(words), size)]
+
+def _usage(prompt_text, completion_text):
+    prompt_tokens = len(prompt_text) // 4 + 1
+    completion_tokens = len(completion_text) // 4 + 1
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = StubConfig()
+
+    def log_message(self, format, *args):
+        pass  # keep benchmark output readable
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "gpt-4o-mini", "object": "model"}]})
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        try:
+            self._chat_completion()
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # the client gave up, e.g. a hedged request that lost the race
+
+    def _chat_completion(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+
+        config = self.config
+        config.requests += 1
+        if random.random() < config.error_rate:
+            self._send_json(503, {"error": {"message": "stub: injected upstream failure", "type": "server_error"}})
+            return
+        messages = request.get("messages", [])
+        if _is_diagnosis_request(messages):
+            content = json.dumps(config.diagnosis)
+        else:
+            content = config.feedback
+        prompt_text = "".join(m.get("content", "") for m in messages)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = request.get("model", "gpt-4o-mini")
+        created = int(time.time())
+
+        time.sleep(config.slow_latency if random.random() < config.slow_rate else config.latency)
+
+        if not request.get("stream"):
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": _usage(prompt_text, content),
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send_event(payload):
+            data = f"data: {payload}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def chunk(delta, finish_reason=None):
+            return json.dumps({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            })
+
+        send_event(chunk({"role": "assistant", "content": ""}))
+        for i, token in enumerate(_split_tokens(content, config.tokens)):
+            if i and config.token_latency:
+                time.sleep(config.token_latency)
+            send_event(chunk({"content": token}))
+        send_event(chunk({}, "stop"))
+        if (request.get("stream_options") or {}).get("include_usage"):
+            send_event(json.dumps({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [],
+                "usage": _usage(prompt_text, content),
+            }))
+        send_event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+def start_stub_server(host="127.0.0.1", port=0, config=None):
+    """Start the stub in a daemon thread; returns (server, base_url). Port 0 picks a free port."""
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"config": config or StubConfig()})
+    server = StubServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, name="stub-llm-server", daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}/"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub LLM server for DSA Mentor benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8008)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="seconds between streamed tokens")
+    parser.add_argument("--tokens", type=int, default=None, help="number of streamed chunks per response")
+    parser.add_argument("--diagnosis-file", help="JSON file with the canned diagnosis to return")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests failing with HTTP 503")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="share of requests delayed by --slow-latency")
+    parser.add_argument("--slow-latency", type=float, default=5.0, help="seconds before the first token of a slow request")
+    args = parser.parse_args()
+
+    diagnosis = None
+    if args.diagnosis_file:
+        with open(args.diagnosis_file, "r", encoding="utf-8") as f:
+            diagnosis = json.load(f)
+
+    server, url = start_stub_server(args.host, args.port, StubConfig(args.latency, args.token_latency, args.tokens, diagnosis,
+                                                                     error_rate=args.error_rate, slow_rate=args.slow_rate,
+                                                                     slow_latency=args.slow_latency))
+    print(f"🧪 Stub LLM listening on {url} (latency {args.latency}s, token latency {args.token_latency}s)")
+    print(f"   Point the app at it with LLM_BASE_URL={url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,181 @@
+"""
+Per-student "thinking fingerprint"
+A small profile of each student's recurring mistakes, kept up to date as
+memories are written instead of being rebuilt from raw memories on every
+request. It holds:
+
+- error-pattern histograms, with a recency-weighted score per pattern that
+  halves every PROFILE_HALF_LIFE_DAYS;
+- per-topic attempt and mistake counts, from which weak and strong topics
+  are read off;
+- fixes (a mistake made on a problem earlier that is gone in the new
+  attempt) versus repeats (the same mistake made again on the same problem).
+
+Profiles live in SQLite and are served from an in-process LRU, so a lookup
+is a dictionary hit. render() turns a profile into a fixed-size prompt section.
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from context_builder import truncate_to_tokens
+from memory_partitions import normalize_student_id
+
+STUDENT_PROFILE_DB = os.getenv("STUDENT_PROFILE_DB", "student_profiles.db")
+PROFILE_HALF_LIFE_DAYS = float(os.getenv("PROFILE_HALF_LIFE_DAYS", "14"))
+PROFILE_CONTEXT_TOKENS = int(os.getenv("PROFILE_CONTEXT_TOKENS", "120"))
+PROFILE_CACHE_SIZE = 1024
+
+# Bounds that keep a profile (and its JSON row) small however long the history
+MAX_PATTERNS = 64
+MAX_TOPICS = 64
+MAX_PROBLEMS = 256
+# What render() shows
+TOP_PATTERNS = 4
+TOP_TOPICS = 3
+# A topic needs this many attempts before it is called weak or strong
+MIN_TOPIC_ATTEMPTS = 2
+
+_conn = None
+_conn_path = None
+_lock = threading.RLock()
+_cache = OrderedDict()
+
+def _connect():
+    global _conn, _conn_path
+    if _conn is None or _conn_path != STUDENT_PROFILE_DB:
+        _conn = sqlite3.connect(STUDENT_PROFILE_DB, check_same_thread=False)
+        _conn_path = STUDENT_PROFILE_DB
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+        _conn.execute("""
+            CREATE TABLE IF NOT EXISTS profiles (
+                student_id TEXT PRIMARY KEY,
+                profile TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        _conn.commit()
+    return _conn
+
+def normalize_pattern(pattern):
+    return re.sub(r"[\s_]+", "-", str(pattern).strip().lower())
+
+def new_profile(student_id):
+    return {"student_id": student_id, "attempts": 0, "clean": 0, "fixes": 0, "repeats": 0,
+            "patterns": {}, "topics": {}, "problems": {}, "updated_at": time.time()}
+
+def _cache_put(student_id, profile):
+    _cache[student_id] = profile
+    _cache.move_to_end(student_id)
+    while len(_cache) > PROFILE_CACHE_SIZE:
+        _cache.popitem(last=False)
+
+def get_profile(student_id=None):
+    """The student's profile, or None if nothing was recorded for them yet."""
+    student_id = normalize_student_id(student_id)
+    with _lock:
+        profile = _cache.get(student_id)
+        if profile is not None:
+            _cache.move_to_end(student_id)
+            return profile
+        row = _connect().execute("SELECT profile FROM profiles WHERE student_id = ?", (student_id,)).fetchone()
+        if row is None:
+            return None
+        profile = json.loads(row[0])
+        _cache_put(student_id, profile)
+        return profile
+
+def _decay(profile, now):
+    """Age every recency score to `now`."""
+    factor = 0.5 ** ((now - profile["updated_at"]) / (PROFILE_HALF_LIFE_DAYS * 86400))
+    for stats in profile["patterns"].values():
+        stats["score"] *= factor
+    profile["updated_at"] = now
+
+def _trim(mapping, limit, key):
+    """Drop the entries ranking lowest by `key` once a mapping outgrows its limit."""
+    if len(mapping) > limit:
+        for name in sorted(mapping, key=lambda n: key(mapping[n]))[:len(mapping) - limit]:
+            del mapping[name]
+
+def record_attempt(student_id, problem_title, error_patterns, topics=(), now=None):
+    """Fold one attempt at a problem, with the mistakes found in it, into the student's profile."""
+    student_id = normalize_student_id(student_id)
+    patterns = sorted({normalize_pattern(p) for p in error_patterns or [] if str(p).strip()})
+    problem = (problem_title or "").strip().lower()
+    now = time.time() if now is None else now
+    with _lock:
+        profile = get_profile(student_id)
+        profile = new_profile(student_id) if profile is None else json.loads(json.dumps(profile))
+        _decay(profile, now)
+
+        profile["attempts"] += 1
+        if not patterns:
+            profile["clean"] += 1
+        for pattern in patterns:
+            stats = profile["patterns"].setdefault(pattern, {"count": 0, "score": 0.0})
+            stats["count"] += 1
+            stats["score"] += 1.0
+            stats["last_seen"] = now
+        _trim(profile["patterns"], MAX_PATTERNS, key=lambda s: s["score"])
+
+        for topic in {t.strip() for t in topics or () if t and t.strip()}:
+            stats = profile["topics"].setdefault(topic, {"attempts": 0, "mistakes": 0})
+            stats["attempts"] += 1
+            stats["mistakes"] += 1 if patterns else 0
+        _trim(profile["topics"], MAX_TOPICS, key=lambda s: s["attempts"])
+
+        # Compare with the previous attempt at the same problem
+        previous = profile["problems"].pop(problem, None)
+        if previous is not None:
+            profile["repeats"] += len(set(previous) & set(patterns))
+            profile["fixes"] += len(set(previous) - set(patterns))
+        profile["problems"][problem] = patterns
+        while len(profile["problems"]) > MAX_PROBLEMS:
+            profile["problems"].pop(next(iter(profile["problems"])))
+
+        conn = _connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO profiles (student_id, profile, updated_at) VALUES (?, ?, ?)",
+            (student_id, json.dumps(profile), now)
+        )
+        conn.commit()
+        _cache_put(student_id, profile)
+        return profile
+
+def weak_and_strong_topics(profile):
+    """(weak, strong) topics as [(topic, mistakes, attempts)], worst and best first."""
+    rated = [(topic, s["mistakes"], s["attempts"]) for topic, s in profile["topics"].items()
+             if s["attempts"] >= MIN_TOPIC_ATTEMPTS]
+    weak = sorted((t for t in rated if t[1] / t[2] >= 0.5), key=lambda t: (-t[1] / t[2], -t[2]))
+    strong = sorted((t for t in rated if t[1] / t[2] < 0.5), key=lambda t: (t[1] / t[2], -t[2]))
+    return weak[:TOP_TOPICS], strong[:TOP_TOPICS]
+
+def render(profile, token_budget=PROFILE_CONTEXT_TOKENS):
+    """Compact prompt section summarizing the profile, at most token_budget tokens; "" without a profile."""
+    if not profile or not profile["attempts"]:
+        return ""
+    lines = [f"Student thinking fingerprint ({profile['attempts']} submissions, "
+             f"{profile['clean']} without mistakes):"]
+    top = sorted(profile["patterns"].items(), key=lambda item: item[1]["score"], reverse=True)[:TOP_PATTERNS]
+    if top:
+        lines.append("- Recurring mistakes (most recent weight first): "
+                     + ", ".join(f"{pattern} x{stats['count']}" for pattern, stats in top))
+    weak, strong = weak_and_strong_topics(profile)
+    if weak:
+        lines.append("- Weak topics: " + ", ".join(f"{t} ({m}/{a} with mistakes)" for t, m, a in weak))
+    if strong:
+        lines.append("- Strong topics: " + ", ".join(f"{t} ({m}/{a} with mistakes)" for t, m, a in strong))
+    if profile["fixes"] or profile["repeats"]:
+        lines.append(f"- On retried problems: {profile['fixes']} mistakes fixed, {profile['repeats']} repeated")
+    return truncate_to_tokens("\n".join(lines), token_budget)
+
+def clear():
+    """Forget cached profiles (the SQLite rows stay)."""
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,211 @@
+"""
+Tracing and metrics for DSA Mentor
+Each pipeline stage runs inside a span that records its duration and errors.
+LLM token usage, retrieval result counts and distances, and cache statistics
+are kept as in-process counters and histograms. They are served in Prometheus
+text format from a small HTTP endpoint, and can also be written as one JSON log
+line per event, tagged with the id of the request that produced it.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import threading
+import contextvars
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+TELEMETRY_JSON_LOGS = os.getenv("TELEMETRY_JSON_LOGS", "0") == "1"
+
+PREFIX = "dsa_mentor"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+DISTANCE_BUCKETS = (0.1, 0.25, 0.5, 0.75, 1.0, 1.25, 1.5, 2.0)
+
+_request_id = contextvars.ContextVar("dsa_mentor_request_id", default=None)
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+_buckets = {}     # name -> bucket bounds
+_help = {}
+_collectors = []  # callables returning [(name, labels, value)] gauges at scrape time
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def inc(name, value=1, help="", **labels):
+    """Increment a counter."""
+    with _lock:
+        key = (name, _labels(labels))
+        _counters[key] = _counters.get(key, 0) + value
+        if help:
+            _help.setdefault(name, help)
+
+def observe(name, value, buckets=LATENCY_BUCKETS, help="", **labels):
+    """Add one observation to a histogram."""
+    with _lock:
+        bounds = _buckets.setdefault(name, buckets)
+        key = (name, _labels(labels))
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [0] * len(bounds) + [0.0, 0]
+        for i, bound in enumerate(bounds):
+            if value <= bound:
+                hist[i] += 1
+        hist[-2] += value
+        hist[-1] += 1
+        if help:
+            _help.setdefault(name, help)
+
+def register_collector(collector):
+    """Register a callable returning [(name, labels, value)] gauges, evaluated on every scrape."""
+    _collectors.append(collector)
+
+def new_request_id():
+    return uuid.uuid4().hex[:16]
+
+def start_request(request_id=None):
+    """Tag everything recorded from this context on with a request id, and return it."""
+    request_id = request_id or new_request_id()
+    _request_id.set(request_id)
+    return request_id
+
+def current_request_id():
+    return _request_id.get()
+
+def log_event(event, **fields):
+    """Write one structured JSON log line when TELEMETRY_JSON_LOGS is enabled."""
+    if not TELEMETRY_JSON_LOGS:
+        return
+    record = {"ts": round(time.time(), 3), "event": event, "request_id": _request_id.get()}
+    record.update(fields)
+    # One write per line so concurrent requests do not interleave
+    sys.stderr.write(json.dumps(record, default=str) + "\n")
+    sys.stderr.flush()
+
+@contextmanager
+def span(stage, **attrs):
+    """Time a pipeline stage; yields a dict the caller can add attributes to."""
+    attrs = dict(attrs)
+    start = time.perf_counter()
+    error = None
+    try:
+        yield attrs
+    except Exception as e:
+        error = type(e).__name__
+        inc(f"{PREFIX}_stage_errors_total", help="Pipeline stage failures", stage=stage, error=error)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        observe(f"{PREFIX}_stage_seconds", elapsed, help="Pipeline stage duration in seconds", stage=stage)
+        log_event("span", stage=stage, duration_ms=round(elapsed * 1000, 2),
+                  status="error" if error else "ok", error=error, **attrs)
+
+def record_llm_usage(call, usage):
+    """Count prompt and completion tokens from an OpenAI usage object (or dict)."""
+    if usage is None:
+        return
+    if not isinstance(usage, dict):
+        usage = {"prompt_tokens": getattr(usage, "prompt_tokens", 0),
+                 "completion_tokens": getattr(usage, "completion_tokens", 0)}
+    for kind in ("prompt", "completion"):
+        tokens = usage.get(f"{kind}_tokens") or 0
+        inc(f"{PREFIX}_llm_tokens_total", tokens, help="LLM tokens used", call=call, kind=kind)
+    log_event("llm_usage", call=call, prompt_tokens=usage.get("prompt_tokens"),
+              completion_tokens=usage.get("completion_tokens"))
+
+def record_retrieval(source, distances):
+    """Record how many results a retrieval returned and how close they were."""
+    observe(f"{PREFIX}_retrieval_results", len(distances), buckets=COUNT_BUCKETS,
+            help="Results returned per retrieval", source=source)
+    for distance in distances:
+        observe(f"{PREFIX}_retrieval_distance", float(distance), buckets=DISTANCE_BUCKETS,
+                help="Distance of retrieved results", source=source)
+    log_event("retrieval", source=source, results=len(distances),
+              best_distance=round(float(min(distances)), 4) if distances else None)
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = []
+    for key, value in pairs:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        escaped.append(f'{key}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: list(value) for key, value in _histograms.items()}
+        buckets = dict(_buckets)
+        help_text = dict(_help)
+
+    for name in sorted({name for name, _ in counters}):
+        lines.append(f"# HELP {name} {help_text.get(name, name)}")
+        lines.append(f"# TYPE {name} counter")
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+
+    for name in sorted({name for name, _ in histograms}):
+        lines.append(f"# HELP {name} {help_text.get(name, name)}")
+        lines.append(f"# TYPE {name} histogram")
+        for (metric, labels), hist in sorted(histograms.items()):
+            if metric != name:
+                continue
+            for bound, count in zip(buckets[name], hist):
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {count}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {hist[-1]}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {hist[-2]}")
+            lines.append(f"{name}_count{_format_labels(labels)} {hist[-1]}")
+
+    gauges = {}
+    for collector in list(_collectors):
+        try:
+            for name, labels, value in collector():
+                gauges.setdefault(name, []).append((_labels(labels), value))
+        except Exception as e:
+            print(f"⚠️ Metrics collector failed: {e}")
+    for name, samples in sorted(gauges.items()):
+        lines.append(f"# TYPE {name} gauge")
+        for labels, value in samples:
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+def reset():
+    """Clear every recorded metric (collectors stay registered)."""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def start_metrics_server(port=METRICS_PORT, host="0.0.0.0"):
+    """Serve /metrics from a daemon thread; returns the server, or None when disabled."""
+    if not port:
+        return None
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="dsa-mentor-metrics", daemon=True).start()
+    print(f"📈 Metrics available at http://{host}:{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,190 @@
+"""
+In-process vector index for the expert corpus
+The expert collection is small and read-only at serve time, so its embeddings
+are exported once into a contiguous float32 matrix saved as .npy. Every worker
+memory-maps the same file and answers queries with a normalized dot product and
+argpartition, skipping Chroma's per-query overhead.
+
+Only the row ids are kept next to the matrix; the documents and metadata of the
+top-k hits are fetched from Chroma by id, so neither the export nor a worker
+holds the corpus text in memory.
+"""
+
+import os
+import json
+import threading
+from collections import OrderedDict
+import numpy as np
+
+VECTOR_INDEX_MAX_ROWS = int(os.getenv("VECTOR_INDEX_MAX_ROWS", "50000"))
+EXPORT_PAGE_SIZE = 1000
+# Recently returned sections kept in memory, since popular problems come back often
+FETCH_CACHE_SIZE = 1024
+
+def _paths(path):
+    return path + ".npy", path + ".json"
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def remove_index(path):
+    for file_path in _paths(path):
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+def index_version(path):
+    """The version a saved index was built from, or None when there is none."""
+    _, meta_path = _paths(path)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, "r", encoding="utf-8") as f:
+        return json.load(f).get("version")
+
+def build_index(collection, path, max_rows=VECTOR_INDEX_MAX_ROWS, page_size=EXPORT_PAGE_SIZE, version=None):
+    """Export a Chroma collection's embeddings and ids to disk, one page at a time.
+
+    Returns the number of rows, or None when the collection is larger than
+    max_rows; the app then searches Chroma, so any older index is removed.
+    `version` is stored with the index for index_version().
+    """
+    rows = collection.count()
+    if rows > max_rows:
+        remove_index(path)
+        return None
+    matrix_path, meta_path = _paths(path)
+
+    # Write to temporary files first so running workers never map a torn index
+    matrix = None
+    ids = []
+    for offset in range(0, rows, page_size):
+        page = collection.get(include=["embeddings"], limit=page_size, offset=offset)
+        if not len(page["ids"]):
+            break
+        vectors = _normalize(np.asarray(page["embeddings"], dtype=np.float32))
+        if matrix is None:
+            matrix = np.lib.format.open_memmap(matrix_path + ".tmp.npy", mode="w+", dtype=np.float32,
+                                               shape=(rows, vectors.shape[1]))
+        matrix[len(ids):len(ids) + len(vectors)] = vectors
+        ids.extend(page["ids"])
+    if matrix is None:
+        np.save(matrix_path + ".tmp.npy", np.zeros((0, 0), dtype=np.float32))
+    else:
+        matrix.flush()
+        del matrix
+        if len(ids) < rows:
+            # The collection shrank during the export
+            np.save(matrix_path + ".tmp.npy", np.load(matrix_path + ".tmp.npy")[:len(ids)])
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"ids": ids, "version": version}, f)
+    os.replace(matrix_path + ".tmp.npy", matrix_path)
+    os.replace(meta_path + ".tmp", meta_path)
+    return len(ids)
+
+def load_index(path, collection, max_rows=VECTOR_INDEX_MAX_ROWS):
+    """Memory-map a saved index over `collection`, or return None if it is missing or too large."""
+    matrix_path, meta_path = _paths(path)
+    if not (os.path.exists(matrix_path) and os.path.exists(meta_path)):
+        return None
+    matrix = np.load(matrix_path, mmap_mode="r")
+    if matrix.shape[0] > max_rows:
+        print(f"⚠️ Vector index has {matrix.shape[0]} rows (limit {max_rows}); using ChromaDB instead.")
+        return None
+    mtime = os.stat(meta_path).st_mtime_ns
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    index = VectorIndex(matrix, meta["ids"], collection)
+    index.path, index.version, index._mtime = path, meta.get("version"), mtime
+    return index
+
+class VectorIndex:
+    """Exact top-k search over a normalized float32 matrix.
+
+    query() takes the same arguments as a Chroma collection's query() and
+    returns results in the same shape. Distances are squared L2 between unit
+    vectors (2 - 2 * cosine), matching Chroma's default "l2" space. Documents
+    and metadata of the hits come from `collection`; hits the collection no
+    longer has are dropped.
+    """
+
+    path = None
+    version = None
+
+    def __init__(self, matrix, ids, collection, cache_size=FETCH_CACHE_SIZE):
+        self.matrix = matrix
+        self.ids = ids
+        self.collection = collection
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def stale(self):
+        """Whether the saved index has been rebuilt at another version, or removed, since it was loaded."""
+        if self.path is None:
+            return False
+        try:
+            mtime = os.stat(_paths(self.path)[1]).st_mtime_ns
+        except FileNotFoundError:
+            return True
+        if mtime != self._mtime:
+            if index_version(self.path) != self.version:
+                return True
+            self._mtime = mtime
+        return False
+
+    def search(self, query_embeddings, top_k):
+        """Return (indices, similarities) arrays of shape (n_queries, k), best first."""
+        queries = _normalize(np.asarray(query_embeddings, dtype=np.float32).reshape(-1, self.matrix.shape[1]))
+        scores = queries @ self.matrix.T
+        k = min(top_k, scores.shape[1])
+        if k == 0:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(int), empty
+        if k < scores.shape[1]:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(k), (len(queries), 1))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+    def query(self, query_embeddings, n_results=10, include=("documents", "metadatas", "distances"), **kwargs):
+        indices, similarities = self.search(query_embeddings, n_results)
+        ids = [[self.ids[i] for i in row] for row in indices]
+        distances = [(2.0 - 2.0 * row).tolist() for row in similarities]
+        if not ("documents" in include or "metadatas" in include):
+            return {"ids": ids, "distances": distances}
+        sections = self.fetch({mid for row in ids for mid in row})
+        # An index older than the collection can point at sections that were since removed
+        hits = [[(mid, distance) for mid, distance in zip(row, row_distances)
+                 if sections.get(mid, (None, None))[0] is not None and sections[mid][1] is not None]
+                for row, row_distances in zip(ids, distances)]
+        result = {"ids": [[mid for mid, _ in row] for row in hits],
+                  "distances": [[distance for _, distance in row] for row in hits]}
+        for field, position in (("documents", 0), ("metadatas", 1)):
+            if field in include:
+                result[field] = [[sections[mid][position] for mid, _ in row] for row in hits]
+        return result
+
+    def fetch(self, ids):
+        """{id: (document, metadata)} for the given ids, from the LRU or else from the collection."""
+        sections = {}
+        with self._lock:
+            for mid in ids:
+                if mid in self._cache:
+                    self._cache.move_to_end(mid)
+                    sections[mid] = self._cache[mid]
+        missing = sorted(set(ids) - sections.keys())
+        if missing:
+            found = self.collection.get(ids=missing, include=["documents", "metadatas"])
+            fetched = dict(zip(found["ids"], zip(found["documents"], found["metadatas"])))
+            sections.update(fetched)
+            with self._lock:
+                self._cache.update(fetched)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return sections